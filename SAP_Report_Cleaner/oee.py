@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+OEE-Berechnung
+==============
+Berechnet die OEE (Overall Equipment Effectiveness) und ihre Faktoren
+Verfügbarkeit, Leistung und Qualität aus der bereinigten Ausgabe des
+SAP Report Cleaners – z.B. dem Materialverbrauch, der mit
+'sap_report_cleaner.py join' um IW47-Rückmeldungen ergänzt wurde.
+
+    Verfügbarkeit = Laufzeit / Planzeit
+    Leistung      = Sollzeit (Soll-Stückzeit × Gesamtmenge) / Laufzeit
+    Qualität      = Gutmenge / Gesamtmenge
+    OEE           = Verfügbarkeit × Leistung × Qualität
+
+Alles wird mit pandas-Gruppenoperationen gerechnet (keine Zeilenschleifen).
+Zuerst entsteht eine Basistabelle mit additiven Summen pro Arbeitsplatz und
+Tag bzw. Schicht; Tag, Monat und gleitende Fenster werden daraus abgeleitet.
+Die Basistabelle kann gespeichert und mit dem nächsten Tagesreport
+fortgeschrieben werden, ohne den gesamten Bestand neu zu rechnen.
+
+Verwendung:
+    python3 oee.py verbrauch_iw47.csv --period month -o oee.xlsx
+    python3 oee.py tag_2026-10-19.csv --state oee_basis.csv --window 7 -o oee.csv
+
+Voraussetzungen:
+    pip3 install pandas openpyxl
+"""
+
+import argparse
+import sys
+
+import pandas as pd
+import numpy as np
+
+from pathlib import Path
+
+from sap_report_cleaner import (
+    DATE_COLUMN, DATE_OUTPUT_FORMAT,
+    apply_date_format, atomic_write, detect_input_format, install_openpyxl,
+    load_report, open_output_text, open_report, output_format, to_datetime_column,
+)
+
+
+# ============================================================================
+# KONFIGURATION
+# ============================================================================
+
+# Zuordnung der OEE-Größen zu Spalten der Eingabe (über columns= anpassbar).
+# Zeiten in Minuten; 'time' ist optional und wird nur für Schichten benötigt.
+OEE_COLUMNS = {
+    'work_center': 'Work Ctr',
+    'date': DATE_COLUMN,
+    'time': None,
+    'planned_time': 'Planned time',     # geplante Belegungszeit
+    'run_time': 'Run time',             # tatsächliche Laufzeit
+    'ideal_cycle': 'Ideal cycle time',  # Soll-Stückzeit
+    'good': 'Yield',                    # Gutmenge
+    'scrap': 'Scrap',                   # Ausschuss
+}
+
+# Schichtbeginn (Stunde) → Name; Zeiten vor der ersten Schicht zählen
+# zur letzten Schicht des Vortags (Nachtschicht)
+SHIFTS = [(6, 'Früh'), (14, 'Spät'), (22, 'Nacht')]
+
+# Additive Summen der Basistabelle
+SUM_COLUMNS = ['Planzeit', 'Laufzeit', 'Sollzeit', 'Gutmenge', 'Gesamtmenge']
+
+PERIODS = ('shift', 'day', 'month')
+
+
+# ============================================================================
+# HILFSFUNKTIONEN
+# ============================================================================
+
+def to_number(values):
+    """
+    Wandelt eine Spalte vektorisiert in float um. Text im SAP-Format wird
+    wie bei clean_number gelesen ('1.234,5', '1,5', '3.500' = 3500).
+    Wie bei to_datetime_column wird jeder unterschiedliche Wert nur einmal
+    geparst.
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    codes, uniques = pd.factorize(series)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip().str.replace('\xa0', '', regex=False)
+    german = text.str.contains(',', regex=False)
+    thousands = text.str.fullmatch(r'-?\d{1,3}(\.\d{3})+') & ~german
+    text = text.where(~(german | thousands), text.str.replace('.', '', regex=False))
+    text = text.str.replace(',', '.', regex=False)
+    parsed = np.append(pd.to_numeric(text, errors='coerce').to_numpy(dtype=float), np.nan)
+    return pd.Series(parsed[codes], index=series.index)
+
+
+def assign_shift(dates, times):
+    """
+    Ordnet Buchungen anhand der Uhrzeit einer Schicht zu.
+    Gibt (Schichtdatum, Schichtname) zurück; die Nachtschicht nach
+    Mitternacht gehört zum Vortag.
+    """
+    codes, uniques = pd.factorize(pd.Series(times))
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    hours = pd.to_datetime(text, format='%H:%M:%S', errors='coerce').dt.hour
+    if hours.isna().all():
+        hours = pd.to_datetime(text, format='%H:%M', errors='coerce').dt.hour
+    hours = np.append(hours.to_numpy(dtype=float), np.nan)[codes]
+    starts = [start for start, _ in SHIFTS]
+    names = np.array([name for _, name in SHIFTS] + [None], dtype=object)
+
+    # Index der letzten begonnenen Schicht; vor der ersten Schicht → letzte (Vortag)
+    idx = np.searchsorted(starts, hours, side='right') - 1
+    before_first = idx < 0
+    idx[before_first] = len(SHIFTS) - 1
+    idx[np.isnan(hours)] = len(SHIFTS)
+
+    shift_dates = pd.Series(dates).reset_index(drop=True)
+    shift_dates[before_first] = shift_dates[before_first] - pd.Timedelta(days=1)
+    return shift_dates, pd.Series(names[idx])
+
+
+def ratio(numerator, denominator):
+    """Quotient ohne Division durch 0 (dann NaN)."""
+    return numerator / denominator.where(denominator != 0)
+
+
+# ============================================================================
+# BERECHNUNG
+# ============================================================================
+
+def oee_base(df, columns=None):
+    """
+    Verdichtet Einzelbuchungen zu additiven Summen pro Arbeitsplatz und Tag
+    (mit Uhrzeitspalte: pro Schicht). Nur diese Summen werden für alle
+    weiteren Auswertungen benötigt.
+
+    Mit Schichten ist 'Datum' der Schichttag; das Buchungsdatum bleibt als
+    eigene Spalte erhalten, damit OEEState Tagesreports ersetzen kann.
+    """
+    columns = dict(OEE_COLUMNS, **(columns or {}))
+    required = ['work_center', 'date', 'planned_time', 'run_time', 'ideal_cycle', 'good', 'scrap']
+    missing = [columns[role] for role in required if columns[role] not in df.columns]
+    if missing:
+        raise ValueError(f"Spalten für die OEE-Berechnung fehlen: {', '.join(missing)}")
+
+    dates = df[columns['date']]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = to_datetime_column(dates)
+    dates = dates.reset_index(drop=True).dt.normalize()
+
+    good = to_number(df[columns['good']]).fillna(0).to_numpy()
+    total = good + to_number(df[columns['scrap']]).fillna(0).to_numpy()
+    base = pd.DataFrame({
+        'Work Ctr': df[columns['work_center']].astype(str).str.strip().to_numpy(),
+        'Datum': dates,
+        'Planzeit': to_number(df[columns['planned_time']]).fillna(0).to_numpy(),
+        'Laufzeit': to_number(df[columns['run_time']]).fillna(0).to_numpy(),
+        'Sollzeit': to_number(df[columns['ideal_cycle']]).fillna(0).to_numpy() * total,
+        'Gutmenge': good,
+        'Gesamtmenge': total,
+    })
+
+    keys = ['Work Ctr', 'Datum']
+    if columns['time'] is not None:
+        if columns['time'] not in df.columns:
+            raise ValueError(f"Spalte für die Uhrzeit fehlt: {columns['time']}")
+        base['Buchungsdatum'] = base['Datum']
+        base['Datum'], base['Schicht'] = assign_shift(base['Datum'], df[columns['time']])
+        keys += ['Schicht', 'Buchungsdatum']
+
+    unreadable = int(base['Datum'].isna().sum())
+    if unreadable:
+        print(f"   ⚠ {unreadable} Zeilen ohne lesbares Datum (nicht berücksichtigt)")
+    return base.dropna(subset=keys).groupby(keys, as_index=False, sort=True)[SUM_COLUMNS].sum()
+
+
+def oee_ratios(sums):
+    """Ergänzt Verfügbarkeit, Leistung, Qualität und OEE (vektorisiert)."""
+    result = sums.copy()
+    result['Verfügbarkeit'] = ratio(result['Laufzeit'], result['Planzeit'])
+    result['Leistung'] = ratio(result['Sollzeit'], result['Laufzeit'])
+    result['Qualität'] = ratio(result['Gutmenge'], result['Gesamtmenge'])
+    result['OEE'] = result['Verfügbarkeit'] * result['Leistung'] * result['Qualität']
+    return result
+
+
+def compute_oee(base, period='day', window=None):
+    """
+    OEE pro Arbeitsplatz und Schicht, Tag oder Monat aus der Basistabelle.
+
+    Mit window wird zusätzlich über die letzten window Perioden je
+    Arbeitsplatz summiert (bei Tagen kalendarisch, fehlende Tage zählen
+    als Lücke). Die Faktoren werden aus den Fenstersummen berechnet,
+    nicht als Mittelwert der Einzelquoten.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unbekannte Periode: {period} (erlaubt: {', '.join(PERIODS)})")
+
+    if period == 'shift':
+        if 'Schicht' not in base.columns:
+            raise ValueError("Schichtauswertung benötigt eine Uhrzeitspalte (columns={'time': ...})")
+        keys = ['Work Ctr', 'Datum', 'Schicht']
+        sums = base.groupby(keys, as_index=False, sort=True)[SUM_COLUMNS].sum()
+        # Schichten in zeitlicher statt alphabetischer Reihenfolge
+        order = sums['Schicht'].map({name: i for i, (_, name) in enumerate(SHIFTS)})
+        sums = (sums.assign(_order=order).sort_values(['Work Ctr', 'Datum', '_order'])
+                .drop(columns='_order').reset_index(drop=True))
+    elif period == 'day':
+        keys = ['Work Ctr', 'Datum']
+        sums = base.groupby(keys, as_index=False, sort=True)[SUM_COLUMNS].sum()
+    else:
+        keys = ['Work Ctr', 'Monat']
+        months = base['Datum'].dt.to_period('M').astype(str)
+        sums = base.assign(Monat=months).groupby(keys, as_index=False, sort=True)[SUM_COLUMNS].sum()
+
+    if window:
+        grouped = sums.groupby('Work Ctr', sort=False)
+        if period == 'day':
+            rolled = grouped.rolling(f'{int(window)}D', on='Datum')[SUM_COLUMNS].sum()
+        else:
+            rolled = grouped[SUM_COLUMNS].rolling(int(window), min_periods=1).sum()
+        sums[SUM_COLUMNS] = rolled.reset_index(drop=True)[SUM_COLUMNS].to_numpy()
+
+    return oee_ratios(sums)
+
+
+class OEEState:
+    """
+    Fortschreibbare Basistabelle für die inkrementelle Berechnung.
+
+    update() verdichtet nur den neuen Report und ersetzt damit die
+    Buchungstage, die er enthält (ein erneut eingespielter Tagesreport wird
+    also nicht doppelt gezählt). Alle Auswertungen werden aus der kleinen Basistabelle abgeleitet.
+    """
+
+    def __init__(self, base=None, columns=None):
+        self.columns = columns
+        self.base = base
+
+    def update(self, df):
+        """Übernimmt die Buchungen eines neuen Reports; gibt die Zahl neuer Basiszeilen zurück."""
+        new = oee_base(df, self.columns)
+        if self.base is None or self.base.empty:
+            self.base = new
+        else:
+            if ('Schicht' in new.columns) != ('Schicht' in self.base.columns):
+                raise ValueError("Basistabelle und neuer Report unterscheiden sich in der Schichtangabe")
+            day = 'Buchungsdatum' if 'Buchungsdatum' in new.columns else 'Datum'
+            keep = ~self.base[day].isin(new[day].unique())
+            keys = [col for col in ('Work Ctr', 'Datum', 'Schicht', 'Buchungsdatum') if col in new.columns]
+            self.base = (pd.concat([self.base[keep], new], ignore_index=True)
+                         .sort_values(keys).reset_index(drop=True))
+        return len(new)
+
+    def report(self, period='day', window=None):
+        """OEE-Auswertung aus dem aktuellen Stand (siehe compute_oee)."""
+        if self.base is None:
+            raise ValueError("Noch keine Daten übernommen")
+        return compute_oee(self.base, period, window)
+
+    def save(self, path):
+        """Speichert die Basistabelle als CSV (;, UTF-8 mit BOM)."""
+        def write(tmp):
+            with open_output_text(tmp) as f:
+                self.base.to_csv(f, index=False, sep=';', date_format=DATE_OUTPUT_FORMAT)
+        return atomic_write(path, write)
+
+    @classmethod
+    def load(cls, path, columns=None):
+        """Lädt eine mit save() gespeicherte Basistabelle."""
+        with open_report(path, encoding='utf-8-sig') as f:
+            base = pd.read_csv(f, sep=';', dtype={'Work Ctr': str, 'Schicht': str})
+        for col in ('Datum', 'Buchungsdatum'):
+            if col in base.columns:
+                base[col] = pd.to_datetime(base[col], format=DATE_OUTPUT_FORMAT)
+        return cls(base, columns)
+
+
+# ============================================================================
+# EIN- UND AUSGABE
+# ============================================================================
+
+def read_input(file_path):
+    """
+    Liest die Eingabe: CSV (z.B. Ausgabe von 'join'), Excel oder einen
+    Rohreport (wird mit load_report bereinigt).
+    """
+    suffixes = [suffix.lower() for suffix in Path(file_path).suffixes]
+    if '.csv' in suffixes:
+        print(f"\n📂 Lese CSV: {file_path}")
+        with open_report(file_path, encoding='utf-8-sig') as f:
+            return pd.read_csv(f, sep=';', dtype=str, keep_default_na=False)
+    if detect_input_format(file_path) == 'xlsx':
+        print(f"\n📂 Lese Excel: {file_path}")
+        return pd.read_excel(file_path, dtype=str).fillna('')
+    return load_report(file_path, native_dates=True)
+
+
+def oee_output_format(path):
+    """Wie output_format, aber nur CSV (auch komprimiert) oder Excel."""
+    kind, compression = output_format(path)
+    if kind not in ('csv', 'xlsx'):
+        raise ValueError(f"Unbekanntes Ausgabeformat (.csv, .csv.gz, .csv.zst, .xlsx): {path}")
+    return kind, compression
+
+
+def write_oee(df, path):
+    """Schreibt die Auswertung als CSV oder Excel (je nach Endung)."""
+    kind, compression = oee_output_format(path)
+    df = df.round({col: 4 for col in df.select_dtypes('float').columns})
+
+    def write_csv_file(tmp):
+        with open_output_text(tmp, compression) as f:
+            df.to_csv(f, index=False, sep=';', date_format=DATE_OUTPUT_FORMAT)
+
+    def write_xlsx_file(tmp):
+        with pd.ExcelWriter(tmp, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='OEE', index=False)
+            apply_date_format(writer.sheets['OEE'], df)
+
+    if kind == 'xlsx' and not install_openpyxl():
+        raise ImportError("Für .xlsx-Ausgaben wird openpyxl benötigt: pip3 install openpyxl")
+    return atomic_write(path, write_xlsx_file if kind == 'xlsx' else write_csv_file)
+
+
+def parse_mapping(values):
+    """Wandelt ['good=Gutmenge', 'time=Uhrzeit'] in ein Dictionary um."""
+    mapping = {}
+    for value in values:
+        role, sep, column = value.partition('=')
+        if not sep or role not in OEE_COLUMNS:
+            raise argparse.ArgumentTypeError(
+                f"Ungültige Zuordnung '{value}' (erlaubt: {', '.join(OEE_COLUMNS)})")
+        mapping[role] = column or None
+    return mapping
+
+
+def main(argv=None):
+    """Kommandozeilen-Einstiegspunkt."""
+    parser = argparse.ArgumentParser(
+        description="Berechnet Verfügbarkeit, Leistung, Qualität und OEE pro Arbeitsplatz."
+    )
+    parser.add_argument('file', help="Bereinigte/verknüpfte CSV, Excel-Datei oder Rohreport")
+    parser.add_argument('-o', '--output', required=True,
+                        help="Zieldatei: .csv, .csv.gz, .csv.zst oder .xlsx")
+    parser.add_argument('--period', choices=PERIODS, default='day',
+                        help="Zeitraster der Auswertung (Standard: day)")
+    parser.add_argument('--window', type=int, default=None,
+                        help="Gleitendes Fenster über N Perioden")
+    parser.add_argument('--state', default=None,
+                        help="Basistabelle (CSV), die mit der Eingabe fortgeschrieben wird")
+    parser.add_argument('--column', nargs='+', default=[], metavar='GRÖSSE=SPALTE',
+                        help="Spaltenzuordnung, z.B. good=Gutmenge time=Uhrzeit")
+    args = parser.parse_args(argv)
+
+    try:
+        columns = parse_mapping(args.column)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if not Path(args.file).exists():
+        print(f"❌ Datei nicht gefunden: {args.file}")
+        return None
+
+    try:
+        oee_output_format(args.output)
+        if args.state and Path(args.state).exists():
+            state = OEEState.load(args.state, columns)
+            print(f"   Basistabelle geladen: {len(state.base)} Zeilen")
+        else:
+            state = OEEState(columns=columns)
+        added = state.update(read_input(args.file))
+        print(f"   {added} Basiszeilen aus der Eingabe")
+        if args.state:
+            state.save(args.state)
+            print(f"💾 Basistabelle: {args.state}")
+        result = state.report(args.period, args.window)
+        write_oee(result, args.output)
+    except (ValueError, ImportError) as e:
+        print(f"❌ {e}")
+        return None
+
+    print(f"\n📊 OEE ({args.period}): {len(result)} Zeilen")
+    print(f"💾 Gespeichert: {args.output}")
+    return result
+
+
+if __name__ == "__main__":
+    if main() is None:
+        sys.exit(1)
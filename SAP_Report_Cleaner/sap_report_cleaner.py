@@ -25,8 +25,22 @@ Voraussetzungen:
     pip3 install pandas openpyxl
 """
 
+import argparse
+import codecs
+import csv
+import gzip
+import hashlib
+import io
+import json
 import os
+import queue
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
 
 # Tk Deprecation-Warnung unterdrücken (macOS)
 os.environ['TK_SILENCE_DEPRECATION'] = '1'
@@ -38,6 +52,12 @@ import re
 
 from pathlib import Path
 from datetime import datetime
+from abc import ABC, abstractmethod
+from array import array
+from itertools import chain, islice
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 
 # ============================================================================
 # KONFIGURATION
@@ -69,8 +89,155 @@ TEXT_COLUMNS = ['Functional Loc.', 'Equipment', 'Material Description',
                 'Work Ctr', 'ID', 'ICt', 'Customer']
 # Material wird jetzt als Zahl behandelt (wenn rein numerisch)
 DATE_COLUMN = 'Pstng Date'
+DATE_INPUT_FORMATS = ['%d.%m.%y', '%d.%m.%Y', '%Y-%m-%d']
+DATE_OUTPUT_FORMAT = '%d.%m.%Y'
+DATE_EXCEL_FORMAT = 'DD.MM.YYYY'   # Zahlenformat für echte Excel-Datumszellen
 NUMERIC_COLUMNS = ['Material', 'Withdrawn', 'W/o resrv.', 'Reserved', 'Reserv.ref', 'Order', 'Message']
 
+# Standard-Schlüssel zum Erkennen doppelter Buchungen beim Zusammenführen
+MERGE_KEY_COLUMNS = ['Order', 'Material', 'Pstng Date', 'Message', 'Withdrawn']
+
+# Spalten im Sidecar-Index ([datei].sapidx.npz) für den Direktzugriff auf Rohzeilen
+INDEX_COLUMNS = ['Order', 'Material']
+INDEX_SUFFIX = '.sapidx.npz'
+
+# Speicherlimit für den Report-Cache in Notebooks (load_report)
+NOTEBOOK_CACHE_MAX_BYTES = 1024 ** 3
+
+# Anzahl Zeilen, die im Streaming-Modus gesammelt und auf einmal geschrieben werden
+CSV_BATCH_SIZE = 10000
+
+# Fortschritt: Zeit und Abbruch werden alle PROGRESS_BATCH Zeilen geprüft,
+# gemeldet wird höchstens alle PROGRESS_INTERVAL Sekunden
+PROGRESS_BATCH = 1000
+PROGRESS_INTERVAL = 0.5
+# Vorauslesen im Hintergrund: Blockgröße und Anzahl wartender Blöcke
+# (2 = Doppelpuffer: ein Block wird verarbeitet, der nächste liegt bereit)
+READ_AHEAD_BLOCK = 4 * 1024 * 1024
+READ_AHEAD_DEPTH = 2
+# Zeilen pro Block beim CSV-Export mit Fortschrittsanzeige
+EXPORT_BATCH_SIZE = 50000
+
+# Maximale Zeilenzahl eines Excel-Tabellenblatts (inkl. Kopfzeile); darüber
+# geht es in Fortsetzungsblättern 'Name (2)', 'Name (3)', ... weiter
+EXCEL_MAX_ROWS = 1048576
+
+# Blöcke, die beim Export je Ausgabeformat auf das Schreiben warten dürfen
+FAN_OUT_QUEUE = 2
+
+
+# ============================================================================
+# FORTSCHRITT UND ABBRUCH
+# ============================================================================
+
+class ProcessingCancelled(Exception):
+    """Die Verarbeitung wurde über ein CancelToken abgebrochen."""
+
+
+class CancelToken:
+    """
+    Abbruch-Signal für laufende Verarbeitungen (thread-sicher).
+    
+    Ein Frontend ruft cancel() auf; die Pipeline prüft das Signal zwischen
+    zwei Blöcken und löst dann ProcessingCancelled aus. Halb geschriebene
+    Ausgabedateien entstehen dabei nicht (siehe atomic_write).
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+    
+    def cancel(self):
+        self._event.set()
+    
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+    
+    def check(self):
+        if self._event.is_set():
+            raise ProcessingCancelled("Verarbeitung abgebrochen")
+
+
+class ProgressTracker:
+    """
+    Meldet den Fortschritt einer Verarbeitungsstufe gedrosselt an callback.
+    
+    callback erhält ein dict mit den Schlüsseln stage ('read', 'convert',
+    'export'), rows, total_rows, bytes_read, total_bytes, rows_per_s,
+    elapsed und done. Unbekannte Gesamtwerte sind None. Beim Export kann
+    callback aus einem Hintergrund-Thread aufgerufen werden.
+    
+    update() wird von der Pipeline nur einmal pro Block aufgerufen und
+    prüft dabei auch das CancelToken.
+    """
+    
+    def __init__(self, callback=None, cancel=None, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.cancel = cancel
+        self.interval = interval
+        self.start('')
+    
+    def start(self, stage, total_rows=None, total_bytes=None):
+        self.stage = stage
+        self.total_rows = total_rows
+        self.total_bytes = total_bytes
+        self.rows = 0
+        self.bytes_read = 0
+        self.started = time.perf_counter()
+        self.next_emit = self.started + self.interval
+        if stage:
+            self.check()
+            self.emit()
+    
+    def update(self, rows, bytes_read=None):
+        self.rows = rows
+        if bytes_read is not None:
+            self.bytes_read = bytes_read
+        self.check()
+        if self.callback is not None:
+            now = time.perf_counter()
+            if now >= self.next_emit:
+                self.next_emit = now + self.interval
+                self.emit(now)
+    
+    def finish(self, rows=None):
+        if rows is not None:
+            self.rows = rows
+        self.emit(done=True)
+    
+    def check(self):
+        if self.cancel is not None:
+            self.cancel.check()
+    
+    def emit(self, now=None, done=False):
+        if self.callback is None:
+            return
+        elapsed = (now or time.perf_counter()) - self.started
+        self.callback({
+            'stage': self.stage,
+            'rows': self.rows,
+            'total_rows': self.total_rows,
+            'bytes_read': self.bytes_read,
+            'total_bytes': self.total_bytes,
+            'rows_per_s': self.rows / elapsed if elapsed > 0 else 0.0,
+            'elapsed': elapsed,
+            'done': done,
+        })
+
+
+def print_progress(event):
+    """Einfacher Fortschritts-Callback für die Konsole (eine überschriebene Zeile)."""
+    if event['total_bytes']:
+        share = f", {min(event['bytes_read'] / event['total_bytes'], 1):.0%}"
+    elif event['total_rows']:
+        share = f", {min(event['rows'] / event['total_rows'], 1):.0%}"
+    else:
+        share = ''
+    rows = f"{event['rows']:,}".replace(',', '.')
+    speed = f"{event['rows_per_s']:,.0f}".replace(',', '.')
+    line = f"   ⏳ {event['stage']}: {rows} Zeilen{share} ({speed} Zeilen/s)"
+    print(line.ljust(70), end='\n' if event['done'] else '\r', flush=True)
+
 
 # ============================================================================
 # HILFSFUNKTIONEN
@@ -147,124 +314,563 @@ def clean_number(value):
         return None
 
 
-def convert_date(value, output_format='%d.%m.%Y'):
+def parse_sap_date(value):
     """
-    Konvertiert Datum aus SAP-Format (DD.MM.YY oder DD.MM.YYYY).
-    Gibt einen formatierten String zurück für bessere Excel-Kompatibilität.
+    Parst ein Datum im SAP-Format (DD.MM.YY, DD.MM.YYYY oder YYYY-MM-DD).
+    Gibt ein datetime-Objekt oder None zurück.
     """
-    if pd.isna(value) or value is None:
-        return ''
-    
     val_str = str(value).strip()
-    if val_str == '':
-        return ''
     
     # Versuche verschiedene Datumsformate
-    input_formats = ['%d.%m.%y', '%d.%m.%Y', '%Y-%m-%d']
-    
-    for fmt in input_formats:
+    for fmt in DATE_INPUT_FORMATS:
         try:
-            parsed_date = datetime.strptime(val_str, fmt)
-            # Rückgabe als formatierter String (DD.MM.YYYY)
-            return parsed_date.strftime(output_format)
+            return datetime.strptime(val_str, fmt)
         except ValueError:
             continue
     
-    return val_str  # Original zurückgeben wenn Parsing fehlschlägt
+    return None
 
 
-def read_sap_file(file_path):
+def convert_date(value, output_format=DATE_OUTPUT_FORMAT):
     """
-    Liest eine SAP-Report-Datei (Tab-getrennt).
-    Gibt alle Zeilen als Liste von Listen zurück.
+    Konvertiert ein Datum aus SAP-Format (DD.MM.YY, DD.MM.YYYY oder
+    YYYY-MM-DD) in einen String im output_format; nicht lesbare Werte
+    bleiben unverändert. Für ganze Spalten siehe DateFormat.to_date_column.
     """
-    print(f"\n📂 Lese Datei: {file_path}")
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    parsed = DateFormat(DATE_COLUMN, DATE_INPUT_FORMATS[0]).parse(value)
+    return parsed.strftime(output_format) if parsed is not None else str(value).strip()
+
+
+# Magic Bytes der unterstützten Archivformate
+COMPRESSION_MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'PK\x03\x04', 'zip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+# Magic Bytes echter Excel-97-Dateien (OLE2); SAP-"xls" sind meist Tab-Text
+XLS_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Excel-Arbeitsmappen, die zeilenweise über einen Workbook-Reader gelesen werden
+WORKBOOK_FORMATS = ('xlsx', 'xls')
+
+# Dateiendungen für komprimierte Ausgaben
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+def detect_input_format(file_path):
+    """
+    Erkennt das Dateiformat anhand der ersten Bytes (nicht der Endung):
+    'xlsx', 'xls', 'gzip', 'zip', 'zstd' oder None für Text.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+    if head.startswith(XLS_MAGIC):
+        return 'xls'
+    for magic, kind in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            if kind == 'zip' and is_xlsx_archive(file_path):
+                return 'xlsx'
+            return kind
+    return None
+
+
+def is_xlsx_archive(file_path):
+    """Prüft, ob ein ZIP-Archiv eine Excel-Arbeitsmappe (.xlsx) ist."""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            return 'xl/workbook.xml' in archive.namelist()
+    except zipfile.BadZipFile:
+        return False
+
+
+def detect_compression(file_path):
+    """
+    Erkennt gzip/zip/zstd anhand der ersten Bytes (nicht der Endung).
+    Gibt None für unkomprimierte Dateien (und Excel-Arbeitsmappen) zurück.
+    """
+    kind = detect_input_format(file_path)
+    return kind if kind in ('gzip', 'zip', 'zstd') else None
+
+
+def require_zstandard():
+    """Importiert zstandard (optional, nur für .zst-Dateien nötig)."""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ImportError("Für .zst-Dateien wird zstandard benötigt: pip3 install zstandard")
+
+
+def open_report_binary(file_path):
+    """
+    Öffnet eine Datei als Byte-Stream. gzip-, zip- und zstd-Archive werden
+    beim Lesen entpackt, ohne eine entpackte Kopie auf der Platte anzulegen.
+    Bei zip-Archiven wird die erste enthaltene Datei gelesen.
+    """
+    kind = detect_compression(file_path)
+    
+    if kind == 'gzip':
+        return gzip.open(file_path, 'rb')
+    
+    if kind == 'zstd':
+        zstandard = require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+    
+    if kind == 'zip':
+        with zipfile.ZipFile(file_path) as archive:
+            members = [info for info in archive.infolist()
+                       if not info.is_dir() and not info.filename.startswith('__MACOSX/')]
+            if not members:
+                raise ValueError(f"ZIP-Archiv enthält keine Datei: {file_path}")
+            # Der Member-Stream bleibt nach dem Schließen des Archivs lesbar
+            return archive.open(members[0])
+    
+    return open(file_path, 'rb')
+
+
+def open_report(file_path, encoding='utf-8'):
+    """Öffnet eine (ggf. komprimierte) Datei als Text-Stream, siehe open_report_binary."""
+    if detect_compression(file_path) is None:
+        return open(file_path, 'r', encoding=encoding, errors='replace')
+    return io.TextIOWrapper(open_report_binary(file_path), encoding=encoding, errors='replace')
+
+
+class ReadAhead:
+    """
+    Liest einen Byte-Stream in einem Hintergrund-Thread in großen Blöcken
+    voraus (Doppelpuffer), damit Lesen/Entpacken und die Verarbeitung im
+    Hauptthread sich überlappen – auf Netzlaufwerken dauert ein Durchlauf
+    dann etwa max(I/O, CPU) statt der Summe.
+    
+    Höchstens depth fertige Blöcke warten in der Queue, der Speicherbedarf
+    bleibt also bei etwa (depth + 1) * block_size. Mit encoding werden die
+    Blöcke schon im Thread dekodiert (str statt bytes). Fehler beim Lesen
+    werden im Hauptthread erneut ausgelöst. Als Kontextmanager verwenden:
+    beim Verlassen wird der Thread beendet, auch wenn nicht zu Ende gelesen
+    wurde.
+    """
+    
+    _END = object()
+    
+    def __init__(self, stream, block_size=None, depth=None, encoding=None):
+        self.stream = stream
+        self.block_size = block_size or READ_AHEAD_BLOCK
+        self.encoding = encoding
+        self.queue = queue.Queue(maxsize=depth or READ_AHEAD_DEPTH)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, name='read-ahead', daemon=True)
+        self.thread.start()
+    
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def _read(self):
+        try:
+            decoder = None
+            if self.encoding:
+                decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+            while not self.stopped.is_set():
+                block = self.stream.read(self.block_size)
+                if not block:
+                    break
+                if decoder is not None:
+                    block = decoder.decode(block)
+                if block and not self._put(block):
+                    return
+            if decoder is not None:
+                rest = decoder.decode(b'', final=True)
+                if rest:
+                    self._put(rest)
+            self._put(self._END)
+        except BaseException as e:
+            self._put(e)
+    
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def format_cell(value):
+    """
+    Wandelt einen Excel-Zellwert in Text wie im SAP-Tab-Export um,
+    damit er dieselbe Bereinigung durchläuft.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%d.%m.%Y')
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        text = repr(value)
+        # Genau 3 Nachkommastellen würde clean_number als Tausenderpunkt lesen
+        if re.fullmatch(r'-?\d+\.\d{3}', text):
+            text += '0'
+        return text
+    # Tabs/Zeilenumbrüche in Zellen würden die Zeilenstruktur zerstören
+    return str(value).replace('\t', ' ').replace('\r', ' ').replace('\n', ' ')
+
+
+def require_xlrd():
+    """Importiert xlrd (optional, nur für echte .xls-Dateien nötig)."""
+    try:
+        import xlrd
+        return xlrd
+    except ImportError:
+        raise ImportError("Für echte Excel-97-Dateien (.xls) wird xlrd benötigt: pip3 install xlrd")
+
+
+def iter_workbook_rows(file_path, verbose=True):
+    """
+    Liest das erste Tabellenblatt einer Excel-Datei zeilenweise als Listen
+    von Strings.
+    
+    .xlsx wird mit openpyxl im Read-only-Modus gestreamt (konstanter
+    Speicherbedarf). Echte .xls-Dateien werden mit xlrd gelesen; das
+    Format erlaubt kein Streaming, das Blatt liegt dann komplett im Speicher.
+    """
+    kind = detect_input_format(file_path)
+    if verbose:
+        print(f"   Excel-Arbeitsmappe erkannt ({kind})")
+    
+    if kind == 'xls':
+        xlrd = require_xlrd()
+        book = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            sheet = book.sheet_by_index(0)
+            for row_idx in range(sheet.nrows):
+                values = []
+                for cell in sheet.row(row_idx):
+                    if cell.ctype == xlrd.XL_CELL_DATE:
+                        values.append(format_cell(xlrd.xldate_as_datetime(cell.value, book.datemode)))
+                    else:
+                        values.append(format_cell(cell.value))
+                yield values
+        finally:
+            book.release_resources()
+        return
+    
+    if not install_openpyxl():
+        raise ImportError("Für .xlsx-Dateien wird openpyxl benötigt: pip3 install openpyxl")
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Angaben zur Blattgröße sind in exportierten Dateien oft falsch
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows(values_only=True):
+            yield [format_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def open_output_text(path, compression=None):
+    """
+    Öffnet eine Ausgabedatei als Text-Stream (UTF-8 mit BOM),
+    optional gzip- oder zstd-komprimiert.
+    """
+    if compression is None:
+        return open(path, 'w', encoding='utf-8-sig', newline='')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8-sig', newline='')
+    if compression == 'zstd':
+        zstandard = require_zstandard()
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    raise ValueError(f"Unbekannte Komprimierung: {compression}")
+
+
+def report_base_name(file_path):
+    """
+    Basisname für Ausgabedateien, ohne Archiv-Endung
+    (z.B. 'L91.txt.gz' → 'L91').
+    """
+    path = Path(file_path)
+    if path.suffix.lower() in ('.gz', '.zst', '.zip'):
+        path = path.with_suffix('')
+    return path.stem
+
+
+def iter_sap_lines(file_path, offsets=None, verbose=True):
+    """
+    Liest eine SAP-Report-Datei zeilenweise, ohne sie komplett zu laden.
+    Liefert dieselben Zeilen wie content.split('\\n') (inkl. leerer Endzeile).
     
-    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-        content = f.read()
+    Ist offsets eine Liste/ein array, wird für jede Zeile ihr Byte-Offset
+    in der Datei angehängt (nur für unkomprimierte Dateien).
+    verbose wie bei locate_header.
+    """
+    if offsets is not None:
+        yield from iter_lines_with_offsets(file_path, offsets)
+        return
+    
+    if detect_input_format(file_path) in WORKBOOK_FORMATS:
+        for row in iter_workbook_rows(file_path, verbose):
+            yield '\t'.join(row)
+        return
+    
+    # Vorauslesen im Hintergrund; Zeilenenden wie im Textmodus (\r\n, \r → \n)
+    with open_report_binary(file_path) as raw, ReadAhead(raw, encoding='utf-8') as blocks:
+        tail = ''
+        for block in blocks:
+            text = tail + block
+            # Ein \r am Blockende kann zu einem \r\n im nächsten Block gehören
+            carry = text.endswith('\r')
+            if carry:
+                text = text[:-1]
+            lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+            tail = lines.pop() + ('\r' if carry else '')
+            yield from lines
+        yield from tail.replace('\r', '\n').split('\n')
+
+
+def iter_lines_with_offsets(file_path, offsets, start=0):
+    """
+    Wie iter_sap_lines, liest aber binär und hängt für jede Zeile den
+    Byte-Offset ihres Anfangs an offsets an. Zeilenenden werden wie im
+    Textmodus behandelt (\\n, \\r\\n und einzelnes \\r).
+    Mit start wird ab diesem Byte-Offset (Anfang einer Zeile) gelesen.
+    """
+    if detect_input_format(file_path) is not None:
+        raise ValueError("Byte-Offsets sind nur für unkomprimierte Textdateien möglich")
     
-    lines = content.split('\n')
-    print(f"   Gefunden: {len(lines)} Zeilen")
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        tail = b''
+        with ReadAhead(f) as blocks:
+            for block in blocks:
+                raws = (tail + block).split(b'\n')
+                tail = raws.pop()
+                for raw in raws:
+                    body = raw[:-1] if raw.endswith(b'\r') else raw
+                    # Verbleibende \r sind einzelne Zeilenumbrüche (alte Mac-Zeilenenden)
+                    pos = offset
+                    for part in body.split(b'\r'):
+                        offsets.append(pos)
+                        pos += len(part) + 1
+                        yield part.decode('utf-8', errors='replace')
+                    offset += len(raw) + 1
+        # Letzte Zeile ohne \n – oder die leere Endzeile nach einem \n
+        pos = offset
+        for part in tail.split(b'\r'):
+            offsets.append(pos)
+            pos += len(part) + 1
+            yield part.decode('utf-8', errors='replace')
+
+
+def read_sap_file(file_path):
+    """
+    Liest eine SAP-Report-Datei (Tab-getrennt, auch komprimiert oder als
+    Excel-Datei). Gibt alle Zeilen als Liste von Listen zurück.
+    Für große Dateien besser iter_sap_lines bzw. iter_source_rows.
+    """
+    print(f"\n📂 Lese Datei: {file_path}")
     
     # In Spalten aufteilen
-    all_rows = []
-    for line in lines:
-        columns = line.split('\t')
-        all_rows.append(columns)
+    all_rows = [line.split('\t') for line in iter_sap_lines(file_path, verbose=False)]
+    print(f"   Gefunden: {len(all_rows)} Zeilen")
     
     return all_rows
 
 
+def find_header_column(row):
+    """
+    Gibt den Spaltenindex von 'Material' in einer Zeile zurück (oder None).
+    """
+    for col_idx, cell in enumerate(row):
+        if str(cell).strip().lower() == 'material':
+            return col_idx
+    return None
+
+
 def find_header_row(rows):
     """
-    Findet die Zeile mit den Spaltenüberschriften.
-    Sucht nach 'Material' als erstem Header in Spalte C.
+    Findet die Zeile mit den Spaltenüberschriften (z.B. in den Zeilen von
+    read_sap_file). Sucht nach 'Material' als erstem Header in Spalte C.
+    Gibt (Zeilenindex, Spaltenindex) oder (None, None) zurück.
     """
     for idx, row in enumerate(rows):
-        # Suche in der Zeile nach "Material" (sollte in Spalte C sein, also Index 2)
-        for col_idx, cell in enumerate(row):
-            cell_clean = str(cell).strip().lower()
-            if cell_clean == 'material':
-                print(f"   Header gefunden in Zeile {idx + 1}, Spalte {col_idx + 1}")
-                return idx, col_idx
+        col_idx = find_header_column(row)
+        if col_idx is not None:
+            print(f"   Header gefunden in Zeile {idx + 1}, Spalte {col_idx + 1}")
+            return idx, col_idx
     
     return None, None
 
 
-def process_sap_report(file_path):
-    """
-    Hauptfunktion: Verarbeitet eine SAP-Report-Datei.
+def new_stats():
+    """Gibt ein leeres Statistik-Dictionary zurück."""
+    return {
+        'total_rows': 0,
+        'sum_rows': 0,
+        'empty_rows': 0,
+        'no_material': 0,
+        'kept_rows': 0
+    }
+
+
+def print_stats(stats):
+    """Gibt die Statistik der Bereinigung aus."""
+    print(f"\n📊 Statistik:")
+    print(f"   Gesamt Zeilen:     {stats['total_rows']}")
+    print(f"   Summenzeilen:      {stats['sum_rows']} (gelöscht)")
+    print(f"   Leere Zeilen:      {stats['empty_rows']} (gelöscht)")
+    print(f"   Ohne Materialnr:   {stats['no_material']} (gelöscht)")
+    for reason, count in stats.get('rule_counts', {}).items():
+        print(f"   {reason}: {count} (gelöscht, Filterregel)")
+    print(f"   Bereinigte Zeilen: {stats['kept_rows']}")
+
+
+def locate_header(file_path, offsets=None, verbose=True):
     """
-    # Datei einlesen
-    all_rows = read_sap_file(file_path)
+    Sucht die Header-Zeile, ohne die Datei komplett zu lesen.
     
-    if not all_rows:
-        print("❌ Fehler: Datei ist leer")
-        return None, None
+    Gibt (header_row_idx, header_start_col, lines) zurück; lines ist ein
+    Iterator über die restlichen Rohzeilen (Strings) nach der Header-Zeile.
+    Mit offsets werden die Byte-Offsets aller Zeilen gesammelt (siehe iter_sap_lines).
+    verbose=False unterdrückt die Ausgaben (z.B. für plan_report).
+    """
+    if verbose:
+        print(f"\n📂 Lese Datei: {file_path}")
     
-    # Header-Zeile finden
-    header_row_idx, header_start_col = find_header_row(all_rows)
+    # Header-Zeile finden (nur bis zur Header-Zeile lesen)
+    lines = iter_sap_lines(file_path, offsets, verbose)
+    header_row_idx, header_start_col, header_row = None, None, None
+    for idx, line in enumerate(lines):
+        row = line.split('\t')
+        col_idx = find_header_column(row)
+        if col_idx is not None:
+            if verbose:
+                print(f"   Header gefunden in Zeile {idx + 1}, Spalte {col_idx + 1}")
+            header_row_idx, header_start_col, header_row = idx, col_idx, row
+            break
     
     if header_row_idx is None:
-        print("⚠ Warnung: Header-Zeile nicht automatisch gefunden")
-        print("   Verwende Standard: Zeile 4, Spalte C (Index 2)")
+        if verbose:
+            print("⚠ Warnung: Header-Zeile nicht automatisch gefunden")
+            print("   Verwende Standard: Zeile 4, Spalte C (Index 2)")
         header_row_idx = 3  # 0-basiert, also Zeile 4
         header_start_col = 2  # Spalte C
+        # Datei erneut öffnen und bis hinter die Standard-Header-Zeile springen
+        if offsets is not None:
+            del offsets[:]
+        lines = iter_sap_lines(file_path, offsets, verbose)
+        header_row = next(islice(lines, header_row_idx, None), '').split('\t')
     
-    # Header extrahieren
-    header_row = all_rows[header_row_idx]
+    # Extrahiere Header für Spalten C-Q
+    extracted_headers = [str(header_row[i]).strip() if i < len(header_row) else f'Col_{i}'
+                         for i in range(header_start_col, header_start_col + len(EXPECTED_HEADERS))]
     
-    # Relevante Spalten: C bis Q = Index 2 bis 16 (15 Spalten)
-    # Stelle sicher, dass genug Spalten vorhanden sind
-    num_expected_cols = 15  # C bis Q
+    if verbose:
+        print(f"\n📋 Extrahierte Header: {extracted_headers}")
+        
+        # Verwende erwartete Header für Konsistenz
+        print(f"   Verwende Standard-Header: {EXPECTED_HEADERS}")
     
-    # Extrahiere Header für Spalten C-Q
-    extracted_headers = []
-    for i in range(header_start_col, header_start_col + num_expected_cols):
-        if i < len(header_row):
-            extracted_headers.append(str(header_row[i]).strip())
-        else:
-            extracted_headers.append(f'Col_{i}')
+    return header_row_idx, header_start_col, lines
+
+
+class _LastOffset(list):
+    """Offset-Liste für iter_lines_with_offsets, die nur den Anfang der aktuellen Zeile behält."""
     
-    print(f"\n📋 Extrahierte Header: {extracted_headers}")
+    def append(self, offset):
+        self[:] = [offset]
+
+
+def iter_cleaned_rows(file_path, stats, deleted_rows=None, index=None, tracker=None, rules=None,
+                      resume=None, checkpoint=None, plan=None, verbose=True):
+    """
+    Generator: Liest die Datei zeilenweise und liefert (Zeilennummer, Datenzeile)
+    für jede behaltene Zeile (Spalten C bis Q als Strings).
     
-    # Verwende erwartete Header für Konsistenz
-    print(f"   Verwende Standard-Header: {EXPECTED_HEADERS}")
+    stats wird dabei fortlaufend aktualisiert. Gelöschte Zeilen werden an
+    deleted_rows angehängt (Liste oder Objekt mit append), falls angegeben.
+    Mit index (ReportIndex) wird im selben Durchlauf der Sidecar-Index aufgebaut.
+    Mit tracker (ProgressTracker) wird alle PROGRESS_BATCH Zeilen der
+    Fortschritt gemeldet und auf Abbruch geprüft.
+    Mit rules (Liste von FilterRule) werden zusätzliche Löschregeln direkt
+    beim Lesen angewendet; gezählt wird in stats['rule_counts']. Zahlen und
+    Datumswerte liest die Regel nach plan (FormatPlan). Ein fehlender oder
+    offener plan (FormatPlan()) wird aus den ersten Zeilen dieses Durchlaufs
+    bestimmt; ein offener gilt danach auch für Index und Aufrufer.
+    verbose=False unterdrückt die Ausgaben beim Lesen des Headers.
     
-    # Daten sammeln (nach Header-Zeile)
-    cleaned_data = []
-    deleted_rows = []
+    checkpoint ist ein Callback, der alle PROGRESS_BATCH Zeilen vor der
+    nächsten Zeile mit deren Position aufgerufen wird (offset, row_idx,
+    header_row_idx, header_start_col). Mit resume (eine solche Position)
+    wird ab dort weitergelesen; stats muss dann den Stand von damals haben.
+    Beides nur für unkomprimierte Textdateien und ohne index; der fortgesetzte
+    Durchlauf beginnt mitten in der Datei und braucht daher einen fertigen plan.
+    """
+    if (resume is not None or checkpoint is not None) and index is not None:
+        raise ValueError("Checkpoints sind nicht mit dem Sidecar-Index kombinierbar")
+    sampled = resume is None and checkpoint is None
+    if plan is not None and not plan.planned and not sampled:
+        raise ValueError("Checkpoints brauchen einen vorab bestimmten FormatPlan (plan_report)")
+    if rules:
+        stats.setdefault('rule_counts', OrderedDict((rule.reason, 0) for rule in rules))
+        plan = plan or (FormatPlan() if sampled else plan_report(file_path))
+        # Regeln lesen die Zellen nur zum Filtern; Abweichungen vom Format
+        # zählt und meldet erst die Konvertierung der behaltenen Zeilen
+        rule_plan = plan.copy()
+    offsets = index.line_offsets if index is not None else None
+    if resume is not None or checkpoint is not None:
+        offsets = _LastOffset()
     
-    stats = {
-        'total_rows': 0,
-        'sum_rows': 0,
-        'empty_rows': 0,
-        'no_material': 0,
-        'kept_rows': 0
-    }
+    if resume is not None:
+        header_row_idx, header_start_col = resume['header_row_idx'], resume['header_start_col']
+        print(f"\n📂 Lese Datei ab Zeile {resume['row_idx'] + 1} (Byte {resume['offset']}): {file_path}")
+        lines = iter_lines_with_offsets(file_path, offsets, resume['offset'])
+        first_row_idx = resume['row_idx']
+    else:
+        header_row_idx, header_start_col, lines = locate_header(file_path, offsets, verbose)
+        first_row_idx = header_row_idx + 1
+    if plan is not None and not plan.planned:
+        lines = plan.sample_lines(lines, header_start_col)
+    if index is not None:
+        index.header_start_col = header_start_col
+    
+    # Relevante Spalten: C bis Q = Index 2 bis 16 (15 Spalten)
+    num_expected_cols = 15  # C bis Q
+    col_range = range(header_start_col, header_start_col + num_expected_cols)
     
-    for row_idx in range(header_row_idx + 1, len(all_rows)):
-        row = all_rows[row_idx]
+    # Zeichen ab der Header-Zeile (≈ Bytes bei Textdateien), beim Fortsetzen ab Dateianfang
+    bytes_read = resume['offset'] if resume is not None else 0
+    for row_idx, line in enumerate(lines, start=first_row_idx):
+        if checkpoint is not None and stats['total_rows'] % PROGRESS_BATCH == 0:
+            checkpoint({'offset': offsets[-1], 'row_idx': row_idx,
+                        'header_row_idx': header_row_idx, 'header_start_col': header_start_col})
+        if tracker is not None:
+            bytes_read += len(line) + 1
+            if stats['total_rows'] % PROGRESS_BATCH == 0:
+                tracker.update(stats['total_rows'], bytes_read)
+        row = line.split('\t')
         stats['total_rows'] += 1
         
         # Prüfe auf komplett leere Zeile
@@ -279,129 +885,3725 @@ def process_sap_report(file_path):
         if col_b == '*' or col_b == '**':
             stats['sum_rows'] += 1
             # Speichere mit Grund
-            deleted_rows.append({
-                'Grund': 'Summenzeile',
-                'Original_Zeile': row_idx + 1,
-                'Daten': '\t'.join(str(c) for c in row)
-            })
+            if deleted_rows is not None:
+                deleted_rows.append({
+                    'Grund': 'Summenzeile',
+                    'Original_Zeile': row_idx + 1,
+                    'Daten': '\t'.join(str(c) for c in row)
+                })
             continue
         
         # Extrahiere Spalten C bis Q
-        data_row = []
-        for i in range(header_start_col, header_start_col + num_expected_cols):
-            if i < len(row):
-                data_row.append(str(row[i]).strip())
-            else:
-                data_row.append('')
+        data_row = [str(row[i]).strip() if i < len(row) else '' for i in col_range]
         
         # Prüfe auf Materialnummer in Spalte C (erstes Element)
-        material_nr = data_row[0] if data_row else ''
-        if not material_nr:
+        if not data_row[0]:
             stats['no_material'] += 1
-            deleted_rows.append({
-                'Grund': 'Keine Materialnummer',
-                'Original_Zeile': row_idx + 1,
-                'Daten': '\t'.join(data_row)
-            })
+            if deleted_rows is not None:
+                deleted_rows.append({
+                    'Grund': 'Keine Materialnummer',
+                    'Original_Zeile': row_idx + 1,
+                    'Daten': '\t'.join(data_row)
+                })
             continue
         
-        # Zeile behalten
-        cleaned_data.append(data_row)
+        # Zeile behalten (der Index enthält auch Zeilen, die Filterregeln entfernen)
+        if index is not None:
+            index.add_row(row_idx, data_row)
+        
+        if rules:
+            rule = matching_rule(rules, data_row, rule_plan)
+            if rule is not None:
+                stats['rule_counts'][rule.reason] += 1
+                if deleted_rows is not None:
+                    deleted_rows.append({
+                        'Grund': rule.reason,
+                        'Original_Zeile': row_idx + 1,
+                        'Daten': '\t'.join(data_row)
+                    })
+                continue
+        
         stats['kept_rows'] += 1
+        yield row_idx, data_row
+
+
+class ColumnBuffer:
+    """
+    Sammelt Zeilen spaltenweise statt als Liste von Listen.
     
-    print(f"\n📊 Statistik:")
-    print(f"   Gesamt Zeilen:     {stats['total_rows']}")
-    print(f"   Summenzeilen:      {stats['sum_rows']} (gelöscht)")
-    print(f"   Leere Zeilen:      {stats['empty_rows']} (gelöscht)")
-    print(f"   Ohne Materialnr:   {stats['no_material']} (gelöscht)")
-    print(f"   Bereinigte Zeilen: {stats['kept_rows']}")
+    Jede Spalte ist wörterbuchkodiert: gleiche Werte (Arbeitsplatz, Datum,
+    Material, Mengen, ...) liegen nur einmal als String im Speicher, pro
+    Zeile und Spalte kommt nur ein 4-Byte-Code in ein array('i').
+    Zeilen werden in Blöcken zu batch_size gesammelt und spaltenweise mit
+    pd.factorize kodiert. to_frame() setzt die Spalten per NumPy-Take
+    zusammen und gibt die Codes dabei spaltenweise frei.
+    """
+    
+    def __init__(self, columns, batch_size=CSV_BATCH_SIZE):
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.codes = [array('i') for _ in self.columns]
+        self.values = [{} for _ in self.columns]
+        self.pending = []
+        self.length = 0
+    
+    def __len__(self):
+        return self.length + len(self.pending)
+    
+    def append(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """Kodiert die gesammelten Zeilen in die Spaltenpuffer."""
+        if not self.pending:
+            return
+        block = np.empty((len(self.pending), len(self.columns)), dtype=object)
+        block[:] = self.pending
+        for pos in range(len(self.columns)):
+            block_codes, uniques = pd.factorize(block[:, pos])
+            values = self.values[pos]
+            mapping = np.array([values.setdefault(value, len(values)) for value in uniques],
+                               dtype=np.int32)
+            self.codes[pos].frombytes(mapping[block_codes].tobytes())
+        self.length += len(self.pending)
+        self.pending = []
+    
+    def column(self, pos):
+        """Spalte als object-Array (Werte in Zeilenreihenfolge)."""
+        uniques = np.empty(len(self.values[pos]), dtype=object)
+        uniques[:] = list(self.values[pos])  # dict-Reihenfolge = Code-Reihenfolge
+        return uniques[np.frombuffer(self.codes[pos], dtype=np.int32)] if self.length else uniques[:0]
+    
+    def to_frame(self):
+        """Baut den DataFrame; der Puffer ist danach leer."""
+        self.flush()
+        data = {}
+        for pos, col in enumerate(self.columns):
+            data[col] = self.column(pos)
+            self.codes[pos], self.values[pos] = array('i'), {}
+        self.length = 0
+        return pd.DataFrame(data, columns=self.columns)
+
+
+def process_sap_report(file_path, index=None, progress=None, cancel=None, rules=None, profile=None,
+                       plan=None):
+    """
+    Hauptfunktion: Verarbeitet eine SAP-Report-Datei.
+    Mit index (ReportIndex) wird dabei der Sidecar-Index aufgebaut.
+    
+    progress ist ein optionaler Callback für Fortschrittsmeldungen (siehe
+    ProgressTracker), cancel ein optionales CancelToken.
+    rules (Liste von FilterRule, siehe load_rules) werden nach dem Einlesen
+    vektorisiert in einem Durchgang angewendet, Zahlen und Datumswerte nach
+    plan (FormatPlan des Reports, sonst plan_frame der eingelesenen Zeilen;
+    ein offener Plan wird beim Einlesen bestimmt, siehe iter_cleaned_rows).
+    Mit profile (ReportProfile) wird das Spaltenprofil der behaltenen Zeilen
+    erstellt (nach den Filterregeln, Rohwerte vor der Konvertierung).
+    """
+    # Daten sammeln (nach Header-Zeile)
+    deleted_rows = []
+    stats = new_stats()
+    
+    tracker = ProgressTracker(progress, cancel)
+    total_bytes = os.path.getsize(file_path) if detect_input_format(file_path) is None else None
+    tracker.start('read', total_bytes=total_bytes)
+    
+    # Spaltenweise sammeln (siehe ColumnBuffer) statt einer Liste pro Zeile
+    cleaned_data = ColumnBuffer(EXPECTED_HEADERS)
+    row_numbers = array('q')
+    for row_idx, data_row in iter_cleaned_rows(file_path, stats, deleted_rows, index, tracker, plan=plan):
+        cleaned_data.append(data_row)
+        row_numbers.append(row_idx)
+    tracker.finish(stats['total_rows'])
     
     # DataFrame erstellen
-    df = pd.DataFrame(cleaned_data, columns=EXPECTED_HEADERS)
+    df = cleaned_data.to_frame()
     df_deleted = pd.DataFrame(deleted_rows)
     
+    if rules:
+        df, df_ruled, stats['rule_counts'] = apply_rules(df, rules, np.frombuffer(row_numbers, dtype=np.int64),
+                                                         plan)
+        stats['kept_rows'] = len(df)
+        if len(df_ruled):
+            # Protokoll wieder in Dateireihenfolge
+            df_deleted = (pd.concat([df_deleted, df_ruled], ignore_index=True)
+                          .sort_values('Original_Zeile', kind='stable', ignore_index=True))
+    
+    if profile is not None:
+        profile.add_frame(df)
+    
+    print_stats(stats)
+    
     print(f"\n✅ DataFrame erstellt: {df.shape[0]} Zeilen, {df.shape[1]} Spalten")
     
     return df, df_deleted
 
 
-def convert_data_types(df):
+def to_datetime_column(values, warn=True):
+    """
+    Parst eine Datumsspalte vektorisiert zu datetime64[ns] (für Spalten
+    außerhalb eines Reports, z.B. in oee.py; Reports nutzen ihren FormatPlan).
+    
+    Das Format wird wie bei plan_formats aus einer Stichprobe der
+    verschiedenen Werte bestimmt, gelesen wird mit DateFormat. Jeder
+    unterschiedliche Wert wird nur einmal geparst; nicht lesbare Werte werden NaT.
+    """
+    series = pd.Series(values)
+    sample = pd.unique(series.dropna().astype(str).str.strip())[:FORMAT_SAMPLE_ROWS]
+    fmt = DateFormat(DATE_COLUMN, infer_date_format(set(sample) - {''}))
+    result = fmt.to_date_column(series, native=True)
+    
+    if warn and fmt.unreadable:
+        print(f"   ⚠ {fmt.unreadable} Datumswerte nicht lesbar (als leer übernommen)")
+    return result
+
+
+def convert_data_types(df, native_dates=False, progress=None, cancel=None, plan=None):
     """
     Konvertiert Spalten in die korrekten Datentypen.
+    Zahlenspalten werden Int64 (nullable, fehlende Werte = <NA>).
+    
+    Zahlen- und Datumsformat jeder Spalte werden vorab aus einer Stichprobe
+    bestimmt (plan_frame, oder ein vorgegebener FormatPlan); Werte, die
+    nicht dazu passen, werden einzeln gelesen und gemeldet.
+    
+    Mit native_dates=True bleibt Pstng Date ein echtes Datum (datetime64)
+    statt eines 'DD.MM.YYYY'-Strings; formatiert wird erst beim Export.
+    Fortschritt und Abbruch (progress, cancel) werden nach jeder Spalte
+    gemeldet bzw. geprüft.
     """
     print("\n🔄 Konvertiere Datentypen...")
+    plan = plan or plan_frame(df)
+    plan.describe()
     
-    # Numerische Spalten
-    for col in NUMERIC_COLUMNS:
-        if col in df.columns:
-            df[col] = df[col].apply(clean_number)
-    
-    # Datum-Spalte
-    if DATE_COLUMN in df.columns:
-        df[DATE_COLUMN] = df[DATE_COLUMN].apply(convert_date)
+    tracker = ProgressTracker(progress, cancel)
+    tracker.start('convert', total_rows=len(df))
+    columns = NUMERIC_COLUMNS + [DATE_COLUMN] + TEXT_COLUMNS
     
-    # Text-Spalten bleiben wie sie sind
-    for col in TEXT_COLUMNS:
-        if col in df.columns:
+    for step, col in enumerate(columns, start=1):
+        if col not in df.columns:
+            pass
+        elif col in NUMERIC_COLUMNS:
+            # Numerische Spalten
+            df[col] = plan[col].to_int_column(df[col])
+        elif col == DATE_COLUMN:
+            # Datum-Spalte
+            df[DATE_COLUMN] = plan[DATE_COLUMN].to_date_column(df[DATE_COLUMN], native=native_dates)
+        else:
+            # Text-Spalten bleiben wie sie sind
             df[col] = df[col].astype(str).replace('nan', '').replace('None', '')
+        # Zeilen anteilig zur Zahl der bereits konvertierten Spalten
+        tracker.update(len(df) * step // len(columns))
     
+    tracker.finish(len(df))
+    plan.report()
     print("   ✓ Datentypen konvertiert")
     return df
 
 
-def export_results(df, df_deleted, input_file):
+def atomic_write(path, write_func):
     """
-    Exportiert die Ergebnisse als CSV und Excel.
+    Schreibt über write_func(tmp_pfad) zuerst in eine temporäre Datei im
+    Zielordner und benennt sie erst danach um. So entstehen nie halb
+    geschriebene Ausgabedateien.
     """
-    input_path = Path(input_file)
-    base_name = input_path.stem
-    output_dir = input_path.parent
-    
-    # CSV Export
-    csv_path = output_dir / f"{base_name}_cleaned.csv"
-    df.to_csv(csv_path, index=False, sep=';', encoding='utf-8-sig')
-    print(f"\n💾 CSV exportiert: {csv_path}")
-    
-    # Excel Export
-    if install_openpyxl():
-        excel_path = output_dir / f"{base_name}_cleaned.xlsx"
-        try:
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Bereinigte Daten', index=False)
-                if not df_deleted.empty:
-                    df_deleted.to_excel(writer, sheet_name='Gelöschte Zeilen', index=False)
-            print(f"💾 Excel exportiert: {excel_path}")
-        except Exception as e:
-            print(f"⚠ Excel-Export fehlgeschlagen: {e}")
-            # Fallback: Gelöschte Zeilen als separate CSV
-            deleted_csv = output_dir / f"{base_name}_deleted.csv"
-            df_deleted.to_csv(deleted_csv, index=False, sep=';', encoding='utf-8-sig')
-            print(f"💾 Gelöschte Zeilen als CSV: {deleted_csv}")
-    else:
-        # Fallback: Gelöschte Zeilen als separate CSV
-        deleted_csv = output_dir / f"{base_name}_deleted.csv"
-        df_deleted.to_csv(deleted_csv, index=False, sep=';', encoding='utf-8-sig')
-        print(f"💾 Gelöschte Zeilen als CSV: {deleted_csv}")
-    
-    return csv_path
+    path = Path(path)
+    # Endung bleibt erhalten (pandas wählt das Excel-Format anhand der Endung)
+    tmp_path = str(path.parent / f".{path.stem}.{uuid.uuid4().hex[:8]}.tmp{path.suffix}")
+    try:
+        write_func(tmp_path)
+        os.replace(tmp_path, str(path))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
 
 
-def select_file():
+def write_csv(df, path, compression=None, tracker=None):
     """
-    Dateiauswahl (interaktiv oder per Argument).
+    Schreibt einen DataFrame als Excel-kompatible CSV (;, UTF-8 mit BOM),
+    optional gzip- oder zstd-komprimiert. Datumsspalten (datetime64) werden
+    dabei vektorisiert als DD.MM.YYYY formatiert.
+    Mit tracker wird in Blöcken zu EXPORT_BATCH_SIZE Zeilen geschrieben und
+    nach jedem Block Fortschritt gemeldet bzw. auf Abbruch geprüft.
     """
-    # Prüfe Kommandozeilenargument
-    if len(sys.argv) > 1:
-        file_path = Path(sys.argv[1])
-        if file_path.exists():
-            return str(file_path.resolve())
-        else:
-            print(f"❌ Datei nicht gefunden: {sys.argv[1]}")
-            raise FileNotFoundError(f"Datei nicht gefunden: {sys.argv[1]}")
+    def write(tmp):
+        with open_output_text(tmp, compression) as f:
+            if tracker is None:
+                df.to_csv(f, index=False, sep=';', date_format=DATE_OUTPUT_FORMAT)
+                return
+            for start in range(0, max(len(df), 1), EXPORT_BATCH_SIZE):
+                df.iloc[start:start + EXPORT_BATCH_SIZE].to_csv(
+                    f, index=False, sep=';', date_format=DATE_OUTPUT_FORMAT, header=start == 0)
+                tracker.update(min(start + EXPORT_BATCH_SIZE, len(df)))
+    return atomic_write(path, write)
+
+
+def sheet_columns(df, sheet=None):
+    """
+    Spalten eines DataFrames als Listen für openpyxl/sqlite: leere Werte
+    (NA, '') werden None. Datumsspalten werden mit sheet zu Excel-Datumszellen
+    (DD.MM.YYYY), sonst zu Text im ISO-Format (YYYY-MM-DD).
+    """
+    from openpyxl.cell import WriteOnlyCell
     
-    # Versuche tkinter Dialog
-    try:
-        # Tk Deprecation-Warnung unterdrücken (macOS)
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            if sheet is None:
+                dates = values.dt.strftime('%Y-%m-%d')
+                columns.append(dates.astype(object).where(values.notna(), None).tolist())
+                continue
+            cells = []
+            for value in values.dt.to_pydatetime():
+                if pd.isna(value):
+                    cells.append(None)
+                    continue
+                cell = WriteOnlyCell(sheet, value=value)
+                cell.number_format = DATE_EXCEL_FORMAT
+                cells.append(cell)
+            columns.append(cells)
+            continue
+        values = values.astype(object).where(values.notna(), None).tolist()
+        columns.append([None if value == '' else value for value in values])
+    return columns
+
+
+def excel_sheet_count(rows, max_rows=None):
+    """Anzahl Tabellenblätter für rows Datenzeilen (jedes Blatt mit Kopfzeile)."""
+    return max(1, -(-rows // ((max_rows or EXCEL_MAX_ROWS) - 1)))
+
+
+class SplitSheet:
+    """
+    Tabellenblatt einer write-only-Arbeitsmappe, das bei Erreichen der
+    Excel-Zeilengrenze in Fortsetzungsblättern 'Name (2)', 'Name (3)', ...
+    weiterschreibt. Jedes Blatt beginnt mit der Kopfzeile; das erste Blatt
+    wird sofort angelegt, Fortsetzungen erst mit der ersten Zeile darin.
+    """
+    
+    def __init__(self, workbook, title, header, max_rows=None):
+        self.workbook = workbook
+        self.title = title
+        self.header = list(header)
+        self.max_rows = max_rows or EXCEL_MAX_ROWS
+        self.sheets = 0
+        self.rows = 0
+        self.next_sheet()
+    
+    def next_sheet(self):
+        self.sheets += 1
+        title = self.title if self.sheets == 1 else f"{self.title} ({self.sheets})"
+        self.sheet = self.workbook.create_sheet(title)
+        self.sheet.append(self.header)
+        self.free = self.max_rows - 1
+    
+    def append(self, row):
+        if not self.free:
+            self.next_sheet()
+        self.sheet.append(row)
+        self.free -= 1
+        self.rows += 1
+
+
+def append_sheet(sheet, df):
+    """Hängt die Zeilen eines DataFrames an ein SplitSheet an."""
+    for row in zip(*sheet_columns(df, sheet.sheet)):
+        sheet.append(row)
+
+
+def apply_date_format(sheet, df):
+    """
+    Setzt DD.MM.YYYY als Zahlenformat für alle datetime64-Spalten eines mit
+    pandas (openpyxl) geschriebenen Blatts, z.B. in oee.py.
+    (Der openpyxl-Writer von pandas reicht date_format nicht weiter.)
+    """
+    for pos, col in enumerate(df.columns, start=1):
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            for (cell,) in sheet.iter_rows(min_row=2, max_row=len(df) + 1, min_col=pos, max_col=pos):
+                cell.number_format = DATE_EXCEL_FORMAT
+
+
+def announce_sheets(title, rows):
+    """Meldet vorab, wenn rows Zeilen nicht in ein Excel-Blatt passen."""
+    sheets = excel_sheet_count(rows)
+    if sheets > 1:
+        print(f"📑 {rows} Zeilen passen nicht in ein Excel-Blatt – "
+              f"'{title}' wird auf {sheets} Blätter verteilt")
+
+
+class ExportSink(ABC):
+    """
+    Ein Ausgabeformat für export_results.
+    
+    Die bereinigten Daten werden nur einmal in Blöcken durchlaufen (siehe
+    fan_out) und jedem Sink übergeben: open(erster Block), write(Block) für
+    jeden Block, zum Schluss close(). Geschrieben wird in eine temporäre
+    Datei, die erst bei close() umbenannt wird; abort() verwirft sie.
+    
+    Eigene Formate: Unterklasse mit suffix, open/write/finish (und release
+    zum Freigeben ohne Abschluss) und ein Eintrag in EXPORT_SINKS.
+    context enthält compression, deleted (DataFrame der gelöschten Zeilen)
+    sowie validation und profile (Tabellen oder None), rows die Zeilenzahl;
+    optional sheet bzw. table als Name des Datenblatts (siehe write_rows).
+    """
+    
+    label = 'Datei'
+    suffix = ''
+    
+    def __init__(self, path, context):
+        self.path = Path(path)
+        self.context = context
+        self.tmp_path = str(self.path.parent / f".{self.path.stem}.{uuid.uuid4().hex[:8]}.tmp{self.path.suffix}")
+    
+    @classmethod
+    def file_name(cls, base_name, compression=None):
+        return f"{base_name}{cls.suffix}"
+    
+    def open(self, batch):
+        pass
+    
+    @abstractmethod
+    def write(self, batch):
+        """Schreibt einen Block (DataFrame) in die temporäre Datei."""
+    
+    def finish(self):
+        """Schreibt den Abschluss und schließt die temporäre Datei."""
+    
+    def release(self):
+        """Schließt offene Dateien ohne Abschluss (bei Fehler oder Abbruch)."""
+    
+    def close(self):
+        self.finish()
+        os.replace(self.tmp_path, str(self.path))
+    
+    def abort(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class CsvSink(ExportSink):
+    """[name]_cleaned.csv wie write_csv (;, UTF-8 mit BOM, optional komprimiert)."""
+    
+    label = 'CSV'
+    suffix = '_cleaned.csv'
+    
+    @classmethod
+    def file_name(cls, base_name, compression=None):
+        return f"{base_name}{cls.suffix}{COMPRESSION_SUFFIXES.get(compression, '')}"
+    
+    def open(self, batch):
+        self.file = open_output_text(self.tmp_path, self.context.get('compression'))
+        self.header = True
+    
+    def write(self, batch):
+        batch.to_csv(self.file, index=False, sep=';', date_format=DATE_OUTPUT_FORMAT, header=self.header)
+        self.header = False
+    
+    def finish(self):
+        self.file.close()
+    
+    release = finish
+
+
+class ExcelSink(ExportSink):
+    """
+    [name]_cleaned.xlsx mit den Blättern 'Bereinigte Daten', 'Gelöschte
+    Zeilen' und ggf. 'Validierung'/'Profil'. openpyxl im write-only-Modus:
+    die Zeilen werden blockweise geschrieben statt als Zellobjekte gesammelt.
+    Datumsspalten (datetime64) werden echte Excel-Datumszellen (DD.MM.YYYY).
+    Über EXCEL_MAX_ROWS hinaus geht es in Fortsetzungsblättern weiter.
+    """
+    
+    label = 'Excel'
+    suffix = '_cleaned.xlsx'
+    
+    def open(self, batch):
+        from openpyxl import Workbook
+        self.workbook = Workbook(write_only=True)
+        if 'rows' in self.context:
+            announce_sheets(self.context.get('sheet', 'Bereinigte Daten'), self.context['rows'])
+        self.sheet = SplitSheet(self.workbook, self.context.get('sheet', 'Bereinigte Daten'), batch.columns)
+    
+    def write(self, batch):
+        append_sheet(self.sheet, batch)
+    
+    def finish(self):
+        extra_sheets = (('Gelöschte Zeilen', self.context.get('deleted')),
+                        ('Validierung', self.context.get('validation')),
+                        ('Profil', self.context.get('profile')))
+        for name, df in extra_sheets:
+            if df is None or (name == 'Gelöschte Zeilen' and df.empty):
+                continue
+            announce_sheets(name, len(df))
+            sheet = SplitSheet(self.workbook, name, df.columns)
+            for start in range(0, len(df), EXPORT_BATCH_SIZE):
+                append_sheet(sheet, df.iloc[start:start + EXPORT_BATCH_SIZE])
+        self.workbook.save(self.tmp_path)
+    
+    def release(self):
+        # Blätter schließen, damit openpyxl seine Zwischendateien freigibt
+        for sheet in self.workbook.worksheets:
+            sheet.close()
+
+
+class ParquetSink(ExportSink):
+    """[name]_cleaned.parquet (pyarrow), ein Row Group je Block – für Notebooks."""
+    
+    label = 'Parquet'
+    suffix = '_cleaned.parquet'
+    
+    def open(self, batch):
+        pa = require_pyarrow()
+        import pyarrow.parquet as pq
+        # Spalten, die im ersten Block nur leer sind, werden Text
+        schema = pa.Schema.from_pandas(batch, preserve_index=False)
+        for pos, field in enumerate(schema):
+            if pa.types.is_null(field.type):
+                schema = schema.set(pos, pa.field(field.name, pa.string()))
+        self.writer = pq.ParquetWriter(self.tmp_path, schema)
+    
+    def write(self, batch):
+        import pyarrow as pa
+        self.writer.write_table(pa.Table.from_pandas(batch, schema=self.writer.schema, preserve_index=False))
+    
+    def finish(self):
+        self.writer.close()
+    
+    release = finish
+
+
+class SqliteSink(ExportSink):
+    """
+    [name]_cleaned.sqlite mit den Tabellen 'bereinigt' und 'geloescht'.
+    Leere Werte werden NULL, Pstng Date Text im ISO-Format (YYYY-MM-DD).
+    """
+    
+    label = 'SQLite'
+    suffix = '_cleaned.sqlite'
+    
+    def open(self, batch):
+        import sqlite3
+        self.connection = sqlite3.connect(self.tmp_path)
+        self.create_table(self.context.get('table', 'bereinigt'), batch)
+    
+    def create_table(self, table, df):
+        types = []
+        for col in df.columns:
+            kind = df[col].dtype.kind
+            types.append('INTEGER' if kind in 'iu' else 'REAL' if kind == 'f' else 'TEXT')
+        columns = ', '.join(f'"{col}" {kind}' for col, kind in zip(df.columns, types))
+        self.connection.execute(f'CREATE TABLE "{table}" ({columns})')
+        self.table = table
+    
+    def insert(self, table, df):
+        placeholders = ', '.join('?' * len(df.columns))
+        self.connection.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})',
+                                    zip(*sheet_columns(df)))
+    
+    def write(self, batch):
+        if DATE_COLUMN in batch.columns and not pd.api.types.is_datetime64_any_dtype(batch[DATE_COLUMN]):
+            # Datumstext (DD.MM.YYYY) als YYYY-MM-DD, damit er in SQL sortierbar ist;
+            # umgerechnet wird je verschiedenem Datum
+            codes, uniques = pd.factorize(batch[DATE_COLUMN].to_numpy(dtype=object))
+            dates = cleaned_plan()[DATE_COLUMN].to_date_column(pd.Series(uniques, dtype=object))
+            iso = dates.dt.strftime('%Y-%m-%d').astype(object).where(dates.notna(), pd.Series(uniques, dtype=object))
+            batch = batch.assign(**{DATE_COLUMN: iso.to_numpy()[codes]})
+        self.insert(self.table, batch)
+    
+    def finish(self):
+        deleted = self.context.get('deleted')
+        if deleted is not None:
+            self.create_table('geloescht', deleted)
+            self.insert('geloescht', deleted)
+        self.connection.commit()
+        self.connection.close()
+    
+    def release(self):
+        self.connection.close()
+
+
+class SummarySink(ExportSink):
+    """
+    [name]_summary.json: Zeilen, Zeitraum und Verbrauch (Withdrawn) gesamt,
+    je Arbeitsplatz und je Monat – blockweise aufsummiert.
+    """
+    
+    label = 'Zusammenfassung'
+    suffix = '_summary.json'
+    
+    def open(self, batch):
+        self.rows = 0
+        self.withdrawn = 0
+        self.first_date, self.last_date = None, None
+        self.work_centers = {}
+        self.months = {}
+    
+    @staticmethod
+    def add(totals, groups):
+        for key, (rows, withdrawn) in groups.items():
+            entry = totals.setdefault(key, [0, 0])
+            entry[0] += int(rows)
+            entry[1] += int(withdrawn)
+    
+    def write(self, batch):
+        if batch.empty:
+            return
+        withdrawn = pd.to_numeric(batch['Withdrawn'], errors='coerce').fillna(0)
+        dates = batch[DATE_COLUMN]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = cleaned_plan()[DATE_COLUMN].to_date_column(dates)
+        self.rows += len(batch)
+        self.withdrawn += int(withdrawn.sum())
+        if dates.notna().any():
+            low, high = dates.min(), dates.max()
+            self.first_date = low if self.first_date is None else min(self.first_date, low)
+            self.last_date = high if self.last_date is None else max(self.last_date, high)
+        
+        # Monat als Zahl JJJJMM (0 = ohne Datum), formatiert wird erst am Ende
+        months = (dates.dt.year * 100 + dates.dt.month).fillna(0).astype('int64')
+        frame = pd.DataFrame({'work_ctr': batch['Work Ctr'].astype(str).to_numpy(),
+                              'month': months.to_numpy(),
+                              'withdrawn': withdrawn.to_numpy()})
+        for column, totals in (('work_ctr', self.work_centers), ('month', self.months)):
+            groups = frame.groupby(column, sort=False)['withdrawn'].agg(['size', 'sum'])
+            self.add(totals, dict(zip(groups.index.tolist(), zip(groups['size'], groups['sum']))))
+    
+    def finish(self):
+        summary = {
+            'rows': self.rows,
+            'withdrawn': self.withdrawn,
+            'first_date': format_value(self.first_date) if self.first_date is not None else None,
+            'last_date': format_value(self.last_date) if self.last_date is not None else None,
+            'work_centers': [{'work_ctr': key, 'rows': rows, 'withdrawn': withdrawn}
+                             for key, (rows, withdrawn) in sorted(self.work_centers.items())],
+            'months': [{'month': f"{key // 100:04d}-{key % 100:02d}" if key else PARTITION_EMPTY,
+                        'rows': rows, 'withdrawn': withdrawn}
+                       for key, (rows, withdrawn) in sorted(self.months.items())],
+        }
+        with open(self.tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+# Registrierte Ausgabeformate für export_results (--outputs); eigene Formate hier ergänzen
+EXPORT_SINKS = {
+    'csv': CsvSink,
+    'xlsx': ExcelSink,
+    'parquet': ParquetSink,
+    'sqlite': SqliteSink,
+    'summary': SummarySink,
+}
+
+# Standard-Ausgaben
+DEFAULT_OUTPUTS = ('csv', 'xlsx')
+
+
+def check_outputs(outputs):
+    """Prüft die Namen der Ausgabeformate und gibt sie als Liste zurück."""
+    outputs = list(outputs or DEFAULT_OUTPUTS)
+    unknown = [name for name in outputs if name not in EXPORT_SINKS]
+    if unknown:
+        raise ValueError(f"Unbekannte Ausgabe: {', '.join(unknown)} (erlaubt: {', '.join(EXPORT_SINKS)})")
+    return outputs
+
+
+class _SinkWorker:
+    """
+    Schreibt die Blöcke eines Sinks in einem eigenen Thread (siehe fan_out).
+    Die Queue nimmt höchstens FAN_OUT_QUEUE Blöcke auf; ist sie voll, wartet
+    fan_out, der langsamste Sink bestimmt also das Tempo. Nach einem Fehler
+    wird die Datei verworfen und die Queue nur noch geleert.
+    """
+    
+    _END = object()
+    _ABORT = object()
+    
+    def __init__(self, sink):
+        self.sink = sink
+        self.error = None
+        self.queue = queue.Queue(maxsize=FAN_OUT_QUEUE)
+        self.thread = threading.Thread(target=self._run, name=f"export-{sink.label}", daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        opened = False
+        while True:
+            batch = self.queue.get()
+            if batch is self._ABORT:
+                self.sink.abort()
+                return
+            if batch is self._END:
+                break
+            if self.error is not None:
+                continue
+            try:
+                if not opened:
+                    self.sink.open(batch)
+                    opened = True
+                self.sink.write(batch)
+            except Exception as e:
+                self.error = e
+                self.sink.abort()
+        if self.error is None:
+            try:
+                self.sink.close()
+            except Exception as e:
+                self.error = e
+                self.sink.abort()
+    
+    def put(self, batch):
+        self.queue.put(batch)
+    
+    def finish(self):
+        self.queue.put(self._END)
+        self.thread.join()
+    
+    def cancel(self):
+        self.queue.put(self._ABORT)
+        self.thread.join()
+
+
+def fan_out(df, sinks, tracker=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Durchläuft df einmal in Blöcken zu batch_size Zeilen und übergibt jeden
+    Block allen Sinks. Jeder Sink schreibt in einem eigenen Thread, so
+    überlappen sich Wartezeiten beim Schreiben (Netzlaufwerk). Rechenarbeit
+    in reinem Python (openpyxl, to_csv) teilt sich den GIL und läuft damit
+    praktisch nacheinander.
+    Schlägt ein Sink fehl, wird nur seine Datei verworfen (Warnung), die
+    übrigen laufen weiter. Bei Abbruch (cancel) werden alle verworfen.
+    Gibt die fehlgeschlagenen Sinks zurück.
+    """
+    workers = [_SinkWorker(sink) for sink in sinks]
+    try:
+        for start in range(0, max(len(df), 1), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            for worker in workers:
+                worker.put(batch)
+            if tracker is not None:
+                tracker.update(min(start + batch_size, len(df)))
+    except BaseException:
+        for worker in workers:
+            worker.cancel()
+        raise
+    
+    failed = []
+    for worker in workers:
+        worker.finish()
+        if worker.error is None:
+            print(f"💾 {worker.sink.label} exportiert: {worker.sink.path}")
+        else:
+            failed.append(worker.sink)
+            print(f"⚠ {worker.sink.label}-Export fehlgeschlagen: {worker.error}")
+    return failed
+
+
+def export_results(df, df_deleted, input_file, compression=None, progress=None, cancel=None,
+                   validation=None, profile=None, outputs=None):
+    """
+    Exportiert die Ergebnisse, standardmäßig als CSV und Excel.
+    
+    outputs wählt die Formate aus EXPORT_SINKS (csv, xlsx, parquet, sqlite,
+    summary). Die Daten werden dabei nur einmal in Blöcken durchlaufen und
+    an alle Formate verteilt (fan_out), die gleichzeitig in je einem
+    eigenen Thread geschrieben werden.
+    Mit compression='gzip' oder 'zstd' werden die CSV-Dateien komprimiert.
+    
+    Der Fortschritt (progress) wird je Block gemeldet, mit cancel wird dabei
+    auf Abbruch geprüft; abgebrochene Dateien werden nicht angelegt.
+    Ohne Excel-Ausgabe (openpyxl fehlt oder Fehler) werden die gelöschten
+    Zeilen als [name]_deleted.csv geschrieben.
+    
+    Mit validation (Ergebnis von validate_report) entstehen zusätzlich das
+    Blatt 'Validierung' und [name]_validation.json, mit profile (Ergebnis
+    von ReportProfile.summary) das Blatt 'Profil' und [name]_profile.json.
+    """
+    outputs = check_outputs(outputs)
+    input_path = Path(input_file)
+    base_name = report_base_name(input_path)
+    output_dir = input_path.parent
+    csv_suffix = '.csv' + COMPRESSION_SUFFIXES.get(compression, '')
+    deleted_csv = output_dir / f"{base_name}_deleted{csv_suffix}"
+    
+    context = {
+        'compression': compression,
+        'rows': len(df),
+        'deleted': df_deleted,
+        'validation': validation_frame(validation) if validation is not None else None,
+        'profile': profile_frame(profile) if profile is not None else None,
+    }
+    excel_ok = 'xlsx' in outputs and install_openpyxl()
+    sinks = [EXPORT_SINKS[name](output_dir / EXPORT_SINKS[name].file_name(base_name, compression), context)
+             for name in outputs if name != 'xlsx' or excel_ok]
+    
+    tracker = ProgressTracker(progress, cancel)
+    tracker.start('export', total_rows=len(df))
+    
+    print(f"\n📤 Export: {', '.join(sink.label for sink in sinks)}")
+    failed = fan_out(df, sinks, tracker)
+    
+    if 'xlsx' in outputs and (not excel_ok or any(isinstance(sink, ExcelSink) for sink in failed)):
+        # Fallback: Gelöschte Zeilen als separate CSV
+        write_csv(df_deleted, deleted_csv, compression)
+        print(f"💾 Gelöschte Zeilen als CSV: {deleted_csv}")
+    
+    if validation is not None:
+        validation_path = output_dir / f"{base_name}_validation.json"
+        write_json(validation, validation_path)
+        print(f"💾 Validierung: {validation_path}")
+    if profile is not None:
+        write_profile(profile, output_dir / f"{base_name}_profile.json")
+    
+    tracker.finish(len(df))
+    written = [sink.path for sink in sinks if sink not in failed]
+    return written[0] if written else None
+
+
+# Spaltenpositionen für die zeilenweise Konvertierung
+_NUMERIC_IDX = [EXPECTED_HEADERS.index(col) for col in NUMERIC_COLUMNS]
+_DATE_IDX = EXPECTED_HEADERS.index(DATE_COLUMN)
+
+
+def convert_row(data_row, plan):
+    """
+    Konvertiert eine einzelne Datenzeile (Spalten C bis Q als Strings)
+    wie convert_data_types, aber ohne DataFrame: jede Spalte wird nach
+    ihrem Format im plan (FormatPlan) gelesen.
+    Leere Zahlenwerte werden als '' zurückgegeben.
+    """
+    converted = list(data_row)
+    for idx, col in zip(_NUMERIC_IDX, NUMERIC_COLUMNS):
+        num = plan[col].parse(converted[idx])
+        converted[idx] = '' if num is None else num
+    converted[_DATE_IDX] = plan[DATE_COLUMN].format(converted[_DATE_IDX])
+    return converted
+
+
+def convert_rows(rows):
+    """
+    Konvertiert die Zeilen eines Reports (Iterator, Spalten C bis Q) nach
+    einem FormatPlan aus den ersten Zeilen (plan_rows) und meldet am Ende
+    die Werte, die nicht zum Format passten.
+    """
+    plan, rows = plan_rows(rows)
+    plan.describe()
+    for row in rows:
+        yield convert_row(row, plan)
+    plan.report()
+
+
+def convert_columns(columns, plan):
+    """
+    Wie convert_row, aber für einen ganzen Block und spaltenweise (Spalten C
+    bis Q als Listen von Strings): jeder verschiedene Wert einer Spalte wird
+    nur einmal konvertiert, reine (ASCII-)Ziffernfolgen direkt per int().
+    Abweichungen vom Format werden je Vorkommen gezählt.
+    """
+    columns = [list(column) for column in columns]
+    for idx, col in zip(_NUMERIC_IDX, NUMERIC_COLUMNS):
+        converted = {}
+        for value, count in Counter(columns[idx]).items():
+            # isascii: isdigit() gilt auch für '²', das int() nicht lesen kann
+            if value.isascii() and value.isdigit() and len(value) <= 15:
+                converted[value] = int(value)
+            else:
+                num = plan[col].parse(value, count)
+                converted[value] = '' if num is None else num
+        columns[idx] = [converted[value] for value in columns[idx]]
+    dates = {value: plan[DATE_COLUMN].format(value, count)
+             for value, count in Counter(columns[_DATE_IDX]).items()}
+    columns[_DATE_IDX] = [dates[value] for value in columns[_DATE_IDX]]
+    return columns
+
+
+class _CsvRowSink:
+    """Schreibt gelöschte Zeilen (dicts) direkt in eine CSV statt in eine Liste."""
+    
+    def __init__(self, writer, columns):
+        self.writer = writer
+        self.columns = columns
+    
+    def append(self, entry):
+        self.writer.writerow([entry[col] for col in self.columns])
+
+
+def stream_clean_csv(file_path, output_path, deleted_path=None, batch_size=CSV_BATCH_SIZE,
+                     compression=None, index=None, progress=None, rules=None, profile=None, cancel=None,
+                     validation=None, plan=None):
+    """
+    Streaming-Bereinigung direkt in eine CSV-Datei (ohne DataFrame).
+    
+    Zeile lesen → filtern → konvertieren → in Blöcken schreiben.
+    Der Speicherbedarf bleibt konstant, unabhängig von der Dateigröße.
+    Gelöschte Zeilen werden optional in deleted_path geschrieben.
+    Beide Dateien werden atomar geschrieben: bei Fehler oder Abbruch bleibt
+    keine halbe Datei unter dem endgültigen Namen zurück.
+    Mit compression='gzip' oder 'zstd' wird komprimiert geschrieben.
+    progress ist ein optionaler Fortschritts-Callback (siehe ProgressTracker),
+    cancel ein optionales CancelToken; bei Abbruch werden beide temporären
+    Dateien entfernt.
+    Filterregeln (rules) werden zeilenweise beim Lesen angewendet.
+    Zahlen und Datumswerte werden nach plan gelesen (FormatPlan des Reports,
+    sonst aus den ersten Zeilen des Durchlaufs, siehe iter_cleaned_rows).
+    Mit profile (ReportProfile) wird im selben Durchlauf das Spaltenprofil erstellt,
+    mit validation (ReportValidator) werden die Prüfungen je Block ausgewertet.
+    Gibt das Statistik-Dictionary zurück.
+    """
+    stats = new_stats()
+    tracker = None
+    if progress is not None or cancel is not None:
+        tracker = ProgressTracker(progress, cancel)
+        total_bytes = os.path.getsize(file_path) if detect_input_format(file_path) is None else None
+        tracker.start('read', total_bytes=total_bytes)
+    
+    plan = plan or FormatPlan()
+    
+    def write(tmp, deleted_tmp=None):
+        deleted_file = None
+        deleted_rows = None
+        try:
+            if deleted_tmp is not None:
+                deleted_file = open_output_text(deleted_tmp, compression)
+                deleted_writer = csv.writer(deleted_file, delimiter=';', lineterminator=os.linesep)
+                deleted_columns = ['Grund', 'Original_Zeile', 'Daten']
+                deleted_writer.writerow(deleted_columns)
+                deleted_rows = _CsvRowSink(deleted_writer, deleted_columns)
+            
+            with open_output_text(tmp, compression) as f:
+                writer = csv.writer(f, delimiter=';', lineterminator=os.linesep)
+                writer.writerow(EXPECTED_HEADERS)
+                
+                batch = []
+                raw_batch = []
+                data_rows = (data_row for _, data_row
+                             in iter_cleaned_rows(file_path, stats, deleted_rows, index, tracker, rules,
+                                                  plan=plan))
+                for data_row in data_rows:
+                    if profile is not None:
+                        profile.append(data_row)
+                    if validation is not None:
+                        raw_batch.append(data_row)
+                    batch.append(convert_row(data_row, plan))
+                    if len(batch) >= batch_size:
+                        writer.writerows(batch)
+                        if validation is not None:
+                            validation.add_rows(raw_batch, batch)
+                            raw_batch.clear()
+                        batch.clear()
+                writer.writerows(batch)
+                if validation is not None:
+                    validation.add_rows(raw_batch, batch)
+        finally:
+            if deleted_file is not None:
+                deleted_file.close()
+    
+    # Beide Dateien entstehen als temporäre Dateien und werden erst nach
+    # vollständigem Schreiben umbenannt (siehe atomic_write)
+    if deleted_path is None:
+        atomic_write(output_path, write)
+    else:
+        atomic_write(output_path, lambda tmp: atomic_write(
+            deleted_path, lambda deleted_tmp: write(tmp, deleted_tmp)))
+    if tracker is not None:
+        tracker.finish(stats['total_rows'])
+    
+    plan.describe()
+    plan.report()
+    print_stats(stats)
+    print(f"\n💾 CSV exportiert (Streaming): {output_path}")
+    if deleted_path is not None:
+        print(f"💾 Gelöschte Zeilen als CSV: {deleted_path}")
+    
+    return stats
+
+
+# ============================================================================
+# FORMAT-ERKENNUNG (PARSER JE SPALTE AUS EINER STICHPROBE)
+# ============================================================================
+
+# Aus so vielen Zeilen wird das Format jeder Spalte bestimmt (DataFrame:
+# gleichmäßig verteilt, Streaming: die ersten Zeilen)
+FORMAT_SAMPLE_ROWS = 10000
+
+# Reine Ganzzahlen werden in jedem Format direkt gelesen
+PLAIN_INT_PATTERN = re.compile(r'-?\d{1,18}')
+
+# Zahlenformate: deutsch (1.234,56) und englisch (1,234.56)
+NUMBER_PATTERNS = {
+    'de': re.compile(r'-?(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d+)?'),
+    'en': re.compile(r'-?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?'),
+}
+NUMBER_LABELS = {'int': 'Ganzzahl', 'de': 'Zahl 1.234,56', 'en': 'Zahl 1,234.56'}
+
+# Tausendergruppen ohne Dezimalteil ('1,234', '3.500') sind wie bei
+# clean_number Ganzzahlen: sie zählen bei der Erkennung nur für das Format,
+# in dem das Trennzeichen ein Tausendertrennzeichen ist
+GROUPED_PATTERNS = {
+    'de': re.compile(r'-?\d{1,3}(?:\.\d{3})+'),
+    'en': re.compile(r'-?\d{1,3}(?:,\d{3})+'),
+}
+
+
+class ColumnFormat:
+    """
+    Erkanntes Format einer Spalte (siehe plan_formats) mit passendem Parser.
+    
+    Werte, die nicht zum Format passen, werden einzeln wie bisher gelesen
+    (clean_number bzw. parse_sap_date) und gezählt; report() meldet sie.
+    """
+    
+    def __init__(self, column, spec):
+        self.column = column
+        self.spec = spec
+        self.fallbacks = 0
+        self.unreadable = 0
+        self.examples = []
+    
+    def fallback(self, text, result, count=1):
+        self.fallbacks += count
+        if result is None:
+            self.unreadable += count
+        if len(self.examples) < 3 and text not in self.examples:
+            self.examples.append(text)
+        return result
+    
+    def report(self):
+        if not self.fallbacks:
+            return
+        examples = ', '.join(f"'{value}'" for value in self.examples)
+        unreadable = f", davon {self.unreadable} nicht lesbar (leer)" if self.unreadable else ''
+        print(f"   ⚠ {self.column}: {self.fallbacks} Werte passen nicht zum Format {self.label} "
+              f"(z.B. {examples}) – einzeln gelesen{unreadable}")
+
+
+class NumberFormat(ColumnFormat):
+    """Zahlenspalte: 'int' (nur Ganzzahlen), 'de' (1.234,56) oder 'en' (1,234.56)."""
+    
+    @property
+    def label(self):
+        return NUMBER_LABELS[self.spec]
+    
+    def parse(self, value, count=1):
+        """Ein Wert als int (gerundet) oder None; count = Anzahl Vorkommen des Werts."""
+        if not isinstance(value, str):
+            value = '' if value is None or pd.isna(value) else str(value)
+        text = value.strip()
+        if text == '' or text == '-':
+            return None
+        if ' ' in text or '\xa0' in text:
+            text = text.replace('\xa0', '').replace(' ', '')
+        if PLAIN_INT_PATTERN.fullmatch(text):
+            return int(text)
+        pattern = NUMBER_PATTERNS.get(self.spec)
+        if pattern is not None and pattern.fullmatch(text):
+            if self.spec == 'de':
+                return int(round(float(text.replace('.', '').replace(',', '.'))))
+            return int(round(float(text.replace(',', ''))))
+        return self.fallback(text, clean_number(text), count)
+    
+    def to_int_column(self, values):
+        """Ganze Spalte vektorisiert als Int64 (fehlende Werte <NA>)."""
+        series = pd.Series(values)
+        if series.dtype.kind in 'iu':
+            return series.astype('Int64')
+        
+        text = (series.astype('string').str.strip()
+                .str.replace('\xa0', '', regex=False).str.replace(' ', '', regex=False))
+        present = (text.notna() & (text != '') & (text != '-')).to_numpy(dtype=bool)
+        plain = text.str.fullmatch(PLAIN_INT_PATTERN.pattern).fillna(False).to_numpy(dtype=bool)
+        
+        result = pd.Series(pd.array([None] * len(series), dtype='Int64'), index=series.index)
+        if plain.any():
+            result[plain] = pd.to_numeric(text[plain]).astype('Int64').array
+        rest = present & ~plain
+        if not rest.any():
+            return result
+        
+        pattern = NUMBER_PATTERNS.get(self.spec)
+        fits = np.zeros(len(series), dtype=bool)
+        if pattern is not None:
+            fits = rest & text.str.fullmatch(pattern.pattern).fillna(False).to_numpy(dtype=bool)
+        if fits.any():
+            numbers = text[fits]
+            if self.spec == 'de':
+                numbers = numbers.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+            else:
+                numbers = numbers.str.replace(',', '', regex=False)
+            result[fits] = pd.to_numeric(numbers).astype('float64').round().astype('Int64').array
+        
+        others = rest & ~fits
+        if others.any():
+            counts = text[others].value_counts()
+            parsed = {value: self.fallback(value, clean_number(value), int(count))
+                      for value, count in counts.items()}
+            result[others] = pd.array([parsed[value] for value in text[others]], dtype='Int64')
+        return result
+
+
+class DateFormat(ColumnFormat):
+    """Datumsspalte mit einem Format aus DATE_INPUT_FORMATS."""
+    
+    @property
+    def label(self):
+        return (self.spec.replace('%d', 'TT').replace('%m', 'MM')
+                .replace('%Y', 'JJJJ').replace('%y', 'JJ'))
+    
+    def parse(self, value, count=1):
+        """Ein Wert als datetime oder None."""
+        text = str(value).strip() if value is not None else ''
+        if text == '':
+            return None
+        try:
+            return datetime.strptime(text, self.spec)
+        except ValueError:
+            return self.fallback(text, parse_sap_date(text), count)
+    
+    def format(self, value, count=1):
+        """Als Text DD.MM.YYYY; nicht lesbare Werte bleiben unverändert."""
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return ''
+        parsed = self.parse(value, count)
+        return parsed.strftime(DATE_OUTPUT_FORMAT) if parsed is not None else str(value).strip()
+    
+    def to_date_column(self, values, native=True):
+        """
+        Ganze Spalte: native=True → datetime64[ns] (nicht lesbar = NaT),
+        sonst Text DD.MM.YYYY. Jeder verschiedene Wert wird einmal gelesen.
+        """
+        series = pd.Series(values)
+        codes, uniques = pd.factorize(series)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+        parsed = pd.to_datetime(text, format=self.spec, errors='coerce')
+        misses = (parsed.isna() & (text != '')).to_numpy(dtype=bool)
+        if misses.any():
+            parsed = parsed.astype(object)
+            for pos in np.flatnonzero(misses).tolist():
+                value = self.fallback(text[pos], parse_sap_date(text[pos]), int(counts[pos]))
+                parsed[pos] = pd.NaT if value is None else pd.Timestamp(value)
+            parsed = pd.to_datetime(parsed)
+        parsed = parsed.to_numpy(dtype='datetime64[ns]')
+        
+        if native:
+            unique_values = np.append(parsed, np.datetime64('NaT', 'ns'))
+            return pd.Series(unique_values[codes], index=series.index, dtype='datetime64[ns]')
+        formatted = pd.Series(parsed).dt.strftime(DATE_OUTPUT_FORMAT).astype(object)
+        formatted = formatted.where(pd.notna(parsed), text.astype(object))
+        unique_values = np.append(formatted.to_numpy(dtype=object), '')
+        return pd.Series(unique_values[codes], index=series.index, dtype=object)
+
+
+def infer_number_format(values):
+    """
+    Zahlenformat aus einer Stichprobe (bereinigte Strings): 'int', wenn nur
+    Ganzzahlen vorkommen, sonst das Format, zu dem mehr Werte passen.
+    Tausendergruppen zählen nur für ihr Format (siehe GROUPED_PATTERNS),
+    eine Spalte mit nur '1,234' wird also englisch gelesen (1234). Bei
+    Gleichstand gilt das deutsche Format des SAP-Exports.
+    """
+    values = [value for value in values if not PLAIN_INT_PATTERN.fullmatch(value)]
+    if not values:
+        return 'int'
+    fits = dict.fromkeys(NUMBER_PATTERNS, 0)
+    for value in values:
+        grouped = [spec for spec, pattern in GROUPED_PATTERNS.items() if pattern.fullmatch(value)]
+        for spec in grouped or [spec for spec, pattern in NUMBER_PATTERNS.items()
+                                if pattern.fullmatch(value)]:
+            fits[spec] += 1
+    return 'en' if fits['en'] > fits['de'] else 'de'
+
+
+def infer_date_format(values):
+    """Datumsformat aus DATE_INPUT_FORMATS, zu dem die meisten Werte passen."""
+    best, best_fits = DATE_INPUT_FORMATS[0], 0
+    for fmt in DATE_INPUT_FORMATS:
+        fits = 0
+        for value in values:
+            try:
+                datetime.strptime(value, fmt)
+                fits += 1
+            except ValueError:
+                pass
+        if fits > best_fits:
+            best, best_fits = fmt, fits
+    return best
+
+
+class FormatPlan:
+    """
+    Parser je Spalte für einen Report, erstellt von plan_formats: Zahlenspalten
+    bekommen ein festes Zahlenformat, Pstng Date ein festes Datumsformat.
+    So wird '1,234' innerhalb einer Spalte immer gleich gelesen, statt je
+    Zelle neu zu raten.
+    
+    FormatPlan() ohne formats ist offen: iter_cleaned_rows bestimmt ihn aus
+    den ersten Zeilen seines Durchlaufs (sample_lines), statt den Anfang der
+    Datei vorab mit plan_report ein zweites Mal zu lesen.
+    """
+    
+    def __init__(self, formats=None):
+        self.formats = formats
+        self.open_copies = []
+    
+    @property
+    def planned(self):
+        return self.formats is not None
+    
+    def __getitem__(self, column):
+        return self.formats[column]
+    
+    def copy(self):
+        """Gleicher Plan mit eigenen Zählern (z.B. für parallel laufende Writer)."""
+        if not self.planned:
+            # Kopie eines offenen Plans wird zusammen mit ihm bestimmt
+            copy = FormatPlan()
+            self.open_copies.append(copy)
+            return copy
+        return FormatPlan({col: type(fmt)(col, fmt.spec) for col, fmt in self.formats.items()})
+    
+    def fill(self, plan):
+        """Übernimmt die Formate von plan, auch für die Kopien des offenen Plans."""
+        self.formats = plan.formats
+        for copy in self.open_copies:
+            copy.fill(plan.copy())
+        self.open_copies = []
+    
+    def sample_lines(self, lines, header_start_col):
+        """
+        Bestimmt den offenen Plan aus den ersten FORMAT_SAMPLE_ROWS Datenzeilen
+        eines Durchlaufs (Rohzeilen ab dem Header, dieselbe Stichprobe wie bei
+        plan_report). Gibt einen Iterator zurück, der wieder alle Zeilen liefert.
+        """
+        lines = iter(lines)
+        col_range = range(header_start_col, header_start_col + len(EXPECTED_HEADERS))
+        head, sample = [], []
+        for line in lines:
+            head.append(line)
+            row = line.split('\t')
+            # Ohne Summenzeilen, leere Zeilen und Zeilen ohne Materialnummer
+            if len(row) > 1 and row[1].strip() in ('*', '**'):
+                continue
+            data_row = [row[i].strip() if i < len(row) else '' for i in col_range]
+            if data_row[0]:
+                sample.append(data_row)
+                if len(sample) >= FORMAT_SAMPLE_ROWS:
+                    break
+        self.fill(plan_formats(dict(zip(EXPECTED_HEADERS, zip(*sample)))))
+        return chain(head, lines)
+    
+    def describe(self):
+        parts = ', '.join(f"{col}={fmt.label}" for col, fmt in self.formats.items())
+        print(f"   🔎 Formate (Stichprobe): {parts}")
+    
+    def report(self):
+        for fmt in self.formats.values():
+            fmt.report()
+
+
+def plan_formats(columns):
+    """
+    Erstellt den FormatPlan aus einer Stichprobe: columns ordnet Spaltennamen
+    Folgen von Rohwerten (Strings) zu. Jeder verschiedene Wert zählt einmal.
+    """
+    formats = {}
+    for col in NUMERIC_COLUMNS + [DATE_COLUMN]:
+        values = columns.get(col, ())
+        sample = {str(value).strip() for value in values if value is not None and not pd.isna(value)}
+        if col == DATE_COLUMN:
+            formats[col] = DateFormat(col, infer_date_format(sample - {''}))
+        else:
+            sample = {value.replace('\xa0', '').replace(' ', '') for value in sample} - {'', '-'}
+            formats[col] = NumberFormat(col, infer_number_format(sample))
+    return FormatPlan(formats)
+
+
+def plan_frame(df):
+    """FormatPlan aus FORMAT_SAMPLE_ROWS gleichmäßig verteilten Zeilen eines DataFrames."""
+    step = max(1, len(df) // FORMAT_SAMPLE_ROWS)
+    columns = [col for col in df.columns if col in NUMERIC_COLUMNS or col == DATE_COLUMN]
+    return plan_formats({col: df[col].iloc[::step].tolist() for col in columns})
+
+
+def plan_rows(rows):
+    """
+    FormatPlan für einen Zeilen-Iterator (Spalten C bis Q): die ersten
+    FORMAT_SAMPLE_ROWS Zeilen dienen als Stichprobe. Gibt (plan, Zeilen)
+    zurück; der zurückgegebene Iterator liefert wieder alle Zeilen.
+    """
+    rows = iter(rows)
+    head = list(islice(rows, FORMAT_SAMPLE_ROWS))
+    plan = plan_formats(dict(zip(EXPECTED_HEADERS, zip(*head))))
+    return plan, chain(head, rows)
+
+
+def plan_report(*file_paths):
+    """
+    FormatPlan für einen Report aus seinen ersten FORMAT_SAMPLE_ROWS
+    Datenzeilen (vor den Filterregeln). Der Plan wird einmal je Report
+    erstellt und an Filterregeln, Konvertierung, Index und Profil
+    weitergegeben; alle Verarbeitungswege lesen damit gleich.
+    
+    Mit mehreren Dateien (Rohreports oder bereinigte CSVs, siehe
+    merge_reports) gilt ein Plan für alle, die Stichprobe wird auf die
+    Dateien aufgeteilt.
+    """
+    per_file = max(1, FORMAT_SAMPLE_ROWS // max(1, len(file_paths)))
+    head = []
+    for file_path in file_paths:
+        rows = iter_source_rows(file_path, verbose=False)
+        head.extend(islice(rows, per_file))
+        rows.close()
+    return plan_formats(dict(zip(EXPECTED_HEADERS, zip(*head))))
+
+
+def cleaned_plan():
+    """
+    FormatPlan der bereinigten Ausgabe (Ganzzahlen, Datum DD.MM.YYYY) für
+    bereits konvertierte Daten, z.B. bei Validierung, Partitionen und Exporten.
+    """
+    formats = {col: NumberFormat(col, 'int') for col in NUMERIC_COLUMNS}
+    formats[DATE_COLUMN] = DateFormat(DATE_COLUMN, DATE_OUTPUT_FORMAT)
+    return FormatPlan(formats)
+
+
+# ============================================================================
+# PARTITIONIERTER EXPORT (year=YYYY/month=MM/)
+# ============================================================================
+
+PARTITION_FORMATS = ('csv', 'parquet')
+PARTITION_MANIFEST = '_manifest.json'
+
+# Ordnername für Zeilen ohne Datum bzw. ohne Arbeitsplatz
+PARTITION_EMPTY = '_ohne'
+
+
+def require_pyarrow():
+    """Importiert pyarrow (optional, nur für Parquet-Ausgaben nötig)."""
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ImportError("Für Parquet-Ausgaben wird pyarrow benötigt: pip3 install pyarrow")
+
+
+def partition_value(value):
+    """Ordnertauglicher Wert für work_ctr=... (ohne / \\ : und Leerzeichen am Rand)."""
+    text = re.sub(r'[\\/:*?"<>|]', '_', str(value).strip())
+    return text or PARTITION_EMPTY
+
+
+def typed_partition_frame(df, plan=None):
+    """
+    Kopie mit einheitlichen Typen für Partitionen: Zahlen Int64,
+    Pstng Date datetime64, Text ohne fehlende Werte. Bestehende und neue
+    Zeilen lassen sich so direkt vergleichen. Gelesen wird nach plan,
+    Standard ist das Format der bereinigten Ausgabe (cleaned_plan).
+    """
+    plan = plan or cleaned_plan()
+    data = df.copy()
+    for col in NUMERIC_COLUMNS:
+        if col in data.columns and str(data[col].dtype) != 'Int64':
+            data[col] = plan[col].to_int_column(data[col])
+    if DATE_COLUMN in data.columns and not pd.api.types.is_datetime64_any_dtype(data[DATE_COLUMN]):
+        data[DATE_COLUMN] = plan[DATE_COLUMN].to_date_column(data[DATE_COLUMN])
+    for col in TEXT_COLUMNS:
+        if col in data.columns:
+            data[col] = data[col].fillna('').astype(str)
+    return data
+
+
+def read_partition(path, fmt):
+    """Liest eine bestehende Partition (CSV oder Parquet) typisiert ein."""
+    if fmt == 'parquet':
+        require_pyarrow()
+        return typed_partition_frame(pd.read_parquet(path))
+    with open_report(path, encoding='utf-8-sig') as f:
+        return typed_partition_frame(pd.read_csv(f, sep=';', dtype=str, keep_default_na=False))
+
+
+def write_partition(df, path, fmt, compression=None):
+    """Schreibt eine Partition atomar (CSV wie write_csv oder Parquet)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == 'csv':
+        return write_csv(df, path, compression)
+    return atomic_write(path, lambda tmp: df.to_parquet(tmp, index=False))
+
+
+def export_partitioned(df, output_dir, fmt='csv', by_work_ctr=False, compression=None,
+                       key_columns=None):
+    """
+    Schreibt die bereinigten Zeilen nach Buchungsdatum partitioniert:
+    output_dir/year=YYYY/month=MM/[work_ctr=.../]part.csv (oder .parquet).
+    
+    - Nur Partitionen, die in df vorkommen, werden angefasst. Vorhandene
+      Zeilen mit gleichem Schlüssel (key_columns, wie bei 'merge') werden
+      durch die neuen ersetzt, alle übrigen bleiben erhalten.
+    - _manifest.json enthält pro Partition Datei, Zeilenzahl, kleinstes und
+      größtes Datum sowie den Zeitpunkt der letzten Änderung.
+    
+    Gibt das Manifest zurück.
+    """
+    if fmt not in PARTITION_FORMATS:
+        raise ValueError(f"Unbekanntes Partitionsformat: {fmt} (erlaubt: {', '.join(PARTITION_FORMATS)})")
+    if fmt == 'parquet':
+        require_pyarrow()
+        compression = None
+    key_columns = key_columns or MERGE_KEY_COLUMNS
+    output_dir = Path(output_dir)
+    partition_by = ['year', 'month'] + (['work_ctr'] if by_work_ctr else [])
+    
+    manifest_path = output_dir / PARTITION_MANIFEST
+    if manifest_path.exists():
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') != fmt or manifest.get('partition_by') != partition_by:
+            raise ValueError(f"{output_dir} enthält bereits Partitionen im Format "
+                             f"{manifest.get('format')} nach {'/'.join(manifest.get('partition_by', []))}")
+    else:
+        manifest = {'format': fmt, 'partition_by': partition_by, 'partitions': {}}
+    
+    data = typed_partition_frame(df)
+    dates = data[DATE_COLUMN]
+    parts = {
+        'year': dates.dt.strftime('%Y').fillna(PARTITION_EMPTY),
+        'month': dates.dt.strftime('%m').fillna(PARTITION_EMPTY),
+    }
+    if by_work_ctr:
+        parts['work_ctr'] = data['Work Ctr'].map(partition_value)
+    names = pd.Series('', index=data.index)
+    for col in partition_by:
+        names = names + ('/' if col != 'year' else '') + col + '=' + parts[col].astype(str)
+    
+    file_name = 'part.' + fmt + COMPRESSION_SUFFIXES.get(compression, '')
+    print(f"\n🗂  Partitionierter Export nach {output_dir} ({fmt}, {'/'.join(partition_by)})")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    replaced_total = 0
+    for name, rows in data.groupby(names.to_numpy(), sort=True):
+        entry = manifest['partitions'].get(name)
+        path = output_dir / name / file_name
+        if entry is not None:
+            old_path = output_dir / entry['file']
+            existing = read_partition(old_path, fmt)
+            # Neueste Daten gewinnen: bestehende Zeilen mit gleichem Schlüssel entfallen
+            old_keys = pd.util.hash_pandas_object(existing[key_columns], index=False)
+            new_keys = pd.util.hash_pandas_object(rows[key_columns], index=False)
+            replaced = old_keys.isin(new_keys).to_numpy()
+            replaced_total += int(replaced.sum())
+            rows = pd.concat([existing[~replaced], rows], ignore_index=True)
+            if old_path != path and old_path.exists():
+                old_path.unlink()
+        rows = rows.sort_values(DATE_COLUMN, kind='stable')
+        write_partition(rows, path, fmt, compression)
+        
+        valid = rows[DATE_COLUMN].dropna()
+        manifest['partitions'][name] = {
+            'file': path.relative_to(output_dir).as_posix(),
+            'rows': len(rows),
+            'min_date': valid.min().strftime('%Y-%m-%d') if len(valid) else None,
+            'max_date': valid.max().strftime('%Y-%m-%d') if len(valid) else None,
+            'updated': datetime.now().isoformat(timespec='seconds'),
+        }
+        print(f"   {name}: {len(rows)} Zeilen")
+    
+    manifest['partitions'] = dict(sorted(manifest['partitions'].items()))
+    manifest['rows'] = sum(entry['rows'] for entry in manifest['partitions'].values())
+    manifest['updated'] = datetime.now().isoformat(timespec='seconds')
+    write_json(manifest, manifest_path)
+    
+    if replaced_total:
+        print(f"   {replaced_total} vorhandene Zeilen durch neue Daten ersetzt")
+    print(f"💾 Manifest: {manifest_path} ({len(manifest['partitions'])} Partitionen, "
+          f"{manifest['rows']} Zeilen)")
+    return manifest
+
+
+# ============================================================================
+# FILTERREGELN (ZUSÄTZLICHE LÖSCHREGELN AUS JSON/YAML)
+# ============================================================================
+
+# Vergleichsoperatoren für Filterregeln
+RULE_OPERATORS = ('eq', 'ne', 'in', 'not_in', 'lt', 'le', 'gt', 'ge', 'empty', 'regex')
+
+
+class FilterRule:
+    """
+    Eine zusätzliche Löschregel, z.B. "ICt = X" oder "Withdrawn = 0".
+    
+    Zeilen, auf die die Regel zutrifft, werden entfernt und mit reason im
+    Protokoll der gelöschten Zeilen vermerkt. Zellwerte werden nach dem
+    FormatPlan des Reports gelesen, Vergleichswerte aus der Regeldatei wie
+    bei clean_number bzw. to_datetime_value.
+    
+    Die Regel lässt sich vektorisiert (mask) auf eine ganze Spalte oder
+    zeilenweise (matches) im Streaming-Modus auswerten. Leere Zellen treffen
+    nur "empty", "ne" und "not_in", bei Textspalten zusätzlich Regeln mit ''
+    als Vergleichswert (z.B. ICt in ['', 'X']).
+    """
+    
+    def __init__(self, column, op='eq', value=None, reason=None):
+        column = COLUMN_KEYS.get(column, column)
+        if column not in EXPECTED_HEADERS:
+            raise ValueError(f"Unbekannte Spalte in Filterregel: {column}")
+        if op not in RULE_OPERATORS:
+            raise ValueError(f"Unbekannter Operator in Filterregel: {op} "
+                             f"(erlaubt: {', '.join(RULE_OPERATORS)})")
+        
+        self.column = column
+        self.position = EXPECTED_HEADERS.index(column)
+        self.op = op
+        self.kind = ('number' if column in NUMERIC_COLUMNS else
+                     'date' if column == DATE_COLUMN else 'text')
+        self.reason = reason or f"Regel: {column} {op} {value}".rstrip()
+        
+        if op in ('in', 'not_in'):
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            self.value = [self.parse_value(v) for v in values]
+        elif op == 'regex':
+            self.value = re.compile(str(value))
+        elif op == 'empty':
+            self.value = None
+        else:
+            self.value = self.parse_value(value)
+    
+    @classmethod
+    def from_dict(cls, entry):
+        """Erzeugt eine Regel aus einem Eintrag der Regeldatei."""
+        if 'column' not in entry:
+            raise ValueError(f"Filterregel ohne 'column': {entry}")
+        op = entry.get('op', 'in' if isinstance(entry.get('value'), list) else 'eq')
+        return cls(entry['column'], op, entry.get('value'), entry.get('reason'))
+    
+    def parse_value(self, value):
+        """Vergleichswert aus der Regeldatei in den Typ der Spalte umwandeln."""
+        if self.kind == 'number':
+            num = clean_number(value)
+            if num is None:
+                raise ValueError(f"Ungültige Zahl in Filterregel für {self.column}: {value}")
+            return num
+        if self.kind == 'date':
+            return pd.Timestamp(to_datetime_value(value))
+        return str(value).strip()
+    
+    def parse_cell(self, cell, plan):
+        """Zellwert (String) nach plan in den Typ der Spalte umwandeln; leer → None."""
+        if self.kind == 'number':
+            return plan[self.column].parse(cell)
+        if self.kind == 'date':
+            parsed = plan[self.column].parse(cell)
+            return pd.Timestamp(parsed) if parsed is not None else None
+        return cell
+    
+    def typed_column(self, values, plan):
+        """Ganze Spalte (Strings) vektorisiert nach plan in den Typ der Spalte umwandeln."""
+        if self.kind == 'number':
+            return plan[self.column].to_int_column(values)
+        if self.kind == 'date':
+            return plan[self.column].to_date_column(values)
+        return pd.Series(values).astype(str)
+    
+    def matches(self, cell, plan):
+        """Zeilenweise Auswertung für eine Zelle (String, bereits getrimmt)."""
+        if self.op == 'regex':
+            return self.value.search(cell) is not None
+        value = self.parse_cell(cell, plan)
+        if self.op == 'empty':
+            return value is None or value == ''
+        if value is None:
+            return self.op in ('ne', 'not_in')
+        if self.op == 'eq':
+            return value == self.value
+        if self.op == 'ne':
+            return value != self.value
+        if self.op == 'in':
+            return value in self.value
+        if self.op == 'not_in':
+            return value not in self.value
+        if self.kind == 'text' and value == '':
+            return False
+        return {'lt': value < self.value, 'le': value <= self.value,
+                'gt': value > self.value, 'ge': value >= self.value}[self.op]
+    
+    def mask(self, typed, raw):
+        """
+        Vektorisierte Auswertung: typed ist die umgewandelte Spalte
+        (typed_column), raw die Original-Strings. Gibt ein bool-Array zurück.
+        """
+        if self.op == 'regex':
+            return raw.str.contains(self.value, na=False).to_numpy(dtype=bool)
+        missing = typed.isna()
+        if self.kind == 'text' and self.op not in ('eq', 'ne', 'in', 'not_in'):
+            # Wie in matches: eine leere Textzelle ist für eq/ne/in/not_in der Text ''
+            missing = missing | (typed == '')
+        missing = missing.to_numpy(dtype=bool)
+        if self.op == 'empty':
+            return missing
+        if self.op in ('in', 'not_in'):
+            hit = typed.isin(self.value).fillna(False).to_numpy(dtype=bool) & ~missing
+            return hit if self.op == 'in' else ~hit
+        if self.op == 'eq':
+            compared = typed == self.value
+        elif self.op == 'ne':
+            compared = typed != self.value
+        elif self.op == 'lt':
+            compared = typed < self.value
+        elif self.op == 'le':
+            compared = typed <= self.value
+        elif self.op == 'gt':
+            compared = typed > self.value
+        else:
+            compared = typed >= self.value
+        hit = compared.fillna(False).to_numpy(dtype=bool)
+        # Leere Zellen erfüllen nur "ungleich"
+        return (hit & ~missing) | missing if self.op == 'ne' else hit & ~missing
+
+
+def require_yaml():
+    """Importiert PyYAML (optional, nur für Regeldateien im YAML-Format nötig)."""
+    try:
+        import yaml
+        return yaml
+    except ImportError:
+        raise ImportError("Für YAML-Regeldateien wird PyYAML benötigt: pip3 install pyyaml "
+                          "(oder die Regeln als JSON speichern)")
+
+
+def read_config_file(path, key):
+    """Liest eine JSON- oder YAML-Datei; bei einem Objekt wird die Liste unter key geliefert."""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix.lower() in ('.yaml', '.yml'):
+            entries = require_yaml().safe_load(f)
+        else:
+            entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries.get(key, [])
+    return entries or []
+
+
+def load_rules(source):
+    """
+    Lädt Filterregeln aus einer JSON- oder YAML-Datei oder einer Liste von
+    dicts/FilterRule. Die Datei enthält eine Liste von Regeln oder ein
+    Objekt mit dem Schlüssel 'rules':
+    
+        {"rules": [
+            {"column": "ICt", "value": "X", "reason": "ICt = X"},
+            {"column": "Withdrawn", "op": "eq", "value": 0, "reason": "Menge 0"},
+            {"column": "Work Ctr", "op": "in", "value": ["L91", "L92"]}
+        ]}
+    """
+    entries = read_config_file(source, 'rules') if isinstance(source, (str, Path)) else source
+    if isinstance(entries, dict):
+        entries = entries.get('rules', [])
+    return [entry if isinstance(entry, FilterRule) else FilterRule.from_dict(entry)
+            for entry in entries or []]
+
+
+def matching_rule(rules, data_row, plan):
+    """Erste Regel, die auf die Datenzeile (Spalten C bis Q) zutrifft, sonst None."""
+    for rule in rules:
+        if rule.matches(data_row[rule.position], plan):
+            return rule
+    return None
+
+
+def apply_rules(df, rules, row_numbers=None, plan=None):
+    """
+    Wendet alle Regeln in einem Durchgang vektorisiert auf df an (Strings
+    wie aus process_sap_report). Jede Spalte wird dabei nur einmal umgewandelt,
+    nach plan (FormatPlan des Reports, sonst plan_frame).
+    
+    Gibt (behaltene Zeilen, gelöschte Zeilen, Anzahl je Grund) zurück; die
+    gelöschten Zeilen haben dieselben Spalten wie das Protokoll
+    (Grund, Original_Zeile, Daten). Trifft mehr als eine Regel zu, zählt die erste.
+    """
+    drop = np.zeros(len(df), dtype=bool)
+    reasons = np.empty(len(df), dtype=object)
+    counts = OrderedDict()
+    typed = {}
+    # Umgewandelt wird hier nur für die Regeln; convert_data_types liest die
+    # behaltenen Zeilen danach erneut und meldet dabei die Abweichungen
+    plan = (plan or plan_frame(df)).copy()
+    
+    for rule in rules:
+        raw = df[rule.column]
+        if rule.column not in typed:
+            typed[rule.column] = rule.typed_column(raw, plan)
+        hit = rule.mask(typed[rule.column], raw) & ~drop
+        reasons[hit] = rule.reason
+        drop |= hit
+        counts[rule.reason] = counts.get(rule.reason, 0) + int(hit.sum())
+    
+    removed = df[drop]
+    if row_numbers is None:
+        row_numbers = np.arange(len(df))
+    deleted = pd.DataFrame({
+        'Grund': reasons[drop],
+        'Original_Zeile': np.asarray(row_numbers)[drop] + 1,
+        'Daten': removed[EXPECTED_HEADERS[0]].astype(str).str.cat(
+            [removed[col].astype(str) for col in EXPECTED_HEADERS[1:]], sep='\t'),
+    })
+    deleted.index = removed.index
+    return df[~drop].reset_index(drop=True), deleted.reset_index(drop=True), counts
+
+
+# ============================================================================
+# VALIDIERUNG (DATENQUALITÄT NACH DER KONVERTIERUNG)
+# ============================================================================
+
+# Prüfungsarten für die Validierung
+VALIDATION_CHECKS = ('parse', 'required', 'min', 'max', 'not_future', 'allowed', 'pattern')
+
+# Anzahl Beispielzeilen je verletzter Prüfung
+VALIDATION_SAMPLES = 5
+
+# Standardprüfungen (wenn keine eigene Prüfdatei angegeben ist)
+DEFAULT_VALIDATION = (
+    [{'check': 'parse', 'column': col} for col in NUMERIC_COLUMNS + [DATE_COLUMN]] +
+    [{'check': 'min', 'column': 'Withdrawn', 'value': 0, 'name': 'Withdrawn negativ'},
+     {'check': 'not_future', 'column': DATE_COLUMN, 'name': 'Buchungsdatum in der Zukunft'}]
+)
+
+
+def format_value(value):
+    """Wert für Berichte als Text (Datum als DD.MM.YYYY, fehlend als '')."""
+    if isinstance(value, datetime):
+        return value.strftime(DATE_OUTPUT_FORMAT)
+    if pd.isna(value):
+        return ''
+    return str(value)
+
+
+class ValidationCheck:
+    """
+    Eine Prüfung der Datenqualität auf einer Spalte, ausgewertet als
+    vektorisierte Maske über den konvertierten DataFrame.
+    
+    - parse:      Wert vorhanden, aber nicht als Zahl/Datum lesbar
+    - required:   Wert fehlt
+    - min / max:  Wert kleiner als min bzw. größer als max
+    - not_future: Datum liegt nach heute
+    - allowed:    Wert nicht in der Liste value
+    - pattern:    Text passt nicht auf den regulären Ausdruck value
+    """
+    
+    def __init__(self, check, column, value=None, name=None):
+        column = COLUMN_KEYS.get(column, column)
+        if column not in EXPECTED_HEADERS:
+            raise ValueError(f"Unbekannte Spalte in Prüfung: {column}")
+        if check not in VALIDATION_CHECKS:
+            raise ValueError(f"Unbekannte Prüfung: {check} (erlaubt: {', '.join(VALIDATION_CHECKS)})")
+        
+        self.check = check
+        self.column = column
+        self.kind = ('number' if column in NUMERIC_COLUMNS else
+                     'date' if column == DATE_COLUMN else 'text')
+        if check in ('min', 'max') and self.kind == 'text':
+            raise ValueError(f"Prüfung {check} nur für Zahlen- und Datumsspalten: {column}")
+        
+        if check == 'pattern':
+            value = re.compile(str(value))
+        elif check == 'allowed':
+            value = [str(v).strip() if self.kind == 'text' else self.parse_value(v) for v in value]
+        elif check in ('min', 'max'):
+            value = self.parse_value(value)
+        self.value = value
+        self.name = name or f"{column}: {check}" + (f" {format_value(value)}" if check in ('min', 'max') else '')
+    
+    @classmethod
+    def from_dict(cls, entry):
+        """Erzeugt eine Prüfung aus einem Eintrag der Prüfdatei."""
+        if 'check' not in entry or 'column' not in entry:
+            raise ValueError(f"Prüfung ohne 'check' oder 'column': {entry}")
+        return cls(entry['check'], entry['column'], entry.get('value'), entry.get('name'))
+    
+    def parse_value(self, value):
+        if self.kind == 'date':
+            return pd.Timestamp(to_datetime_value(value))
+        num = clean_number(value)
+        if num is None:
+            raise ValueError(f"Ungültige Zahl in Prüfung für {self.column}: {value}")
+        return num
+    
+    def mask(self, typed, raw):
+        """
+        Verstöße als bool-Array. typed ist die Spalte als Int64/datetime64/str,
+        raw die Werte vor der Konvertierung (für 'parse', sonst None).
+        """
+        missing = typed.isna().to_numpy(dtype=bool)
+        if self.kind == 'text':
+            missing = missing | (typed == '').to_numpy(dtype=bool)
+        
+        if self.check == 'parse':
+            if raw is None:
+                return np.zeros(len(typed), dtype=bool)
+            # Nur die (wenigen) fehlenden Werte ansehen: war dort vorher etwas eingetragen?
+            hits = np.zeros(len(typed), dtype=bool)
+            positions = np.flatnonzero(missing)
+            originals = raw.to_numpy(dtype=object)[positions]
+            hits[positions] = [not pd.isna(value) and str(value).strip() != '' for value in originals]
+            return hits
+        if self.check == 'required':
+            return missing
+        if self.check == 'pattern':
+            return ~typed.astype(str).str.fullmatch(self.value).fillna(False).to_numpy(dtype=bool) & ~missing
+        if self.check == 'allowed':
+            return ~typed.isin(self.value).fillna(False).to_numpy(dtype=bool) & ~missing
+        if self.check == 'not_future':
+            compared = typed > pd.Timestamp(datetime.now().date())
+        elif self.check == 'min':
+            compared = typed < self.value
+        else:
+            compared = typed > self.value
+        return compared.fillna(False).to_numpy(dtype=bool) & ~missing
+
+
+def load_checks(source=None):
+    """
+    Lädt Prüfungen aus einer JSON-/YAML-Datei ({"checks": [...]}), einer
+    Liste von dicts/ValidationCheck oder (None) die Standardprüfungen.
+    
+        {"checks": [
+            {"check": "min", "column": "Withdrawn", "value": 0, "name": "Withdrawn negativ"},
+            {"check": "required", "column": "Order"},
+            {"check": "allowed", "column": "ICt", "value": ["L", "1"]}
+        ]}
+    """
+    if source is None:
+        source = DEFAULT_VALIDATION
+    if isinstance(source, (str, Path)):
+        source = read_config_file(source, 'checks')
+    return [entry if isinstance(entry, ValidationCheck) else ValidationCheck.from_dict(entry)
+            for entry in source]
+
+
+class ReportValidator:
+    """
+    Wertet die Prüfungen (siehe load_checks) blockweise aus, damit auch
+    Streaming (--csv-only) und Speicherbudget (--max-memory, --resume)
+    validieren: add() bzw. add_rows() je Block, summary() am Ende.
+    Zeilennummern der Beispiele zählen über alle Blöcke weiter.
+    Textwerte in Zahlen- und Datumsspalten werden nach plan gelesen,
+    Standard ist das Format der bereinigten Ausgabe (cleaned_plan).
+    """
+    
+    def __init__(self, checks=None, plan=None):
+        self.checks = load_checks(checks)
+        self.plan = plan or cleaned_plan()
+        self.rows = 0
+        self.seconds = 0.0
+        self.present = [False] * len(self.checks)
+        self.counts = [0] * len(self.checks)
+        self.samples = [[] for _ in self.checks]
+    
+    @property
+    def columns(self):
+        return list(OrderedDict.fromkeys(check.column for check in self.checks))
+    
+    def add(self, df, raw=None):
+        """
+        Prüft einen Block des konvertierten DataFrames. raw enthält optional
+        die Spalten vor der Konvertierung ({Spalte: Series}), nötig für die
+        Prüfung 'parse'. Jede Spalte wird höchstens einmal umgewandelt.
+        """
+        started = time.perf_counter()
+        raw = raw or {}
+        typed = {}
+        for pos, check in enumerate(self.checks):
+            if check.column not in df.columns:
+                continue
+            self.present[pos] = True
+            if check.column not in typed:
+                values = df[check.column]
+                if check.kind == 'number' and values.dtype.kind not in 'iu' and str(values.dtype) != 'Int64':
+                    values = self.plan[check.column].to_int_column(values)
+                elif check.kind == 'date' and values.dtype.kind != 'M':
+                    values = self.plan[check.column].to_date_column(values)
+                elif check.kind == 'text':
+                    values = values.astype(str)
+                typed[check.column] = values
+            
+            hits = check.mask(typed[check.column], raw.get(check.column))
+            count = int(hits.sum())
+            self.counts[pos] += count
+            samples = self.samples[pos]
+            if count and len(samples) < VALIDATION_SAMPLES:
+                source = raw[check.column] if check.check == 'parse' else df[check.column]
+                for row in np.flatnonzero(hits)[:VALIDATION_SAMPLES - len(samples)]:
+                    # +2: Kopfzeile und 1-basierte Zählung im Excel-Blatt
+                    samples.append({'row': self.rows + int(row) + 2,
+                                    'value': format_value(source.iloc[row])})
+        self.rows += len(df)
+        self.seconds += time.perf_counter() - started
+    
+    def add_rows(self, raw_rows, rows):
+        """Wie add für Zeilenlisten (Spalten C bis Q): roh und nach convert_row."""
+        parsed = {check.column for check in self.checks if check.check == 'parse'}
+        df = {}
+        raw = {}
+        for col in self.columns:
+            idx = EXPECTED_HEADERS.index(col)
+            values = [row[idx] for row in rows]
+            if col in NUMERIC_COLUMNS:
+                # convert_row liefert int oder '' – direkt als Int64
+                values = pd.array([None if value == '' else value for value in values], dtype='Int64')
+            df[col] = values
+            if col in parsed:
+                raw[col] = pd.Series([row[idx] for row in raw_rows], dtype=object)
+        self.add(pd.DataFrame(df, columns=self.columns), raw)
+    
+    def summary(self, verbose=True):
+        """Ergebnis wie validate_report (mit verbose wird es auch ausgegeben)."""
+        results = []
+        for pos, check in enumerate(self.checks):
+            if not self.present[pos]:
+                continue
+            results.append({
+                'name': check.name,
+                'check': check.check,
+                'column': check.column,
+                'violations': self.counts[pos],
+                'share': self.counts[pos] / self.rows if self.rows else 0.0,
+                'samples': self.samples[pos],
+            })
+        summary = {
+            'rows': self.rows,
+            'violations': sum(result['violations'] for result in results),
+            'seconds': round(self.seconds, 3),
+            'results': results,
+        }
+        if verbose:
+            print_validation(summary)
+        return summary
+
+
+def validate_report(df, raw=None, checks=None, plan=None):
+    """
+    Prüft den konvertierten DataFrame (nach convert_data_types) gegen die
+    Prüfungen (siehe load_checks). raw enthält optional die Spalten vor der
+    Konvertierung ({Spalte: Series}), nötig für die Prüfung 'parse'.
+    plan wie bei ReportValidator.
+    
+    Jede Spalte wird höchstens einmal umgewandelt, alle Prüfungen sind
+    vektorisiert. Gibt ein dict mit rows, violations, seconds und results
+    (je Prüfung: name, check, column, violations, share, samples) zurück;
+    samples enthält Zeilennummern im Blatt 'Bereinigte Daten' mit dem Wert.
+    """
+    validator = ReportValidator(checks, plan)
+    validator.add(df, raw)
+    return validator.summary()
+
+
+def print_validation(summary):
+    """Gibt das Ergebnis der Validierung aus (nur verletzte Prüfungen)."""
+    failed = [result for result in summary['results'] if result['violations']]
+    if not failed:
+        print(f"\n🔎 Validierung: keine Auffälligkeiten ({len(summary['results'])} Prüfungen)")
+        return
+    print(f"\n🔎 Validierung: {summary['violations']} Auffälligkeiten "
+          f"in {len(failed)} von {len(summary['results'])} Prüfungen")
+    for result in failed:
+        examples = ', '.join(f"Zeile {s['row']}: {s['value']}" for s in result['samples'][:3])
+        print(f"   ⚠ {result['name']}: {result['violations']} ({result['share']:.1%}) – z.B. {examples}")
+
+
+def validation_frame(summary):
+    """Validierungsergebnis als Tabelle für das Excel-Blatt 'Validierung'."""
+    return pd.DataFrame([{
+        'Prüfung': result['name'],
+        'Spalte': result['column'],
+        'Verstöße': result['violations'],
+        'Anteil': round(result['share'], 6),
+        'Beispiele': '; '.join(f"Zeile {s['row']}: {s['value']}" for s in result['samples']),
+    } for result in summary['results']], columns=['Prüfung', 'Spalte', 'Verstöße', 'Anteil', 'Beispiele'])
+
+
+def write_json(data, path):
+    """Schreibt data als JSON (UTF-8, eingerückt)."""
+    def write(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    return atomic_write(path, write)
+
+
+# ============================================================================
+# SPALTENPROFIL (NULLWERTE, MIN/MAX, DISTINCT, HÄUFIGSTE WERTE)
+# ============================================================================
+
+# Anzahl häufigster Werte je Spalte im Profil
+PROFILE_TOP_K = 10
+
+# Zähler je Spalte für die häufigsten Werte (Misra-Gries); Fehler ≤ Zeilen / (Zähler + 1)
+PROFILE_COUNTERS = 100
+
+# HyperLogLog: 2^12 Register (4 KB je Spalte), Standardfehler ≈ 1,6 %
+HLL_PRECISION = 12
+
+
+class HyperLogLog:
+    """Schätzt die Zahl verschiedener Werte mit festem Speicher (2^precision Bytes)."""
+    
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+    
+    def add(self, values):
+        """Nimmt ein Array von Werten auf (vektorisiert über 64-Bit-Hashes)."""
+        if not len(values):
+            return
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+        rest_bits = 64 - self.precision
+        idx = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Position des höchsten gesetzten Bits (exakt, da rest < 2^53)
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = (rest_bits - exponent + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+    
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # Linear Counting für kleine Mengen
+        return int(round(estimate))
+
+
+class HeavyHitters:
+    """
+    Häufigste Werte mit höchstens capacity Zählern (Misra-Gries, gewichtet).
+    Blöcke werden mit ihren exakten Häufigkeiten zusammengeführt; solange
+    nie gekürzt werden musste, sind die Zahlen exakt.
+    """
+    
+    def __init__(self, capacity=PROFILE_COUNTERS):
+        self.capacity = capacity
+        self.counters = {}
+        self.exact = True
+    
+    def add(self, values, counts):
+        """Nimmt Werte mit ihren Häufigkeiten im aktuellen Block auf."""
+        if len(values) > self.capacity:
+            # Block vorab auf capacity Zähler verdichten (vektorisiert)
+            top = np.argpartition(counts, -(self.capacity + 1))[-(self.capacity + 1):]
+            cut = counts[top].min()
+            keep = top[counts[top] > cut]
+            values, counts = values[keep], counts[keep] - cut
+            self.exact = False
+        for value, count in zip(values.tolist(), counts.tolist()):
+            self.counters[value] = self.counters.get(value, 0) + count
+        if len(self.counters) > self.capacity:
+            cut = sorted(self.counters.values(), reverse=True)[self.capacity]
+            self.counters = {value: count - cut for value, count in self.counters.items() if count > cut}
+            self.exact = False
+    
+    def top(self, k=PROFILE_TOP_K):
+        return sorted(self.counters.items(), key=lambda item: (-item[1], str(item[0])))[:k]
+
+
+class ColumnProfile:
+    """Profil einer Spalte: leere Werte, Min/Max, verschiedene und häufigste Werte."""
+    
+    def __init__(self, column):
+        self.column = column
+        self.kind = 'number' if column in NUMERIC_COLUMNS else 'date' if column == DATE_COLUMN else 'text'
+        self.rows = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog()
+        self.top = HeavyHitters()
+    
+    def update(self, values, plan):
+        """
+        Nimmt einen Block von Rohwerten (Strings) auf; gerechnet wird je
+        verschiedenem Wert. Zahlen und Datumswerte werden nach plan gelesen.
+        """
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.rows += len(values)
+        
+        uniques = np.asarray(uniques, dtype=object)
+        filled = np.array([str(value).strip() != '' for value in uniques], dtype=bool)
+        self.nulls += int(len(values) - counts[filled].sum())
+        uniques, counts = uniques[filled], counts[filled]
+        if not len(uniques):
+            return
+        
+        self.distinct.add(uniques)
+        self.top.add(uniques, counts)
+        
+        if self.kind == 'number':
+            typed = plan[self.column].to_int_column(pd.Series(uniques, dtype=object)).dropna()
+        elif self.kind == 'date':
+            typed = plan[self.column].to_date_column(uniques).dropna()
+        else:
+            typed = pd.Series(uniques).astype(str)
+        if len(typed):
+            low, high = typed.min(), typed.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+    
+    def export_value(self, value):
+        """Min/Max für JSON: Zahl, Datum als DD.MM.YYYY oder Text."""
+        if value is None:
+            return None
+        return int(value) if self.kind == 'number' else format_value(value)
+    
+    def summary(self):
+        return {
+            'column': self.column,
+            'nulls': self.nulls,
+            'null_share': self.nulls / self.rows if self.rows else 0.0,
+            'min': self.export_value(self.min),
+            'max': self.export_value(self.max),
+            'distinct': min(self.distinct.count(), self.rows - self.nulls),
+            'top': [{'value': value, 'count': count} for value, count in self.top.top()],
+            'top_exact': self.top.exact,
+        }
+
+
+class ReportProfile:
+    """
+    Spaltenprofil über alle behaltenen Zeilen, ohne sie zu speichern.
+    
+    Zeilen (append) werden in Blöcken zu batch_size gesammelt und je Spalte
+    einmal faktorisiert; alle Auswertungen laufen nur über die verschiedenen
+    Werte eines Blocks. Speicherbedarf je Spalte: HyperLogLog-Register und
+    PROFILE_COUNTERS Zähler, unabhängig von der Dateigröße.
+    
+    Zahlen und Datumswerte werden nach plan (FormatPlan des Reports)
+    gelesen; ohne plan wird er aus den ersten aufgenommenen Zeilen bestimmt.
+    """
+    
+    def __init__(self, columns=None, batch_size=CSV_BATCH_SIZE, plan=None):
+        self.columns = list(columns or EXPECTED_HEADERS)
+        self.profiles = [ColumnProfile(col) for col in self.columns]
+        self.batch_size = batch_size
+        # Das Profil läuft neben dem Export mit; dessen Plan meldet die Abweichungen
+        self.plan = plan.copy() if plan is not None else None
+        self.pending = []
+        self.rows = 0
+        self.seconds = 0.0
+    
+    def append(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if not self.pending:
+            return
+        started = time.perf_counter()
+        block = np.empty((len(self.pending), len(self.columns)), dtype=object)
+        block[:] = self.pending
+        if self.plan is None:
+            self.plan = plan_formats({col: block[:, pos] for pos, col in enumerate(self.columns)})
+        for pos, profile in enumerate(self.profiles):
+            profile.update(block[:, pos], self.plan)
+        self.rows += len(self.pending)
+        self.pending = []
+        self.seconds += time.perf_counter() - started
+    
+    def add_frame(self, df):
+        """Nimmt die Zeilen eines DataFrames (Rohwerte als Strings) auf."""
+        self.flush()
+        started = time.perf_counter()
+        if self.plan is None:
+            self.plan = plan_frame(df)
+        for start in range(0, len(df), self.batch_size):
+            chunk = df.iloc[start:start + self.batch_size]
+            for profile in self.profiles:
+                if profile.column in chunk.columns:
+                    profile.update(chunk[profile.column].to_numpy(dtype=object), self.plan)
+        self.rows += len(df)
+        self.seconds += time.perf_counter() - started
+    
+    def summary(self):
+        self.flush()
+        return {
+            'rows': self.rows,
+            'seconds': round(self.seconds, 3),
+            'columns': [profile.summary() for profile in self.profiles],
+        }
+
+
+def print_profile(summary):
+    """Gibt das Spaltenprofil kurz aus."""
+    print(f"\n🧮 Spaltenprofil ({summary['rows']} Zeilen, {summary['seconds']:.2f} s):")
+    for col in summary['columns']:
+        top = col['top'][0]['value'] if col['top'] else '–'
+        print(f"   {col['column']:<22} leer {col['nulls']:>8}  ~{col['distinct']:>8} verschieden  "
+              f"{format_value(col['min']) or '–'} … {format_value(col['max']) or '–'}  (häufigster: {top})")
+
+
+def profile_frame(summary):
+    """Spaltenprofil als Tabelle für das Excel-Blatt 'Profil'."""
+    return pd.DataFrame([{
+        'Spalte': col['column'],
+        'Leer': col['nulls'],
+        'Anteil leer': round(col['null_share'], 6),
+        'Minimum': col['min'],
+        'Maximum': col['max'],
+        'Verschieden (ca.)': col['distinct'],
+        'Häufigste Werte': '; '.join(f"{item['value']} ({item['count']})" for item in col['top']),
+        'Häufigkeiten exakt': 'ja' if col['top_exact'] else 'nein (Mindestwerte)',
+    } for col in summary['columns']], columns=['Spalte', 'Leer', 'Anteil leer', 'Minimum', 'Maximum',
+                                                'Verschieden (ca.)', 'Häufigste Werte', 'Häufigkeiten exakt'])
+
+
+def write_profile(summary, path):
+    """Schreibt das Spaltenprofil als JSON."""
+    write_json(summary, path)
+    print(f"💾 Spaltenprofil: {path}")
+
+
+# ============================================================================
+# LAZY-ABFRAGEN (FILTER UND SPALTENAUSWAHL BEIM LESEN)
+# ============================================================================
+
+def column_key(column):
+    """Spaltenname als Python-Name, z.B. 'Work Ctr' → 'work_ctr'."""
+    return re.sub(r'[^0-9a-z]+', '_', column.lower()).strip('_')
+
+
+# Keyword-Namen für filter(): work_ctr, material, pstng_date, order, ...
+COLUMN_KEYS = {column_key(col): col for col in EXPECTED_HEADERS}
+
+
+def to_datetime_value(value):
+    """Wandelt str/date/datetime/Timestamp in ein datetime-Objekt um."""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if hasattr(value, 'year') and hasattr(value, 'month') and hasattr(value, 'day'):
+        return datetime(value.year, value.month, value.day)
+    parsed = parse_sap_date(value)
+    if parsed is None:
+        raise ValueError(f"Ungültiges Datum: {value}")
+    return parsed
+
+
+class ReportScan:
+    """
+    Lazy-Abfrage auf einen SAP-Report.
+    
+    Filter und Spaltenauswahl werden erst bei collect() ausgeführt und direkt
+    in die Leseschleife verlagert: Zeilen werden nur bis zur letzten benötigten
+    Spalte aufgeteilt, verworfene Zeilen werden nie konvertiert oder
+    gespeichert, nicht ausgewählte Spalten nie geparst. Zahlen und
+    Datumswerte werden nach plan gelesen (FormatPlan, sonst plan_report
+    beim Ausführen).
+    
+    Beispiel:
+        df = (scan_report("L91_Material.txt")
+              .filter(work_ctr="L91", date_from="01.01.2024")
+              .select(['Material', 'Withdrawn', 'Pstng Date'])
+              .collect())
+    """
+    
+    def __init__(self, file_path, predicates=None, columns=None, plan=None):
+        self.file_path = file_path
+        self.predicates = list(predicates or [])  # [(Spaltenindex, Funktion(Zelle, plan))]
+        self.columns = list(columns) if columns is not None else list(EXPECTED_HEADERS)
+        self.plan = plan
+        self.stats = None
+    
+    def filter(self, date_from=None, date_to=None, **conditions):
+        """
+        Fügt Filter hinzu (UND-verknüpft).
+        
+        - date_from / date_to: Datumsbereich für 'Pstng Date' (inklusive)
+        - spalte=wert oder spalte=[werte]: Gleichheit, Spaltennamen als
+          Python-Namen (work_ctr, material, order, ict, ...)
+        """
+        predicates = list(self.predicates)
+        
+        if date_from is not None or date_to is not None:
+            start = to_datetime_value(date_from) if date_from is not None else None
+            end = to_datetime_value(date_to) if date_to is not None else None
+            
+            def in_range(cell, plan, start=start, end=end):
+                parsed = plan[DATE_COLUMN].parse(cell)
+                if parsed is None:
+                    return False
+                return (start is None or parsed >= start) and (end is None or parsed <= end)
+            
+            predicates.append((EXPECTED_HEADERS.index(DATE_COLUMN), in_range))
+        
+        for key, value in conditions.items():
+            column = COLUMN_KEYS.get(key, key if key in EXPECTED_HEADERS else None)
+            if column is None:
+                raise ValueError(f"Unbekannte Spalte: {key}")
+            values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            
+            if column in NUMERIC_COLUMNS:
+                allowed = {clean_number(v) for v in values}
+                predicate = lambda cell, plan, column=column, allowed=allowed: plan[column].parse(cell) in allowed
+            elif column == DATE_COLUMN:
+                allowed = {to_datetime_value(v) for v in values}
+                predicate = lambda cell, plan, allowed=allowed: plan[DATE_COLUMN].parse(cell) in allowed
+            else:
+                allowed = {str(v).strip() for v in values}
+                predicate = lambda cell, plan, allowed=allowed: cell in allowed
+            predicates.append((EXPECTED_HEADERS.index(column), predicate))
+        
+        return ReportScan(self.file_path, predicates, self.columns, self.plan)
+    
+    def exclude(self, rules):
+        """
+        Entfernt Zeilen, auf die eine der Filterregeln zutrifft (Regeldatei,
+        Liste von dicts oder FilterRule, siehe load_rules).
+        """
+        predicates = list(self.predicates)
+        for rule in load_rules(rules):
+            predicates.append((rule.position, lambda cell, plan, rule=rule: not rule.matches(cell, plan)))
+        return ReportScan(self.file_path, predicates, self.columns, self.plan)
+    
+    def select(self, columns):
+        """Beschränkt das Ergebnis auf die angegebenen Spalten."""
+        unknown = [col for col in columns if col not in EXPECTED_HEADERS]
+        if unknown:
+            raise ValueError(f"Unbekannte Spalten: {unknown}")
+        return ReportScan(self.file_path, self.predicates, columns, self.plan)
+    
+    def iter_rows(self, stats=None):
+        """
+        Generator: liefert die gefilterten Zeilen als Listen (nur ausgewählte
+        Spalten, bereits konvertiert).
+        """
+        if stats is None:
+            stats = new_stats()
+        stats.setdefault('filtered_rows', 0)
+        
+        plan = self.plan or plan_report(self.file_path)
+        header_row_idx, header_start_col, lines = locate_header(self.file_path)
+        
+        select_idx = [EXPECTED_HEADERS.index(col) for col in self.columns]
+        predicates = [(header_start_col + idx, predicate) for idx, predicate in self.predicates]
+        selected = [(header_start_col + idx, EXPECTED_HEADERS[idx]) for idx in select_idx]
+        converters = [plan[col].parse if col in NUMERIC_COLUMNS else
+                      plan[col].format if col == DATE_COLUMN else None
+                      for _, col in selected]
+        
+        # Zeilen nur bis zur letzten benötigten Spalte aufteilen
+        needed = [header_start_col, 1] + [pos for pos, _ in predicates] + [pos for pos, _ in selected]
+        max_split = max(needed) + 1
+        
+        for line in lines:
+            stats['total_rows'] += 1
+            
+            # Komplett leere Zeile (nur Leerzeichen/Tabs)
+            if not line.strip():
+                stats['empty_rows'] += 1
+                continue
+            
+            row = line.split('\t', max_split)
+            n = len(row)
+            
+            # Summenzeile (markiert mit * in Spalte B)
+            if n > 1 and row[1].strip() in ('*', '**'):
+                stats['sum_rows'] += 1
+                continue
+            
+            # Materialnummer in Spalte C
+            if n <= header_start_col or not row[header_start_col].strip():
+                stats['no_material'] += 1
+                continue
+            
+            if not all(predicate(row[pos].strip() if pos < n else '', plan) for pos, predicate in predicates):
+                stats['filtered_rows'] += 1
+                continue
+            
+            values = []
+            for (pos, _), convert in zip(selected, converters):
+                cell = row[pos].strip() if pos < n else ''
+                values.append(convert(cell) if convert is not None else cell)
+            
+            stats['kept_rows'] += 1
+            yield values
+    
+    def collect(self):
+        """Führt die Abfrage aus und gibt einen DataFrame zurück."""
+        self.stats = new_stats()
+        rows = list(self.iter_rows(self.stats))
+        
+        print(f"\n📊 Abfrage: {self.stats['kept_rows']} Treffer, "
+              f"{self.stats['filtered_rows']} gefiltert (von {self.stats['total_rows']} Zeilen)")
+        
+        if not rows:
+            return pd.DataFrame(columns=self.columns)
+        # Spaltenweise aufbauen (Zahlenspalten als Int64 wie bei convert_data_types)
+        data = {}
+        for col, values in zip(self.columns, zip(*rows)):
+            data[col] = (pd.array(values, dtype='Int64') if col in NUMERIC_COLUMNS
+                         else pd.Series(values))
+        return pd.DataFrame(data, columns=self.columns)
+
+
+def scan_report(file_path):
+    """
+    Startet eine Lazy-Abfrage auf einen SAP-Report (siehe ReportScan).
+    """
+    return ReportScan(file_path)
+
+
+# ============================================================================
+# SIDECAR-INDEX (DIREKTZUGRIFF AUF ROHZEILEN)
+# ============================================================================
+
+def index_key(value, fmt):
+    """
+    Schlüssel für den Index: Zahlenwert (gelesen mit fmt, dem NumberFormat
+    der Spalte) oder, bei Text, ein 63-Bit-Hash des Strings.
+    """
+    num = fmt.parse(value)
+    if num is not None and -2 ** 63 <= num < 2 ** 63:
+        return num
+    return key_hash([str(value).strip()]) >> 1
+
+
+class ReportIndex:
+    """
+    Sidecar-Index für einen Rohreport ([datei].sapidx.npz).
+    
+    Speichert als kompakte int64-Arrays:
+    - line_offsets: Byte-Offset jeder Zeile (Index = Zeilennummer - 1)
+    - je Spalte aus INDEX_COLUMNS: sortierte Schlüssel und zugehörige Zeilen
+    
+    Damit kann zu einer Original_Zeile oder allen Buchungen eines Auftrags
+    direkt an die richtige Stelle der Rohdatei gesprungen werden.
+    Schlüssel werden nach plan (FormatPlan des Reports, sonst plan_report)
+    gelesen; die Zahlenformate der Index-Spalten werden mitgespeichert.
+    """
+    
+    def __init__(self, file_path, plan=None):
+        self.file_path = str(file_path)
+        # Schlüssel im Format des Reports, ohne die Zähler der Konvertierung mitzuzählen
+        self.plan = (plan or plan_report(file_path)).copy()
+        self.header_start_col = 2
+        self.line_offsets = array('q')
+        self.keys = {col: array('q') for col in INDEX_COLUMNS}
+        self.lines = {col: array('q') for col in INDEX_COLUMNS}
+        self.sorted = False
+    
+    @staticmethod
+    def index_path(file_path):
+        return Path(str(file_path) + INDEX_SUFFIX)
+    
+    def add_row(self, row_idx, data_row):
+        """Nimmt die Index-Spalten einer behaltenen Zeile auf."""
+        for col, pos in zip(INDEX_COLUMNS, _INDEX_POS):
+            value = data_row[pos]
+            if value:
+                self.keys[col].append(index_key(value, self.plan[col]))
+                self.lines[col].append(row_idx)
+    
+    def _arrays(self):
+        """Sortiert die Schlüssel und gibt alle Arrays als numpy zurück."""
+        arrays = {'line_offsets': np.asarray(self.line_offsets, dtype=np.int64)}
+        for col in INDEX_COLUMNS:
+            keys = np.asarray(self.keys[col], dtype=np.int64)
+            lines = np.asarray(self.lines[col], dtype=np.int64)
+            if not self.sorted:
+                order = np.argsort(keys, kind='stable')
+                keys, lines = keys[order], lines[order]
+            arrays[f"{column_key(col)}_keys"] = keys
+            arrays[f"{column_key(col)}_lines"] = lines
+        return arrays
+    
+    def save(self):
+        """Schreibt den Index neben die Rohdatei und gibt den Pfad zurück."""
+        stat = os.stat(self.file_path)
+        arrays = self._arrays()
+        arrays['meta'] = np.array([stat.st_size, stat.st_mtime_ns, self.header_start_col], dtype=np.int64)
+        arrays['formats'] = np.array([self.plan[col].spec for col in INDEX_COLUMNS])
+        path = atomic_write(self.index_path(self.file_path), lambda tmp: np.savez(tmp, **arrays))
+        print(f"🗂 Index gespeichert: {path}")
+        return path
+    
+    @classmethod
+    def load(cls, file_path):
+        """
+        Lädt den Index einer Rohdatei. Gibt None zurück, wenn er fehlt oder
+        veraltet ist (Größe oder Änderungszeit der Datei passen nicht, oder
+        ein älterer Index ohne gespeicherte Zahlenformate).
+        """
+        path = cls.index_path(file_path)
+        if not path.exists():
+            return None
+        stat = os.stat(file_path)
+        with np.load(path) as data:
+            size, mtime_ns, header_start_col = (int(v) for v in data['meta'])
+            if size != stat.st_size or mtime_ns != stat.st_mtime_ns or 'formats' not in data.files:
+                return None
+            plan = FormatPlan({col: NumberFormat(col, str(spec))
+                               for col, spec in zip(INDEX_COLUMNS, data['formats'])})
+            index = cls(file_path, plan)
+            index.header_start_col = header_start_col
+            index.line_offsets = data['line_offsets']
+            for col in INDEX_COLUMNS:
+                index.keys[col] = data[f"{column_key(col)}_keys"]
+                index.lines[col] = data[f"{column_key(col)}_lines"]
+        index.sorted = True
+        return index
+    
+    def line_numbers(self, column, value):
+        """Zeilennummern (1-basiert) aller Zeilen mit column == value."""
+        if column not in INDEX_COLUMNS:
+            raise ValueError(f"Spalte nicht indiziert: {column} (verfügbar: {INDEX_COLUMNS})")
+        fmt = self.plan[column]
+        key = index_key(value, fmt)
+        number = fmt.parse(value)
+        keys = self.keys[column]
+        lo, hi = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+        candidates = sorted(int(i) + 1 for i in self.lines[column][lo:hi])
+        
+        # Hash-Kollisionen bei Textwerten ausschließen
+        pos = self.header_start_col + EXPECTED_HEADERS.index(column)
+        matches = []
+        for line_no, line in self.read_lines(candidates):
+            cells = line.split('\t')
+            cell = cells[pos].strip() if pos < len(cells) else ''
+            if cell == str(value).strip() or (number is not None and fmt.parse(cell) == number):
+                matches.append(line_no)
+        return matches
+    
+    def read_lines(self, line_numbers):
+        """Liest die angegebenen Zeilen (1-basiert) per seek aus der Rohdatei."""
+        result = []
+        with open(self.file_path, 'rb') as f:
+            for line_no in line_numbers:
+                if not 1 <= line_no <= len(self.line_offsets):
+                    raise ValueError(f"Zeile {line_no} existiert nicht")
+                f.seek(int(self.line_offsets[line_no - 1]))
+                raw = f.readline()
+                # Einzelne \r (alte Mac-Zeilenenden) beenden die Zeile ebenfalls
+                line = raw.rstrip(b'\n').split(b'\r')[0]
+                result.append((line_no, line.decode('utf-8', errors='replace')))
+        return result
+
+
+_INDEX_POS = [EXPECTED_HEADERS.index(col) for col in INDEX_COLUMNS]
+
+
+def build_index(file_path):
+    """Baut den Sidecar-Index in einem eigenen Durchlauf und speichert ihn."""
+    index = ReportIndex(file_path)
+    for _ in iter_cleaned_rows(file_path, new_stats(), index=index):
+        pass
+    index.save()
+    return index
+
+
+def load_or_build_index(file_path):
+    """Lädt den Index oder baut ihn neu, falls er fehlt oder veraltet ist."""
+    index = ReportIndex.load(file_path)
+    if index is None:
+        print("🗂 Kein aktueller Index gefunden, wird erstellt...")
+        index = build_index(file_path)
+        index = ReportIndex.load(file_path)
+    return index
+
+
+# ============================================================================
+# SPEICHERBUDGET (AUSLAGERN AUF DIE PLATTE)
+# ============================================================================
+
+def parse_size(value):
+    """
+    Wandelt Größenangaben wie '2G', '1500M', '512MB' oder '1000000' in Bytes um.
+    """
+    text = str(value).strip().upper().replace(' ', '')
+    if text.endswith('B'):
+        text = text[:-1]
+    factor = 1
+    for unit, unit_factor in (('K', 1024), ('M', 1024 ** 2), ('G', 1024 ** 3), ('T', 1024 ** 4)):
+        if text.endswith(unit):
+            text, factor = text[:-1], unit_factor
+            break
+    try:
+        size = int(float(text.replace(',', '.')) * factor)
+    except ValueError:
+        raise ValueError(f"Ungültige Größenangabe: {value}")
+    if size <= 0:
+        raise ValueError(f"Größenangabe muss positiv sein: {value}")
+    return size
+
+
+class SpillBuffer:
+    """
+    Zeilenpuffer mit Speicherlimit.
+    
+    Zeilen (Listen oder dicts) werden gesammelt, bis ihre geschätzte Größe
+    limit_bytes erreicht. Dann wird der Puffer als spaltenweiser Chunk
+    (DataFrame-Pickle) nach spill_dir ausgelagert und geleert.
+    iter_chunks() liefert anschließend alle Chunks in Originalreihenfolge.
+    Mit auto_spill=False lagert append nicht selbst aus; der Aufrufer prüft
+    full und ruft spill() an passender Stelle (z.B. an Checkpoint-Grenzen).
+    """
+    
+    # Geschätzter Overhead pro Python-String bzw. pro Zeilenliste (Bytes)
+    CELL_OVERHEAD = 56
+    ROW_OVERHEAD = 64
+    
+    def __init__(self, columns, limit_bytes, spill_dir, name, auto_spill=True):
+        self.columns = list(columns)
+        self.limit_bytes = limit_bytes
+        self.spill_dir = Path(spill_dir)
+        self.name = name
+        self.auto_spill = auto_spill
+        self.rows = []
+        self.row_bytes = 0
+        self.chunk_paths = []
+        self.total_rows = 0
+    
+    def __len__(self):
+        return self.total_rows
+    
+    @property
+    def full(self):
+        return self.row_bytes >= self.limit_bytes
+    
+    def append(self, row):
+        if isinstance(row, dict):
+            row = [row[col] for col in self.columns]
+        self.rows.append(row)
+        self.total_rows += 1
+        self.row_bytes += (self.ROW_OVERHEAD + self.CELL_OVERHEAD * len(row)
+                           + sum(len(str(cell)) for cell in row))
+        if self.auto_spill and self.full:
+            self.spill()
+    
+    def spill(self):
+        """Lagert die gepufferten Zeilen als Chunk auf die Platte aus."""
+        if not self.rows:
+            return
+        chunk_path = self.spill_dir / f"{self.name}_{len(self.chunk_paths):05d}.pkl"
+        pd.DataFrame(self.rows, columns=self.columns).to_pickle(chunk_path)
+        self.chunk_paths.append(chunk_path)
+        self.rows = []
+        self.row_bytes = 0
+    
+    def iter_chunks(self):
+        """Liefert alle Daten als DataFrames (ausgelagerte Chunks, dann den Rest)."""
+        for chunk_path in self.chunk_paths:
+            yield pd.read_pickle(chunk_path)
+        if self.rows:
+            yield pd.DataFrame(self.rows, columns=self.columns)
+    
+    def state(self):
+        """Stand für einen Checkpoint (nur nach spill() vollständig)."""
+        return {'chunks': [path.name for path in self.chunk_paths], 'rows': self.total_rows}
+    
+    def restore(self, state):
+        """Übernimmt die Chunks eines Checkpoints (siehe state)."""
+        self.chunk_paths = [self.spill_dir / name for name in state['chunks']]
+        self.total_rows = state['rows']
+        self.rows = []
+        self.row_bytes = 0
+
+
+# Mindestabstand zwischen zwei Checkpoints bei --resume (Sekunden, gespeichert an der nächsten Chunk-Grenze)
+CHECKPOINT_SECONDS = 60
+
+# Speicherbudget bei --resume ohne --max-memory
+CHECKPOINT_MEMORY = '1G'
+
+# Stand im Checkpoint-Ordner
+CHECKPOINT_STATE = 'state.json'
+
+
+class Checkpoint:
+    """
+    Fortsetzungspunkt für lange Läufe (--resume): ein Ordner mit den
+    ausgelagerten Chunks und state.json (Byte-Offset der nächsten Zeile,
+    Header-Position, Statistik, Chunk-Listen).
+    
+    Ein Checkpoint gehört zu genau einer Eingabedatei (Pfad, Größe,
+    Änderungszeit) und denselben Filterregeln; sonst wird neu begonnen.
+    """
+    
+    def __init__(self, file_path, directory, rules=None, interval=None):
+        self.directory = Path(directory)
+        self.interval = CHECKPOINT_SECONDS if interval is None else interval
+        stat = os.stat(file_path)
+        self.source = {
+            'file': str(Path(file_path).resolve()),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rules': [[rule.column, rule.op, str(rule.value), rule.reason] for rule in rules or []],
+        }
+        self.last_save = time.monotonic()
+    
+    @property
+    def state_path(self):
+        return self.directory / CHECKPOINT_STATE
+    
+    def load(self):
+        """Letzter Stand oder None (kein Checkpoint oder andere Datei/Regeln)."""
+        if not self.state_path.exists():
+            return None
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠ Checkpoint nicht lesbar ({e}) – starte von vorn")
+            return None
+        if state.get('source') != self.source:
+            print("⚠ Checkpoint gehört zu einer anderen Dateiversion oder anderen Filterregeln – starte von vorn")
+            return None
+        return state
+    
+    def due(self):
+        return time.monotonic() - self.last_save >= self.interval
+    
+    def save(self, state):
+        """Schreibt den Stand atomar (ein Abbruch hinterlässt den vorigen Stand)."""
+        state = dict(state, source=self.source, saved=datetime.now().isoformat(timespec='seconds'))
+        write_json(state, self.state_path)
+        self.last_save = time.monotonic()
+    
+    def clear(self):
+        """Entfernt den Checkpoint-Ordner nach erfolgreichem Lauf."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def checkpoint_dir(file_path, spill_dir=None):
+    """Checkpoint-Ordner [name]_checkpoint neben der Eingabe (oder in spill_dir)."""
+    input_path = Path(file_path)
+    return Path(spill_dir or input_path.parent) / f"{report_base_name(input_path)}_checkpoint"
+
+
+DELETED_COLUMNS = ['Grund', 'Original_Zeile', 'Daten']
+
+
+def process_sap_report_spilled(file_path, max_memory, spill_dir, index=None, rules=None, profile=None,
+                               checkpoint=None, progress=None, cancel=None, plan=None):
+    """
+    Wie process_sap_report, aber mit Speicherbudget: behaltene und gelöschte
+    Zeilen werden in SpillBuffer gesammelt und bei Bedarf nach spill_dir
+    ausgelagert. Filterregeln und Spaltenprofil (profile) werden dabei
+    zeilenweise angewendet bzw. fortgeschrieben; Regeln lesen Zahlen und
+    Datumswerte nach plan (wie bei iter_cleaned_rows).
+    
+    Mit checkpoint (Checkpoint, Ordner = spill_dir) lagern die Puffer nur
+    an den Aufrufen des Checkpoint-Callbacks aus; gespeichert wird an der
+    ersten Chunk-Grenze von kept nach Ablauf des Checkpoint-Abstands (kein
+    Auslagern nur für den Checkpoint). Ein vorhandener Stand wird fortgesetzt. Ist das Einlesen bereits abgeschlossen, werden
+    nur die Chunks übernommen.
+    progress und cancel wie bei process_sap_report; bei Abbruch wird mit
+    checkpoint der aktuelle Stand gespeichert, damit --resume dort fortsetzt.
+    Gibt (kept, deleted, stats) zurück.
+    """
+    # Budget-Aufteilung: Puffer für behaltene Zeilen, Puffer für gelöschte Zeilen,
+    # der Rest bleibt frei für Konvertierung und Export (jeweils ein Chunk)
+    kept = SpillBuffer(EXPECTED_HEADERS, max_memory // 4, spill_dir, 'kept')
+    deleted = SpillBuffer(DELETED_COLUMNS, max_memory // 10, spill_dir, 'deleted')
+    stats = new_stats()
+    
+    tracker = ProgressTracker(progress, cancel)
+    resume, save_checkpoint = None, None
+    position = {}
+    
+    def store_checkpoint(state):
+        kept.spill()
+        deleted.spill()
+        checkpoint.save(dict(state, stats=stats, kept=kept.state(), deleted=deleted.state()))
+    
+    if checkpoint is not None:
+        resume = checkpoint.load()
+        if resume is not None:
+            kept.restore(resume['kept'])
+            deleted.restore(resume['deleted'])
+            stats = resume['stats']
+            if 'rule_counts' in stats:
+                stats['rule_counts'] = OrderedDict(stats['rule_counts'])
+            print(f"\n⏩ Checkpoint vom {resume['saved']}: {stats['total_rows']} Zeilen bereits verarbeitet")
+        
+        # Auslagern nur vor der nächsten Zeile, sonst passt der Stand nicht zur Position
+        kept.auto_spill = deleted.auto_spill = False
+        
+        def save_checkpoint(current):
+            position.update(current)
+            if deleted.full:
+                deleted.spill()
+            if kept.full:
+                if checkpoint.due():
+                    store_checkpoint(current)
+                else:
+                    kept.spill()
+    
+    if resume is None or not resume.get('complete'):
+        total_bytes = os.path.getsize(file_path) if detect_input_format(file_path) is None else None
+        tracker.start('read', total_bytes=total_bytes)
+        try:
+            for _, data_row in iter_cleaned_rows(file_path, stats, deleted, index, tracker, rules,
+                                                 resume=resume, checkpoint=save_checkpoint, plan=plan):
+                kept.append(data_row)
+                if profile is not None:
+                    profile.append(data_row)
+        except ProcessingCancelled:
+            # Abbruch direkt nach dem Checkpoint-Aufruf: position ist die nächste Zeile
+            if position:
+                store_checkpoint(position)
+                print(f"\n⏸ Abgebrochen – Checkpoint nach {stats['total_rows']} Zeilen gespeichert")
+            raise
+        tracker.finish(stats['total_rows'])
+    
+    # Alles auslagern, damit der Export nur noch chunkweise Speicher braucht
+    kept.spill()
+    deleted.spill()
+    if checkpoint is not None:
+        store_checkpoint({'complete': True})
+    
+    print_stats(stats)
+    print(f"\n💽 Ausgelagert: {len(kept.chunk_paths)} Chunks (bereinigt), "
+          f"{len(deleted.chunk_paths)} Chunks (gelöscht)")
+    
+    return kept, deleted, stats
+
+
+def write_spilled_csv(buffer, path, compression=None, convert=True, plan=None, tracker=None,
+                      validation=None):
+    """
+    Schreibt alle Chunks eines SpillBuffer nacheinander in eine CSV
+    (mit convert konvertiert wie convert_row nach plan).
+    Mit tracker wird nach jedem Chunk Fortschritt gemeldet bzw. auf Abbruch geprüft,
+    mit validation (ReportValidator) werden die Prüfungen je Chunk ausgewertet.
+    """
+    def write(tmp):
+        written = 0
+        with open_output_text(tmp, compression) as f:
+            writer = csv.writer(f, delimiter=';', lineterminator=os.linesep)
+            writer.writerow(buffer.columns)
+            for chunk in buffer.iter_chunks():
+                raw_rows = chunk.values.tolist()
+                rows = raw_rows
+                if convert:
+                    rows = [convert_row(row, plan) for row in raw_rows]
+                writer.writerows(rows)
+                if validation is not None:
+                    validation.add_rows(raw_rows, rows)
+                written += len(rows)
+                if tracker is not None:
+                    tracker.update(written)
+    return atomic_write(path, write)
+
+
+def write_spilled_excel(kept, deleted, path, native_dates=False, df_profile=None, plan=None, tracker=None,
+                        validation_sheet=None):
+    """
+    Schreibt die Chunks zeilenweise in eine Excel-Datei (openpyxl write-only),
+    ohne den gesamten Datenbestand im Speicher zu halten.
+    Mit native_dates=True wird Pstng Date als echte Datumszelle geschrieben,
+    mit df_profile kommt das Blatt 'Profil' hinzu, mit validation_sheet
+    (Funktion, die die Tabelle liefert) das Blatt 'Validierung'. Zu lange
+    Blätter werden in Fortsetzungsblättern weitergeführt. plan wie bei convert_row.
+    Mit tracker wird nach jedem Chunk auf Abbruch geprüft (den Fortschritt
+    meldet der parallel laufende CSV-Export).
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    
+    def write(tmp):
+        workbook = Workbook(write_only=True)
+        try:
+            announce_sheets('Bereinigte Daten', len(kept))
+            sheet = SplitSheet(workbook, 'Bereinigte Daten', kept.columns)
+            for chunk in kept.iter_chunks():
+                if tracker is not None:
+                    tracker.check()
+                for row in chunk.values.tolist():
+                    cells = [None if cell == '' else cell for cell in convert_row(row, plan)]
+                    if native_dates:
+                        date = plan[DATE_COLUMN].parse(row[_DATE_IDX])
+                        if date is not None:
+                            cell = WriteOnlyCell(sheet.sheet, value=date)
+                            cell.number_format = DATE_EXCEL_FORMAT
+                            cells[_DATE_IDX] = cell
+                    sheet.append(cells)
+            if len(deleted):
+                announce_sheets('Gelöschte Zeilen', len(deleted))
+                sheet = SplitSheet(workbook, 'Gelöschte Zeilen', deleted.columns)
+                for chunk in deleted.iter_chunks():
+                    for row in chunk.values.tolist():
+                        sheet.append(row)
+            if validation_sheet is not None:
+                df_validation = validation_sheet()
+                append_sheet(SplitSheet(workbook, 'Validierung', df_validation.columns), df_validation)
+            if df_profile is not None:
+                sheet = SplitSheet(workbook, 'Profil', df_profile.columns)
+                for row in df_profile.values.tolist():
+                    sheet.append(row)
+        except BaseException:
+            # Blätter schließen, damit openpyxl seine Zwischendateien freigibt
+            for sheet in workbook.worksheets:
+                sheet.close()
+            raise
+        workbook.save(tmp)
+    return atomic_write(path, write)
+
+
+def export_spilled(kept, deleted, input_file, compression=None, native_dates=False, profile=None,
+                   progress=None, cancel=None, validation=None, plan=None):
+    """
+    Export im Speicherbudget-Modus: setzt CSV und Excel aus den ausgelagerten
+    Chunks zusammen. Beide Dateien werden gleichzeitig geschrieben.
+    Mit profile (Ergebnis von ReportProfile.summary) entstehen zusätzlich
+    das Blatt 'Profil' und [name]_profile.json.
+    progress und cancel wie bei export_results; bei Abbruch bleibt keine
+    Ausgabedatei zurück.
+    Mit validation (ReportValidator) werden die Prüfungen beim Schreiben der
+    CSV ausgewertet; wie bei export_results entstehen das Blatt 'Validierung'
+    und [name]_validation.json.
+    Konvertiert wird nach plan (FormatPlan des Reports, sonst aus den
+    ersten ausgelagerten Zeilen).
+    """
+    input_path = Path(input_file)
+    base_name = report_base_name(input_path)
+    output_dir = input_path.parent
+    csv_suffix = '.csv' + COMPRESSION_SUFFIXES.get(compression, '')
+    
+    csv_path = output_dir / f"{base_name}_cleaned{csv_suffix}"
+    excel_path = output_dir / f"{base_name}_cleaned.xlsx"
+    deleted_csv = output_dir / f"{base_name}_deleted{csv_suffix}"
+    
+    # Excel zählt Abweichungen vom Format separat (plan.copy())
+    if plan is None:
+        plan, _ = plan_rows(row for chunk in kept.iter_chunks() for row in chunk.values.tolist())
+    plan.describe()
+    
+    tracker = ProgressTracker(progress, cancel)
+    tracker.start('export', total_rows=len(kept))
+    with ThreadPoolExecutor(max_workers=2) as threads:
+        csv_job = threads.submit(write_spilled_csv, kept, csv_path, compression, True, plan, tracker,
+                                 validation)
+        
+        def validation_sheet():
+            # Geprüft wird beim Schreiben der CSV; das Blatt kommt erst danach
+            csv_job.result()
+            return validation_frame(validation.summary(verbose=False))
+        
+        excel_ok = install_openpyxl()
+        if excel_ok:
+            df_profile = profile_frame(profile) if profile is not None else None
+            excel_job = threads.submit(write_spilled_excel, kept, deleted, excel_path, native_dates,
+                                       df_profile, plan.copy(), tracker,
+                                       validation_sheet if validation is not None else None)
+        else:
+            deleted_job = threads.submit(write_spilled_csv, deleted, deleted_csv, compression, False)
+        
+        csv_job.result()
+        plan.report()
+        print(f"\n💾 CSV exportiert: {csv_path}")
+        
+        if excel_ok:
+            try:
+                excel_job.result()
+                print(f"💾 Excel exportiert: {excel_path}")
+            except ProcessingCancelled:
+                raise
+            except Exception as e:
+                print(f"⚠ Excel-Export fehlgeschlagen: {e}")
+                write_spilled_csv(deleted, deleted_csv, compression, convert=False)
+                print(f"💾 Gelöschte Zeilen als CSV: {deleted_csv}")
+        else:
+            deleted_job.result()
+            print(f"💾 Gelöschte Zeilen als CSV: {deleted_csv}")
+    tracker.finish(len(kept))
+    
+    if validation is not None:
+        validation_path = output_dir / f"{base_name}_validation.json"
+        write_json(validation.summary(), validation_path)
+        print(f"💾 Validierung: {validation_path}")
+    if profile is not None:
+        write_profile(profile, output_dir / f"{base_name}_profile.json")
+    
+    return csv_path
+
+
+# ============================================================================
+# NOTEBOOK-HILFEN (JUPYTER / COLAB)
+# ============================================================================
+
+class ReportCache:
+    """
+    LRU-Cache für bereinigte DataFrames im laufenden Kernel.
+    
+    Schlüssel ist (Pfad, Änderungszeit, Größe, Optionen): ändert sich die Datei, wird
+    neu eingelesen und die alte Version verdrängt. Übersteigt der Cache
+    max_bytes, werden die am längsten nicht genutzten Einträge entfernt.
+    """
+    
+    def __init__(self, max_bytes=NOTEBOOK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (df, df_deleted, nbytes)
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(file_path):
+        path = Path(file_path).resolve()
+        stat = path.stat()
+        return (str(path), stat.st_mtime_ns, stat.st_size)
+    
+    @property
+    def total_bytes(self):
+        return sum(entry[2] for entry in self.entries.values())
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+    
+    def put(self, key, df, df_deleted):
+        # Ältere Versionen derselben Datei sind veraltet
+        for old_key in [k for k in self.entries if k[0] == key[0] and k[1:3] != key[1:3]]:
+            del self.entries[old_key]
+        
+        nbytes = int(df.memory_usage(deep=True).sum() + df_deleted.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            print(f"⚠ Report ({nbytes / 1024 ** 2:.0f} MB) größer als Cache-Limit, wird nicht gecacht")
+            return
+        
+        self.entries[key] = (df, df_deleted, nbytes)
+        while self.total_bytes > self.max_bytes:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+    
+    def info(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+_report_cache = ReportCache()
+
+
+def load_report(file_path, with_deleted=False, cache=True, native_dates=False):
+    """
+    Lädt einen SAP-Report als bereinigten DataFrame (für Notebooks).
+    
+    Das Ergebnis wird im Kernel gecacht: erneutes Ausführen einer Zelle
+    liest die Datei nicht noch einmal, solange sie unverändert ist.
+    Achtung: Bei einem Cache-Treffer wird derselbe DataFrame zurückgegeben;
+    vor Änderungen daher df.copy() verwenden.
+    
+    Beispiel:
+        from sap_report_cleaner import load_report
+        df = load_report("sourceDateien/L91_Material.txt")
+        df, df_deleted = load_report("...", with_deleted=True)
+    """
+    key = ReportCache.make_key(file_path) + (native_dates,)
+    entry = _report_cache.get(key) if cache else None
+    
+    if entry is not None:
+        df, df_deleted, _ = entry
+        print(f"♻ Aus Cache: {Path(file_path).name} ({len(df)} Zeilen)")
+    else:
+        plan = FormatPlan()
+        df, df_deleted = process_sap_report(key[0], plan=plan)
+        df = convert_data_types(df, native_dates=native_dates, plan=plan)
+        if cache:
+            _report_cache.put(key, df, df_deleted)
+    
+    return (df, df_deleted) if with_deleted else df
+
+
+def clear_report_cache():
+    """Leert den Report-Cache des Kernels."""
+    _report_cache.clear()
+
+
+def set_report_cache_limit(max_bytes):
+    """Setzt das Speicherlimit des Report-Caches (Bytes oder z.B. '2G')."""
+    _report_cache.max_bytes = parse_size(max_bytes)
+    while _report_cache.entries and _report_cache.total_bytes > _report_cache.max_bytes:
+        _report_cache.entries.popitem(last=False)
+
+
+def report_cache_info():
+    """Gibt Einträge, Speicherbedarf und Treffer des Report-Caches zurück."""
+    return _report_cache.info()
+
+
+def load_ipython_extension(ipython):
+    """
+    Registriert die Magic %sap_report für Jupyter:
+    
+        %load_ext sap_report_cleaner
+        df = %sap_report sourceDateien/L91_Material.txt
+    """
+    def sap_report(line):
+        file_path = line.strip().strip('"').strip("'")
+        return load_report(file_path)
+    
+    ipython.register_magic_function(sap_report, magic_kind='line', magic_name='sap_report')
+
+
+# ============================================================================
+# ZUSAMMENFÜHREN (MERGE)
+# ============================================================================
+
+def is_cleaned_csv(file_path):
+    """
+    Prüft, ob eine Datei bereits eine bereinigte CSV ist
+    (Semikolon-getrennt, erste Spalte 'Material').
+    """
+    if detect_input_format(file_path) in WORKBOOK_FORMATS:
+        return False
+    with open_report(file_path, encoding='utf-8-sig') as f:
+        first_line = f.readline()
+    return first_line.split(';')[0].strip().strip('"') == 'Material'
+
+
+def iter_source_rows(file_path, stats=None, verbose=True):
+    """
+    Liefert die Datenzeilen (Spalten C bis Q als Strings, Reihenfolge wie
+    EXPECTED_HEADERS) aus einem Rohreport oder einer bereinigten CSV.
+    verbose wie bei locate_header.
+    """
+    if stats is None:
+        stats = new_stats()
+    
+    if not is_cleaned_csv(file_path):
+        for _, data_row in iter_cleaned_rows(file_path, stats, verbose=verbose):
+            yield data_row
+        return
+    
+    if verbose:
+        print(f"\n📂 Lese bereinigte CSV: {file_path}")
+    with open_report(file_path, encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter=';')
+        header = [col.strip() for col in next(reader, [])]
+        col_pos = [header.index(col) if col in header else None for col in EXPECTED_HEADERS]
+        for row in reader:
+            stats['total_rows'] += 1
+            if not row:
+                stats['empty_rows'] += 1
+                continue
+            stats['kept_rows'] += 1
+            yield [row[pos] if pos is not None and pos < len(row) else '' for pos in col_pos]
+
+
+def key_hash(values):
+    """64-Bit-Hash über die Schlüsselwerte einer Zeile."""
+    key = '\x1f'.join(str(v) for v in values).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+def merge_reports(file_paths, output_path, key_columns=None, batch_size=CSV_BATCH_SIZE):
+    """
+    Führt mehrere Reports (roh oder bereinigt) zu einer CSV zusammen und
+    entfernt doppelte Buchungen aus überlappenden Extraktionen.
+    
+    - Duplikat = gleicher Schlüssel (key_columns) in verschiedenen Quellen
+    - Bei Konflikten gewinnt die neueste Quelle (Änderungsdatum der Datei)
+    - Ein FormatPlan für alle Quellen (plan_report), damit gleiche Werte
+      in jeder Quelle gleich gelesen werden und denselben Schlüssel ergeben
+    - Streaming: Speicherbedarf ~8 Byte pro eindeutigem Schlüssel
+      (sortiertes uint64-Array mit den Schlüssel-Hashes)
+    
+    Gibt ein Statistik-Dictionary zurück.
+    """
+    key_columns = key_columns or MERGE_KEY_COLUMNS
+    unknown = [col for col in key_columns if col not in EXPECTED_HEADERS]
+    if unknown:
+        raise ValueError(f"Unbekannte Schlüsselspalten: {unknown}")
+    key_idx = [EXPECTED_HEADERS.index(col) for col in key_columns]
+    
+    # Neueste Quelle zuerst: spätere (ältere) Duplikate werden verworfen
+    sources = sorted(file_paths, key=lambda p: os.path.getmtime(p), reverse=True)
+    
+    plan = plan_report(*sources)
+    plan.describe()
+    
+    seen = np.empty(0, dtype=np.uint64)
+    merge_stats = {'sources': len(sources), 'rows_read': 0, 'duplicates': 0, 'rows_written': 0}
+    
+    def flush(writer, batch, hashes, source_hashes):
+        hashes = np.array(hashes, dtype=np.uint64)
+        pos = np.searchsorted(seen, hashes)
+        pos[pos >= len(seen)] = 0
+        duplicate = (seen[pos] == hashes) if len(seen) else np.zeros(len(hashes), dtype=bool)
+        writer.writerows(row for row, dup in zip(batch, duplicate) if not dup)
+        source_hashes.append(hashes[~duplicate])
+        merge_stats['duplicates'] += int(duplicate.sum())
+        merge_stats['rows_written'] += int((~duplicate).sum())
+    
+    def write(tmp):
+        nonlocal seen
+        with open_output_text(tmp) as f:
+            writer = csv.writer(f, delimiter=';', lineterminator=os.linesep)
+            writer.writerow(EXPECTED_HEADERS)
+            
+            for source in sources:
+                # Innerhalb einer Quelle wird nicht dedupliziert, nur gegen neuere Quellen
+                source_hashes = []
+                batch, hashes = [], []
+                for data_row in iter_source_rows(source):
+                    row = convert_row(data_row, plan)
+                    batch.append(row)
+                    hashes.append(key_hash([row[i] for i in key_idx]))
+                    merge_stats['rows_read'] += 1
+                    if len(batch) >= batch_size:
+                        flush(writer, batch, hashes, source_hashes)
+                        batch, hashes = [], []
+                if batch:
+                    flush(writer, batch, hashes, source_hashes)
+                if source_hashes:
+                    seen = np.union1d(seen, np.concatenate(source_hashes))
+    
+    # Erst nach der letzten Quelle umbenennen (siehe atomic_write)
+    atomic_write(output_path, write)
+    plan.report()
+    
+    print(f"\n📊 Zusammenführung:")
+    print(f"   Quellen:           {merge_stats['sources']}")
+    print(f"   Gelesene Zeilen:   {merge_stats['rows_read']}")
+    print(f"   Duplikate:         {merge_stats['duplicates']} (entfernt)")
+    print(f"   Geschriebene Zeilen: {merge_stats['rows_written']}")
+    print(f"\n💾 Zusammengeführt: {output_path}")
+    
+    return merge_stats
+
+
+# ============================================================================
+# VERKNÜPFEN (JOIN)
+# ============================================================================
+
+# Unterstützte Join-Arten
+JOIN_TYPES = ('inner', 'left')
+
+# In so vielen Zeilen am Dateianfang wird die Kopfzeile fremder Exporte gesucht
+JOIN_HEADER_LINES = 50
+
+# Mögliche Trennzeichen fremder Exporte (SAP-Liste, Excel-CSV, englische CSV)
+JOIN_DELIMITERS = ('\t', ';', ',')
+
+
+def join_key(values):
+    """
+    Normalisierter Join-Schlüssel: ASCII-Ziffernfolgen als int ('040910241'
+    und '40910241' sind gleich), sonst getrimmter Text (auch '²' u.ä., das
+    int() nicht lesen kann). Leere Schlüssel → None.
+    """
+    key = []
+    for value in values:
+        text = str(value).strip()
+        if text == '':
+            return None
+        key.append(int(text) if text.isascii() and text.isdigit() else text)
+    return tuple(key)
+
+
+def split_table_line(line, delimiter):
+    """Zerlegt eine Textzeile; SAP-Listen (Tab) kennen keine Anführungszeichen."""
+    if delimiter == '\t':
+        return line.split('\t')
+    return next(csv.reader([line], delimiter=delimiter), [])
+
+
+def open_table(file_path, key_columns):
+    """
+    Öffnet eine Datei für den Join und gibt (Spalten, Zeilen-Iterator) zurück.
+    
+    - Verbrauchsreports (roh oder bereinigt) werden wie bei 'merge' über
+      iter_source_rows gelesen und wie die bereinigte CSV konvertiert
+    - Andere Exporte (z.B. IW13/IW47 als CSV, SAP-Liste oder Excel): Kopfzeile
+      ist die erste Zeile, die alle Schlüsselspalten enthält; das Trennzeichen
+      wird dabei erkannt. Leere und wiederholte Kopfzeilen werden übersprungen.
+    """
+    if is_cleaned_csv(file_path):
+        return EXPECTED_HEADERS, convert_rows(iter_source_rows(file_path))
+    
+    workbook = detect_input_format(file_path) in WORKBOOK_FORMATS
+    lines = iter_workbook_rows(file_path) if workbook else iter_sap_lines(file_path)
+    header, delimiter = None, None
+    for line in islice(lines, JOIN_HEADER_LINES):
+        for delim in ((None,) if workbook else JOIN_DELIMITERS):
+            cells = line if delim is None else split_table_line(line, delim)
+            cells = [cell.strip().lstrip('\ufeff') for cell in cells]
+            if all(col in cells for col in key_columns):
+                header, delimiter = cells, delim
+                break
+        if header is not None:
+            break
+    
+    if header is None:
+        lines.close()
+        raise ValueError(f"Keine Kopfzeile mit {', '.join(key_columns)} gefunden: {file_path}")
+    
+    # Rohreport Materialverbrauch: Bereinigung wie beim normalen Lauf
+    col_idx = find_header_column(header)
+    if col_idx is not None and header[col_idx:col_idx + 4] == EXPECTED_HEADERS[:4]:
+        lines.close()
+        return EXPECTED_HEADERS, convert_rows(iter_source_rows(file_path))
+    
+    print(f"\n📂 Lese Export: {file_path}")
+    positions = [i for i, name in enumerate(header) if name]
+    columns = [header[i] for i in positions]
+    
+    def rows():
+        for line in lines:
+            cells = line if delimiter is None else split_table_line(line, delimiter)
+            row = [cells[i].strip() if i < len(cells) else '' for i in positions]
+            if any(row) and row != columns:
+                yield row
+    
+    return columns, rows()
+
+
+# Formate aus EXPORT_SINKS, die join und diff schreiben können (Zeilen ohne Report-Bezug)
+ROW_OUTPUTS = ('csv', 'xlsx', 'parquet', 'sqlite')
+
+
+def output_format(path):
+    """
+    Bestimmt Format (Name in EXPORT_SINKS) und Komprimierung einer
+    Ausgabedatei anhand der Endung: .csv, .csv.gz, .csv.zst, .xlsx,
+    .parquet oder .sqlite.
+    """
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    compression = None
+    for kind, suffix in COMPRESSION_SUFFIXES.items():
+        if suffixes and suffixes[-1] == suffix:
+            compression = kind
+            suffixes = suffixes[:-1]
+    extensions = {Path(EXPORT_SINKS[name].suffix).suffix: name for name in ROW_OUTPUTS}
+    kind = extensions.get(suffixes[-1]) if suffixes else None
+    if kind is not None and (compression is None or kind == 'csv'):
+        return kind, compression
+    raise ValueError(f"Unbekanntes Ausgabeformat (.csv, .csv.gz, .csv.zst, .xlsx, .parquet, .sqlite): {path}")
+
+
+def rows_frame(columns, rows, kinds):
+    """
+    Zeilen (Listen) als DataFrame für einen Export-Sink. kinds hält je
+    Spaltenposition 'int' oder 'text' fest und wird im ersten Block
+    bestimmt: Spalten mit nur Ganzzahlen und Leerwerten (wie aus
+    convert_row) werden Int64, alle übrigen Text. So haben alle Blöcke
+    dieselben Spaltentypen (Parquet-Schema).
+    """
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    if not kinds:
+        for pos, column in enumerate(values):
+            ints = [value for value in column if value != '']
+            kinds[pos] = 'int' if ints and all(isinstance(value, int) for value in ints) else 'text'
+    data = {}
+    for pos, column in enumerate(values):
+        if kinds[pos] == 'int':
+            data[pos] = pd.array([None if value == '' else value for value in column], dtype='Int64')
+        else:
+            data[pos] = pd.Series([value if isinstance(value, str) else str(value) for value in column],
+                                  dtype=object)
+    df = pd.DataFrame(data)
+    df.columns = list(columns)
+    return df
+
+
+def write_rows(path, columns, rows, sheet_name='Daten'):
+    """
+    Schreibt Zeilen aus einem Iterator je nach Endung als CSV oder über den
+    passenden Sink aus EXPORT_SINKS (Excel, Parquet, SQLite), blockweise
+    ohne sie vorher zu sammeln. Gibt die Zahl der Datenzeilen zurück.
+    In Excel heißt das Blatt sheet_name (nach EXCEL_MAX_ROWS Zeilen geht es
+    in 'sheet_name (2)', ... weiter), in SQLite die Tabelle entsprechend
+    in Kleinbuchstaben.
+    """
+    kind, compression = output_format(path)
+    if kind == 'xlsx' and not install_openpyxl():
+        raise ImportError("Für .xlsx-Ausgaben wird openpyxl benötigt: pip3 install openpyxl")
+    
+    if kind == 'csv':
+        # Zeilen direkt mit csv.writer: deutlich schneller als DataFrame-Blöcke über CsvSink
+        written = [0]
+        
+        def write(tmp):
+            with open_output_text(tmp, compression) as f:
+                writer = csv.writer(f, delimiter=';', lineterminator=os.linesep)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow(row)
+                    written[0] += 1
+        atomic_write(path, write)
+        return written[0]
+    
+    context = {'compression': compression, 'sheet': sheet_name, 'table': sheet_name.lower()}
+    sink = EXPORT_SINKS[kind](path, context)
+    rows = iter(rows)
+    kinds = {}
+    written = 0
+    try:
+        batch = rows_frame(columns, list(islice(rows, EXPORT_BATCH_SIZE)), kinds)
+        sink.open(batch)
+        while True:
+            sink.write(batch)
+            written += len(batch)
+            if len(batch) < EXPORT_BATCH_SIZE:
+                break
+            batch = rows_frame(columns, list(islice(rows, EXPORT_BATCH_SIZE)), kinds)
+        sink.close()
+    except BaseException:
+        sink.abort()
+        raise
+    if kind == 'xlsx' and sink.sheet.sheets > 1:
+        print(f"📑 {written} Zeilen auf {sink.sheet.sheets} Excel-Blätter '{sheet_name}' verteilt")
+    return written
+
+
+def join_reports(left_path, right_path, output_path, on=None, how='inner', suffix='_2'):
+    """
+    Verknüpft zwei Reports über Schlüsselspalten (Hash-Join), z.B. den
+    Materialverbrauch mit IW13/IW47-Exporten über 'Order'.
+    
+    - Build-Seite: die kleinere Datei wird als Hashtabelle Schlüssel → Zeilen
+      in den Speicher geladen; nur sie bestimmt den Speicherbedarf
+    - Probe-Seite: die größere Datei wird zeilenweise durchgestreamt und
+      direkt in die Ausgabe geschrieben
+    - how='left' behält alle Zeilen der linken (ersten) Datei. Liegt sie auf
+      der Build-Seite, werden ihre Zeilen ohne Treffer am Ende angehängt.
+    
+    Ausgabe: alle Spalten links, danach die rechten ohne Schlüsselspalten
+    (gleichnamige Spalten erhalten suffix). Gibt ein Statistik-Dictionary zurück.
+    """
+    on = on or ['Order']
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Unbekannte Join-Art: {how} (erlaubt: {', '.join(JOIN_TYPES)})")
+    output_format(output_path)  # Endung prüfen, bevor die Hashtabelle aufgebaut wird
+    
+    # Kleinere Datei (Dateigröße) wird zur Hashtabelle
+    build_left = os.path.getsize(left_path) <= os.path.getsize(right_path)
+    build_path, probe_path = (left_path, right_path) if build_left else (right_path, left_path)
+    
+    build_columns, build_rows = open_table(build_path, on)
+    build_key_idx = [build_columns.index(col) for col in on]
+    table = {}
+    build_count = 0
+    for row in build_rows:
+        table.setdefault(join_key([row[i] for i in build_key_idx]), []).append(row)
+        build_count += 1
+    print(f"   Hashtabelle: {build_count} Zeilen, {len(table)} Schlüssel ({Path(build_path).name})")
+    
+    probe_columns, probe_rows = open_table(probe_path, on)
+    probe_key_idx = [probe_columns.index(col) for col in on]
+    
+    left_columns, right_columns = ((build_columns, probe_columns) if build_left
+                                   else (probe_columns, build_columns))
+    right_keep = [i for i, col in enumerate(right_columns) if col not in on]
+    columns = list(left_columns) + [col + suffix if col in left_columns else col
+                                    for col in (right_columns[i] for i in right_keep)]
+    empty_right = [''] * len(right_keep)
+    
+    join_stats = {'build_rows': build_count, 'build_keys': len(table),
+                  'probe_rows': 0, 'matched_rows': 0, 'rows_written': 0}
+    matched_keys = set()
+    
+    def joined_rows():
+        for row in probe_rows:
+            join_stats['probe_rows'] += 1
+            key = join_key([row[i] for i in probe_key_idx])
+            partners = table.get(key) if key is not None else None
+            if partners:
+                join_stats['matched_rows'] += 1
+                if build_left:
+                    matched_keys.add(key)
+                    for partner in partners:
+                        yield list(partner) + [row[i] for i in right_keep]
+                else:
+                    for partner in partners:
+                        yield list(row) + [partner[i] for i in right_keep]
+            elif how == 'left' and not build_left:
+                yield list(row) + empty_right
+        
+        # Linke Zeilen ohne Partner liegen bei build_left in der Hashtabelle
+        if how == 'left' and build_left:
+            for key, partners in table.items():
+                if key is None or key not in matched_keys:
+                    for partner in partners:
+                        yield list(partner) + empty_right
+    
+    print(f"\n🔗 {how.capitalize()}-Join über {', '.join(on)}")
+    join_stats['rows_written'] = write_rows(output_path, columns, joined_rows(),
+                                            sheet_name='Verknüpfung')
+    
+    print(f"\n📊 Verknüpfung:")
+    print(f"   Hashtabelle:         {join_stats['build_rows']} Zeilen, {join_stats['build_keys']} Schlüssel")
+    print(f"   Gestreamte Zeilen:   {join_stats['probe_rows']}")
+    print(f"   Davon mit Treffer:   {join_stats['matched_rows']}")
+    print(f"   Geschriebene Zeilen: {join_stats['rows_written']}")
+    print(f"\n💾 Verknüpft: {output_path}")
+    
+    return join_stats
+
+
+# ============================================================================
+# VERGLEICHEN (DIFF)
+# ============================================================================
+
+# Schlüssel für den Vergleich: wie MERGE_KEY_COLUMNS, aber ohne Menge –
+# eine korrigierte Menge ist eine geänderte Buchung, keine neue
+DIFF_KEY_COLUMNS = ['Order', 'Material', 'Pstng Date', 'Message']
+
+# Spalten der Vergleichsdatei vor den Report-Spalten
+DIFF_COLUMNS = ['Änderung', 'Geänderte Spalten']
+
+
+def in_sorted(values, sorted_values):
+    """Vektorisierte Mitgliedschaftsprüfung gegen ein sortiertes Array (searchsorted)."""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return sorted_values[pos] == values
+
+
+def hash_columns(columns):
+    """64-Bit-Hash je Zeile über mehrere Spalten (vektorisiert über pd.util.hash_array)."""
+    result = np.zeros(len(columns[0]), dtype=np.uint64)
+    for column in columns:
+        hashes = pd.util.hash_array(np.array(list(map(str, column)), dtype=object))
+        result = (result ^ hashes) * np.uint64(0x100000001B3)
+    return result
+
+
+def iter_source_columns(file_path, batch_size=CSV_BATCH_SIZE):
+    """
+    Wie iter_source_rows, aber blockweise als Spalten (Listen von Strings,
+    Reihenfolge wie EXPECTED_HEADERS). Bereinigte CSV-Dateien werden dabei
+    mit pd.read_csv gelesen.
+    """
+    if is_cleaned_csv(file_path):
+        print(f"\n📂 Lese bereinigte CSV: {file_path}")
+        with open_report(file_path, encoding='utf-8-sig') as f:
+            for chunk in pd.read_csv(f, sep=';', dtype=str, keep_default_na=False, chunksize=batch_size):
+                chunk = chunk.rename(columns=str.strip).reindex(columns=EXPECTED_HEADERS, fill_value='')
+                yield [chunk[col].tolist() for col in EXPECTED_HEADERS]
+        return
+    
+    batch = []
+    for data_row in iter_source_rows(file_path):
+        batch.append(data_row)
+        if len(batch) >= batch_size:
+            yield [list(column) for column in zip(*batch)]
+            batch = []
+    if batch:
+        yield [list(column) for column in zip(*batch)]
+
+
+def iter_hashed_rows(file_path, key_idx, plan):
+    """
+    Liefert je Block (Spalten, Schlüssel-Hashes, Zeilen-Hashes). Die Werte
+    sind wie in der bereinigten CSV nach plan konvertiert (ein FormatPlan
+    für beide Versionen, siehe diff_reports), roh und bereinigt sind also
+    vergleichbar.
+    """
+    plan = plan.copy()
+    for columns in iter_source_columns(file_path):
+        columns = convert_columns(columns, plan)
+        yield columns, hash_columns([columns[i] for i in key_idx]), hash_columns(columns)
+    plan.report()
+
+
+def read_rows_at(file_path, positions, plan):
+    """
+    Liest nur die Zeilen an den (sortierten) Positionen, konvertiert nach
+    plan (siehe iter_hashed_rows), und liefert sie als (Position, Zeile)
+    in Dateireihenfolge.
+    """
+    plan = plan.copy()
+    start = 0
+    positions = np.asarray(positions, dtype=np.int64)
+    if not len(positions):
+        return
+    blocks = iter_source_columns(file_path)
+    for columns in blocks:
+        end = start + len(columns[0])
+        lo, hi = np.searchsorted(positions, [start, end])
+        for pos in positions[lo:hi].tolist():
+            yield pos, convert_row([column[pos - start] for column in columns], plan)
+        start = end
+        if hi == len(positions):
+            # Rest der Datei nicht mehr lesen
+            blocks.close()
+            return
+
+
+def diff_details(old_row, new_row, changed_columns):
+    """Text für 'Geänderte Spalten' ('Spalte: alt → neu'); zählt die Spalten in changed_columns."""
+    changes = row_changes(old_row, new_row)
+    for col, _, _ in changes:
+        changed_columns[col] = changed_columns.get(col, 0) + 1
+    return '; '.join(f"{col}: {old if old != '' else '(leer)'} → {new if new != '' else '(leer)'}"
+                     for col, old, new in changes)
+
+
+def row_changes(old_row, new_row):
+    """Geänderte Spalten zweier Zeilen als Liste (Spalte, alt, neu)."""
+    return [(col, old, new) for col, old, new in zip(EXPECTED_HEADERS, old_row, new_row)
+            if str(old) != str(new)]
+
+
+def diff_reports(old_path, new_path, output_path, key_columns=None):
+    """
+    Vergleicht zwei Versionen eines Reports (roh oder bereinigt), z.B. nach
+    einer erneuten SAP-Extraktion desselben Zeitraums.
+    
+    - Je Zeile werden blockweise ein Hash über die Schlüsselspalten
+      (key_columns) und einer über den gesamten Inhalt gebildet; gehalten
+      werden nur diese uint64-Arrays, nicht die Zeilen selbst
+    - Unveränderte Zeilen (gleicher Inhalts-Hash) fallen vektorisiert heraus,
+      von den übrigen werden nur Position und Schlüssel-Hash gemerkt und
+      über den Schlüssel gepaart: gleicher Schlüssel → geändert, nur neu →
+      neu, nur alt → entfernt
+    - Danach werden nur die abweichenden Zeilen erneut gelesen und
+      konvertiert; im Speicher liegen dabei nur die alten Zeilen der
+      geänderten Buchungen, neue und entfernte Zeilen werden durchgestreamt
+    
+    Ausgabe (CSV oder Excel je nach Endung): Änderung, geänderte Spalten
+    ('Spalte: alt → neu') und die Zeile (neue Werte, bei 'entfernt' die alten).
+    Geänderte und neue Zeilen stehen in der Reihenfolge der neuen Datei,
+    danach die entfernten. Gibt ein Statistik-Dictionary zurück.
+    """
+    key_columns = key_columns or DIFF_KEY_COLUMNS
+    unknown = [col for col in key_columns if col not in EXPECTED_HEADERS]
+    if unknown:
+        raise ValueError(f"Unbekannte Schlüsselspalten: {unknown}")
+    key_idx = [EXPECTED_HEADERS.index(col) for col in key_columns]
+    output_format(output_path)  # Endung prüfen, bevor gelesen wird
+    
+    # Ein Format je Spalte für beide Versionen: gleiche Rohwerte ergeben
+    # auf beiden Seiten denselben Wert und damit denselben Hash
+    plan = plan_report(old_path, new_path)
+    plan.describe()
+    
+    # 1. Alte Version: nur Hashes
+    old_keys, old_hashes = [], []
+    for _, keys, hashes in iter_hashed_rows(old_path, key_idx, plan):
+        old_keys.append(keys)
+        old_hashes.append(hashes)
+    old_keys = np.concatenate(old_keys) if old_keys else np.empty(0, dtype=np.uint64)
+    old_hashes = np.concatenate(old_hashes) if old_hashes else np.empty(0, dtype=np.uint64)
+    old_unique, old_counts = np.unique(old_hashes, return_counts=True)
+    
+    # 2. Neue Version: nur Position und Schlüssel der Zeilen ohne identische alte Zeile
+    new_hashes, new_pos, new_keys = [], [], []
+    start = 0
+    for _, keys, hashes in iter_hashed_rows(new_path, key_idx, plan):
+        new_hashes.append(hashes)
+        differ = np.flatnonzero(~in_sorted(hashes, old_unique))
+        new_pos.append(differ + start)
+        new_keys.append(keys[differ])
+        start += len(hashes)
+    new_hashes = np.concatenate(new_hashes) if new_hashes else np.empty(0, dtype=np.uint64)
+    new_pos = np.concatenate(new_pos).tolist() if new_pos else []
+    new_keys = np.concatenate(new_keys).tolist() if new_keys else []
+    new_unique, new_counts = np.unique(new_hashes, return_counts=True)
+    
+    # Identische Zeilen können mehrfach vorkommen: Anzahl je Hash vergleichen
+    surplus = old_counts.copy()
+    in_new = in_sorted(old_unique, new_unique)
+    surplus[in_new] -= new_counts[np.searchsorted(new_unique, old_unique[in_new])]
+    removed_hashes = {int(h): int(n) for h, n in zip(old_unique[surplus > 0], surplus[surplus > 0])}
+    repeated_hashes = {int(h): int(-n) for h, n in zip(old_unique[surplus < 0], surplus[surplus < 0])}
+    
+    # Positionen der alten Zeilen ohne identische neue Zeile
+    old_by_key = {}
+    repeated = []
+    wanted = np.sort(np.array(list(removed_hashes) + list(repeated_hashes), dtype=np.uint64))
+    for pos in np.flatnonzero(in_sorted(old_hashes, wanted)).tolist():
+        h = int(old_hashes[pos])
+        if removed_hashes.get(h, 0) > 0:
+            old_by_key.setdefault(int(old_keys[pos]), []).append(pos)
+            removed_hashes[h] -= 1
+        elif h in repeated_hashes:
+            # Identische Zeile kommt in der neuen Version öfter vor
+            repeated.extend([pos] * repeated_hashes.pop(h))
+    
+    # 3. Paaren über den Schlüssel, nur mit Positionen:
+    # changed ordnet neue Positionen (bzw. Kopien alter Zeilen) der alten Position zu
+    changed, added = {}, []
+    for pos, key in zip(new_pos, new_keys):
+        partners = old_by_key.get(key)
+        if partners:
+            changed[pos] = partners.pop(0)
+        else:
+            added.append(pos)
+    repeated_pairs = []
+    for pos in repeated:
+        partners = old_by_key.get(int(old_keys[pos]))
+        repeated_pairs.append((pos, partners.pop(0) if partners else None))
+    removed = sorted(pos for positions in old_by_key.values() for pos in positions)
+    
+    repeated_changed = sum(1 for _, partner in repeated_pairs if partner is not None)
+    diff_stats = {'old_rows': len(old_hashes), 'new_rows': len(new_hashes), 'unchanged': 0,
+                  'changed': len(changed) + repeated_changed,
+                  'added': len(added) + len(repeated_pairs) - repeated_changed,
+                  'removed': len(removed), 'changed_columns': {}}
+    diff_stats['unchanged'] = len(new_hashes) - diff_stats['changed'] - diff_stats['added']
+    
+    # 4. Alte Zeilen der geänderten Buchungen (und mehrfach vorkommende) einmal lesen
+    needed = set(changed.values()) | set(repeated)
+    needed.update(partner for _, partner in repeated_pairs if partner is not None)
+    old_rows = dict(read_rows_at(old_path, sorted(needed), plan))
+    
+    def diff_rows():
+        changed_columns = diff_stats['changed_columns']
+        for pos, row in read_rows_at(new_path, sorted(list(changed) + added), plan):
+            if pos in changed:
+                old_row = old_rows.pop(changed[pos])
+                yield ['geändert', diff_details(old_row, row, changed_columns)] + list(row)
+            else:
+                yield ['neu', ''] + list(row)
+        for pos, partner in repeated_pairs:
+            row = old_rows[pos]
+            if partner is None:
+                yield ['neu', ''] + list(row)
+            else:
+                yield ['geändert', diff_details(old_rows.pop(partner), row, changed_columns)] + list(row)
+        for _, row in read_rows_at(old_path, removed, plan):
+            yield ['entfernt', ''] + list(row)
+    
+    write_rows(output_path, DIFF_COLUMNS + EXPECTED_HEADERS, diff_rows(), sheet_name='Vergleich')
+    
+    print(f"\n📊 Vergleich ({', '.join(key_columns)}):")
+    print(f"   Zeilen alt / neu:  {diff_stats['old_rows']} / {diff_stats['new_rows']}")
+    print(f"   Unverändert:       {diff_stats['unchanged']}")
+    print(f"   Geändert:          {diff_stats['changed']}")
+    print(f"   Neu:               {diff_stats['added']}")
+    print(f"   Entfernt:          {diff_stats['removed']}")
+    for col, count in sorted(diff_stats['changed_columns'].items(), key=lambda item: -item[1]):
+        print(f"      {col}: {count}")
+    print(f"\n💾 Vergleich: {output_path}")
+    
+    return diff_stats
+
+
+def select_file():
+    """
+    Interaktive Dateiauswahl (Dialog oder manuelle Eingabe).
+    """
+    # Versuche tkinter Dialog
+    try:
+        # Tk Deprecation-Warnung unterdrücken (macOS)
         os.environ['TK_SILENCE_DEPRECATION'] = '1'
         
         # Stderr temporär unterdrücken während tkinter-Import
@@ -424,9 +4626,10 @@ def select_file():
         file_path = filedialog.askopenfilename(
             title="SAP-Report auswählen",
             filetypes=[
-                ("Text/Excel Dateien", "*.txt *.xls"),
+                ("Text/Excel Dateien", "*.txt *.xls *.xlsx *.gz *.zip *.zst"),
                 ("Textdateien", "*.txt"),
                 ("Excel-Dateien", "*.xls *.xlsx"),
+                ("Archive", "*.gz *.zip *.zst"),
                 ("Alle Dateien", "*.*")
             ]
         )
@@ -456,10 +4659,63 @@ def select_file():
     return file_path
 
 
-def run(file_path=None):
+def run(file_path=None, csv_only=False, compression=None, max_memory=None, spill_dir=None,
+        with_index=False, native_dates=False, progress=None, cancel=None, rules=None,
+        validate=False, partition=None, partition_format='csv', partition_work_ctr=False,
+        profile=False, resume=False, outputs=None):
     """
     Hauptfunktion - kann auch direkt mit Dateipfad aufgerufen werden.
     
+    Mit csv_only=True wird die Datei im Streaming-Modus direkt in
+    [name]_cleaned.csv (und [name]_deleted.csv) geschrieben, ohne DataFrame.
+    Dann wird der Pfad der CSV-Datei statt des DataFrames zurückgegeben.
+    
+    Komprimierte Eingaben (.gz, .zip, .zst) werden direkt gelesen.
+    Mit compression='gzip' oder 'zstd' werden die CSV-Ausgaben komprimiert.
+    
+    Mit max_memory (Bytes oder z.B. '2G') werden Zwischendaten bei Erreichen
+    des Budgets nach spill_dir (Standard: System-Temp) ausgelagert und die
+    Ausgaben aus den Chunks zusammengesetzt. Rückgabe ist dann der CSV-Pfad.
+    
+    Mit with_index=True wird im selben Durchlauf ein Sidecar-Index
+    ([datei].sapidx.npz) für den Befehl 'lookup' geschrieben.
+    
+    Mit native_dates=True bleibt Pstng Date im DataFrame ein datetime64 und
+    wird in Excel als echte Datumszelle (DD.MM.YYYY) geschrieben.
+    
+    progress (Callback, siehe ProgressTracker) und cancel (CancelToken)
+    werden an Einlesen, Konvertierung und Export weitergereicht (auch bei
+    csv_only, max_memory und resume; mit resume wird bei Abbruch ein
+    Checkpoint gespeichert).
+    
+    rules ist eine Regeldatei (JSON/YAML) oder Liste zusätzlicher
+    Löschregeln (siehe load_rules).
+    
+    Mit validate=True wird nach der Konvertierung die Datenqualität geprüft
+    (validate_report, Blatt 'Validierung' und [name]_validation.json), eine
+    Prüfdatei oder Liste ersetzt die Standardprüfungen. Mit csv_only,
+    max_memory und resume wird blockweise beim Schreiben geprüft
+    (ReportValidator); csv_only schreibt kein Excel, also nur die JSON-Datei.
+    
+    Mit partition (Zielordner) werden die bereinigten Zeilen statt in eine
+    CSV/Excel-Datei nach year=YYYY/month=MM/ (mit partition_work_ctr=True
+    zusätzlich work_ctr=...) als CSV oder Parquet geschrieben; nur die
+    betroffenen Partitionen werden aktualisiert (siehe export_partitioned).
+    
+    Mit profile=True wird im selben Durchlauf ein Spaltenprofil erstellt
+    (Leerwerte, Min/Max, ungefähre Anzahl verschiedener Werte, häufigste
+    Werte) und als [name]_profile.json sowie Blatt 'Profil' ausgegeben.
+    
+    Mit resume=True läuft die Verarbeitung mit Speicherbudget (Standard
+    CHECKPOINT_MEMORY) und speichert regelmäßig einen Checkpoint in
+    [name]_checkpoint (neben der Datei bzw. in spill_dir). Ein erneuter
+    Aufruf mit resume=True setzt beim letzten Checkpoint fort; die Ausgaben
+    sind dieselben wie bei einem Lauf ohne Unterbrechung.
+    
+    outputs wählt die Ausgabeformate (Standard csv und xlsx, außerdem
+    parquet, sqlite und summary, siehe EXPORT_SINKS); die bereinigten Daten
+    werden dafür nur einmal durchlaufen.
+    
     Beispiel:
         from sap_report_cleaner import run
         df = run("sourceDateien/L91_Material.txt")
@@ -480,22 +4736,166 @@ def run(file_path=None):
             return None
         file_path = str(Path(file_path).resolve())
     
-    # Verarbeiten
-    df, df_deleted = process_sap_report(file_path)
+    if rules is not None:
+        try:
+            rules = load_rules(rules)
+        except (OSError, ValueError) as e:
+            print(f"❌ Filterregeln konnten nicht geladen werden: {e}")
+            return None
+        print(f"\n🧾 Filterregeln: {len(rules)} ({', '.join(rule.reason for rule in rules)})")
+    
+    if validate is not True and validate is not False:
+        try:
+            validate = load_checks(validate)
+        except (OSError, ValueError) as e:
+            print(f"❌ Prüfungen konnten nicht geladen werden: {e}")
+            return None
+    
+    if partition is not None and (csv_only or max_memory):
+        print("❌ Partitionierter Export ist nicht mit --csv-only oder --max-memory kombinierbar")
+        return None
+    
+    if outputs is not None:
+        try:
+            outputs = check_outputs(outputs)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return None
+        if csv_only or max_memory or resume or partition is not None:
+            print("❌ --outputs ist nicht mit --csv-only, --max-memory, --resume oder --partition kombinierbar")
+            return None
+    
+    if resume:
+        if csv_only or partition is not None:
+            print("❌ --resume ist nicht mit --csv-only oder --partition kombinierbar")
+            return None
+        if detect_input_format(file_path) is not None:
+            print("❌ Fortsetzen ist nur für unkomprimierte Textdateien möglich")
+            return None
+        if with_index:
+            print("⚠ Index ist mit --resume nicht möglich – wird übersprungen")
+            with_index = False
+        if profile:
+            print("⚠ Spaltenprofil ist mit --resume nicht möglich – wird übersprungen")
+            profile = False
+        max_memory = max_memory or CHECKPOINT_MEMORY
+    
+    # Format je Spalte einmal für den ganzen Report; alle Schritte lesen danach.
+    # Bestimmt wird er aus den ersten Zeilen des Durchlaufs (offener Plan), beim
+    # Fortsetzen vorab, da der fortgesetzte Durchlauf mitten in der Datei beginnt
+    plan = plan_report(file_path) if resume else FormatPlan()
+    
+    index = None
+    if with_index:
+        if detect_input_format(file_path) is not None:
+            print("⚠ Index nur für unkomprimierte Textdateien möglich – wird übersprungen")
+        else:
+            index = ReportIndex(file_path, plan)
+    
+    profile = ReportProfile(plan=plan) if profile else None
+    # Streaming und Speicherbudget prüfen blockweise beim Schreiben
+    validator = None
+    if validate is not False and (csv_only or max_memory):
+        validator = ReportValidator(None if validate is True else validate)
+    
+    if csv_only:
+        # Streaming: lesen → filtern → konvertieren → schreiben
+        input_path = Path(file_path)
+        base_name = report_base_name(input_path)
+        csv_suffix = '.csv' + COMPRESSION_SUFFIXES.get(compression, '')
+        csv_path = input_path.parent / f"{base_name}_cleaned{csv_suffix}"
+        deleted_csv = input_path.parent / f"{base_name}_deleted{csv_suffix}"
+        stream_clean_csv(file_path, csv_path, deleted_csv, compression=compression, index=index,
+                         progress=progress, rules=rules, profile=profile, cancel=cancel,
+                         validation=validator, plan=plan)
+        if index is not None:
+            index.save()
+        if validator is not None:
+            validation_path = input_path.parent / f"{base_name}_validation.json"
+            write_json(validator.summary(), validation_path)
+            print(f"💾 Validierung: {validation_path}")
+        if profile is not None:
+            summary = profile.summary()
+            print_profile(summary)
+            write_profile(summary, input_path.parent / f"{base_name}_profile.json")
+        
+        print("\n" + "=" * 60)
+        print("  ✅ Fertig!")
+        print("=" * 60)
+        return csv_path
+    
+    if max_memory:
+        # Speicherbudget: Zwischendaten auslagern, Export aus den Chunks
+        max_memory = parse_size(max_memory)
+        print(f"\n💽 Speicherbudget: {max_memory / 1024 ** 2:.0f} MB")
+        with ExitStack() as stack:
+            checkpoint = None
+            if resume:
+                tmp_dir = checkpoint_dir(file_path, spill_dir)
+                tmp_dir.mkdir(parents=True, exist_ok=True)
+                checkpoint = Checkpoint(file_path, tmp_dir, rules)
+                print(f"💾 Checkpoints: {tmp_dir}")
+            else:
+                tmp_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='sap_cleaner_', dir=spill_dir))
+            kept, deleted, stats = process_sap_report_spilled(file_path, max_memory, tmp_dir, index, rules,
+                                                              profile, checkpoint, progress, cancel, plan)
+            if index is not None:
+                index.save()
+            summary = None
+            if profile is not None:
+                summary = profile.summary()
+                print_profile(summary)
+            csv_path = export_spilled(kept, deleted, file_path, compression=compression,
+                                      native_dates=native_dates, profile=summary,
+                                      progress=progress, cancel=cancel, validation=validator, plan=plan)
+            if checkpoint is not None:
+                checkpoint.clear()
+        
+        print("\n" + "=" * 60)
+        print("  ✅ Fertig!")
+        print("=" * 60)
+        return csv_path
     
-    if df is None:
-        print("❌ Verarbeitung fehlgeschlagen")
+    # Verarbeiten (Lesefehler, z.B. Excel-Eingabe ohne openpyxl/xlrd oder Datei nicht lesbar)
+    try:
+        df, df_deleted = process_sap_report(file_path, index, progress=progress, cancel=cancel, rules=rules,
+                                            profile=profile, plan=plan)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"❌ Verarbeitung fehlgeschlagen: {e}")
         return None
+    if index is not None:
+        index.save()
+    
+    # Datentypen konvertieren (Originalwerte für die Validierung merken)
+    raw = {col: df[col] for col in NUMERIC_COLUMNS + [DATE_COLUMN] if col in df.columns}
+    df = convert_data_types(df, native_dates=native_dates, progress=progress, cancel=cancel, plan=plan)
     
-    # Datentypen konvertieren
-    df = convert_data_types(df)
+    # Datenqualität prüfen
+    validation = None
+    if validate is not False:
+        validation = validate_report(df, raw, None if validate is True else validate)
+    del raw
+    
+    summary = None
+    if profile is not None:
+        summary = profile.summary()
+        print_profile(summary)
     
     # Vorschau
     print("\n📋 Vorschau (erste 5 Zeilen):")
     print(df.head().to_string())
     
     # Exportieren
-    export_results(df, df_deleted, file_path)
+    if partition is not None:
+        try:
+            export_partitioned(df, partition, fmt=partition_format, by_work_ctr=partition_work_ctr,
+                               compression=compression)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"❌ Partitionierter Export fehlgeschlagen: {e}")
+            return None
+    else:
+        export_results(df, df_deleted, file_path, compression=compression, progress=progress,
+                       cancel=cancel, validation=validation, profile=summary, outputs=outputs)
     
     print("\n" + "=" * 60)
     print("  ✅ Fertig!")
@@ -504,11 +4904,198 @@ def run(file_path=None):
     return df
 
 
+def parse_args(argv=None):
+    """Liest die Kommandozeilenargumente."""
+    parser = argparse.ArgumentParser(
+        description="Bereinigt SAP-Reports (Tab-getrennte TXT/XLS-Dateien)."
+    )
+    parser.add_argument('file', nargs='?', default=None,
+                        help="Pfad zur SAP-Datei (ohne Angabe: interaktive Dateiauswahl)")
+    parser.add_argument('--csv-only', action='store_true',
+                        help="Nur CSV schreiben (Streaming ohne DataFrame, konstanter Speicherbedarf)")
+    parser.add_argument('--compress', choices=sorted(COMPRESSION_SUFFIXES), default=None,
+                        help="CSV-Ausgaben komprimieren (gzip → .csv.gz, zstd → .csv.zst)")
+    parser.add_argument('--max-memory', type=parse_size, default=None,
+                        help="Speicherbudget, z.B. 2G oder 1500M: Zwischendaten werden bei Bedarf "
+                             "auf die Platte ausgelagert")
+    parser.add_argument('--spill-dir', default=None,
+                        help="Ordner für ausgelagerte Zwischendaten (Standard: System-Temp)")
+    parser.add_argument('--index', action='store_true',
+                        help="Sidecar-Index ([datei].sapidx.npz) für den Befehl 'lookup' schreiben")
+    parser.add_argument('--native-dates', action='store_true',
+                        help="Pstng Date als echtes Datum behandeln (Excel-Datumszellen statt Text)")
+    parser.add_argument('--rules', default=None,
+                        help="Zusätzliche Löschregeln aus einer JSON- oder YAML-Datei (siehe README)")
+    parser.add_argument('--validate', action='store_true',
+                        help="Datenqualität prüfen ([name]_validation.json und Blatt 'Validierung')")
+    parser.add_argument('--checks', default=None,
+                        help="Eigene Prüfungen für die Validierung aus einer JSON- oder YAML-Datei "
+                             "(schließt --validate ein)")
+    parser.add_argument('--progress', action='store_true',
+                        help="Fortschritt (Zeilen, Zeilen/s) während der Verarbeitung anzeigen")
+    parser.add_argument('--partition', default=None, metavar='ORDNER',
+                        help="Nach Buchungsmonat partitioniert in ORDNER/year=YYYY/month=MM/ schreiben")
+    parser.add_argument('--partition-format', choices=PARTITION_FORMATS, default='csv',
+                        help="Dateiformat der Partitionen (Standard: csv; parquet benötigt pyarrow)")
+    parser.add_argument('--partition-work-ctr', action='store_true',
+                        help="Zusätzlich nach Work Ctr partitionieren")
+    parser.add_argument('--profile', action='store_true',
+                        help="Spaltenprofil erstellen (Leerwerte, Min/Max, verschiedene und häufigste "
+                             "Werte) als [name]_profile.json und Blatt 'Profil'")
+    parser.add_argument('--outputs', type=parse_columns, default=None,
+                        help=f"Ausgabeformate, kommagetrennt: {', '.join(EXPORT_SINKS)} "
+                             f"(Standard: {','.join(DEFAULT_OUTPUTS)}); die Daten werden nur einmal durchlaufen")
+    parser.add_argument('--resume', action='store_true',
+                        help="Fortsetzbar verarbeiten: regelmäßige Checkpoints in [name]_checkpoint, "
+                             "ein erneuter Aufruf mit --resume setzt dort fort")
+    return parser.parse_args(argv)
+
+
+def parse_columns(value):
+    """Wandelt 'Order,Material,Pstng Date' in eine Spaltenliste um."""
+    return [col.strip() for col in value.split(',') if col.strip()]
+
+
+def main_merge(argv):
+    """Unterbefehl 'merge': mehrere Reports zusammenführen und deduplizieren."""
+    parser = argparse.ArgumentParser(
+        prog="sap_report_cleaner.py merge",
+        description="Führt mehrere Reports (roh oder bereinigt) zusammen und entfernt Duplikate."
+    )
+    parser.add_argument('files', nargs='+', help="Reports oder bereinigte CSV-Dateien")
+    parser.add_argument('-o', '--output', required=True, help="Ziel-CSV")
+    parser.add_argument('--key', type=parse_columns, default=MERGE_KEY_COLUMNS,
+                        help=f"Schlüsselspalten, kommagetrennt (Standard: {','.join(MERGE_KEY_COLUMNS)})")
+    args = parser.parse_args(argv)
+    
+    missing = [f for f in args.files if not Path(f).exists()]
+    if missing:
+        print(f"❌ Datei nicht gefunden: {', '.join(missing)}")
+        return None
+    return merge_reports(args.files, args.output, key_columns=args.key)
+
+
+def main_lookup(argv):
+    """Unterbefehl 'lookup': Rohzeilen über den Sidecar-Index nachschlagen."""
+    parser = argparse.ArgumentParser(
+        prog="sap_report_cleaner.py lookup",
+        description="Zeigt Originalzeilen eines Rohreports über den Sidecar-Index an."
+    )
+    parser.add_argument('file', help="Rohreport (unkomprimiert)")
+    parser.add_argument('--line', type=int, nargs='+', default=[],
+                        help="Zeilennummern (Original_Zeile)")
+    parser.add_argument('--order', nargs='+', default=[], help="Auftragsnummern")
+    parser.add_argument('--material', nargs='+', default=[], help="Materialnummern")
+    args = parser.parse_args(argv)
+    
+    if not Path(args.file).exists():
+        print(f"❌ Datei nicht gefunden: {args.file}")
+        return None
+    if not (args.line or args.order or args.material):
+        parser.error("mindestens --line, --order oder --material angeben")
+    if detect_input_format(args.file) is not None:
+        print("❌ Direktzugriff ist nur für unkomprimierte Textdateien möglich")
+        return None
+    
+    index = load_or_build_index(args.file)
+    
+    start = datetime.now()
+    line_numbers = set(args.line)
+    for value in args.order:
+        line_numbers.update(index.line_numbers('Order', value))
+    for value in args.material:
+        line_numbers.update(index.line_numbers('Material', value))
+    results = index.read_lines(sorted(line_numbers))
+    elapsed = (datetime.now() - start).total_seconds() * 1000
+    
+    for line_no, line in results:
+        print(f"Zeile {line_no}: {line}")
+    print(f"\n🔎 {len(results)} Zeilen gefunden ({elapsed:.1f} ms)")
+    return results
+
+
+def main_join(argv):
+    """Unterbefehl 'join': zwei Reports über Order/Material verknüpfen."""
+    parser = argparse.ArgumentParser(
+        prog="sap_report_cleaner.py join",
+        description="Verknüpft zwei Reports (z.B. Materialverbrauch und IW13/IW47) per Hash-Join."
+    )
+    parser.add_argument('left', help="Linke Datei (bei --how left bleiben alle ihre Zeilen erhalten)")
+    parser.add_argument('right', help="Rechte Datei")
+    parser.add_argument('-o', '--output', required=True,
+                        help="Zieldatei: .csv, .csv.gz, .csv.zst, .xlsx, .parquet oder .sqlite")
+    parser.add_argument('--on', type=parse_columns, default=['Order'],
+                        help="Schlüsselspalten, kommagetrennt (Standard: Order)")
+    parser.add_argument('--how', choices=JOIN_TYPES, default='inner',
+                        help="Join-Art (Standard: inner)")
+    parser.add_argument('--suffix', default='_2',
+                        help="Anhang für gleichnamige Spalten der rechten Datei (Standard: _2)")
+    args = parser.parse_args(argv)
+    
+    missing = [f for f in (args.left, args.right) if not Path(f).exists()]
+    if missing:
+        print(f"❌ Datei nicht gefunden: {', '.join(missing)}")
+        return None
+    try:
+        return join_reports(args.left, args.right, args.output, on=args.on,
+                            how=args.how, suffix=args.suffix)
+    except (ValueError, ImportError) as e:
+        print(f"❌ {e}")
+        return None
+
+
+def main_diff(argv):
+    """Unterbefehl 'diff': zwei Versionen eines Reports vergleichen."""
+    parser = argparse.ArgumentParser(
+        prog="sap_report_cleaner.py diff",
+        description="Vergleicht zwei Versionen eines Reports (roh oder bereinigt): "
+                    "neue, entfernte und geänderte Buchungen."
+    )
+    parser.add_argument('old', help="Alte Version")
+    parser.add_argument('new', help="Neue Version")
+    parser.add_argument('-o', '--output', required=True,
+                        help="Zieldatei: .csv, .csv.gz, .csv.zst, .xlsx, .parquet oder .sqlite")
+    parser.add_argument('--key', type=parse_columns, default=DIFF_KEY_COLUMNS,
+                        help=f"Schlüsselspalten, kommagetrennt (Standard: {','.join(DIFF_KEY_COLUMNS)})")
+    args = parser.parse_args(argv)
+    
+    missing = [f for f in (args.old, args.new) if not Path(f).exists()]
+    if missing:
+        print(f"❌ Datei nicht gefunden: {', '.join(missing)}")
+        return None
+    try:
+        return diff_reports(args.old, args.new, args.output, key_columns=args.key)
+    except (ValueError, ImportError) as e:
+        print(f"❌ {e}")
+        return None
+
+
+# Unterbefehle: python3 sap_report_cleaner.py <befehl> ...
+COMMANDS = {
+    'merge': main_merge,
+    'lookup': main_lookup,
+    'join': main_join,
+    'diff': main_diff,
+}
+
+
 def main():
     """Kommandozeilen-Einstiegspunkt."""
+    argv = sys.argv[1:]
     try:
-        df = run()
-        if df is None:
+        if argv and argv[0] in COMMANDS:
+            result = COMMANDS[argv[0]](argv[1:])
+        else:
+            args = parse_args(argv)
+            result = run(args.file, csv_only=args.csv_only, compression=args.compress,
+                         max_memory=args.max_memory, spill_dir=args.spill_dir,
+                         with_index=args.index, native_dates=args.native_dates,
+                         progress=print_progress if args.progress else None, rules=args.rules,
+                         validate=args.checks or args.validate,
+                         partition=args.partition, partition_format=args.partition_format,
+                         partition_work_ctr=args.partition_work_ctr, profile=args.profile,
+                         resume=args.resume, outputs=args.outputs)
+        if result is None:
             sys.exit(1)
     except KeyboardInterrupt:
         print("\n⚠ Abgebrochen.")
@@ -517,4 +5104,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
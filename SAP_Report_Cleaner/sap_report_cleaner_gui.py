@@ -16,8 +16,11 @@ Voraussetzungen:
     pip3 install pandas openpyxl
 """
 
+import gzip
+import io
 import os
 import sys
+import zipfile
 
 # Tk Deprecation-Warnung unterdrücken (macOS)
 os.environ['TK_SILENCE_DEPRECATION'] = '1'
@@ -59,9 +62,10 @@ def select_source_file(filedialog):
     file_path = filedialog.askopenfilename(
         title="SAP-Report auswählen (Quelldatei)",
         filetypes=[
-            ("SAP Reports", "*.txt *.xls"),
+            ("SAP Reports", "*.txt *.xls *.xlsx *.gz *.zip *.zst"),
             ("Textdateien", "*.txt"),
             ("Excel-Dateien", "*.xls *.xlsx"),
+            ("Archive", "*.gz *.zip *.zst"),
             ("Alle Dateien", "*.*")
         ],
         initialdir=os.getcwd()
@@ -102,7 +106,7 @@ def select_target_file(filedialog, source_path, file_format='xlsx'):
     print("\n💾 Bitte Speicherort wählen...")
     
     # Vorgeschlagener Dateiname basierend auf Quelldatei
-    source_name = Path(source_path).stem
+    source_name = report_base_name(source_path)
     default_name = f"{source_name}_cleaned"
     source_dir = str(Path(source_path).parent)
     
@@ -243,11 +247,113 @@ def convert_date(value, output_format='%d.%m.%Y'):
     return val_str
 
 
+def open_report(file_path):
+    """Öffnet die Datei als Text; .gz/.zip/.zst-Archive werden beim Lesen entpackt
+    (Erkennung über die ersten Bytes)."""
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+    if head.startswith(b'\x1f\x8b'):
+        return gzip.open(file_path, 'rt', encoding='utf-8', errors='replace')
+    if head.startswith(b'PK\x03\x04'):
+        with zipfile.ZipFile(file_path) as archive:
+            members = [i for i in archive.infolist()
+                       if not i.is_dir() and not i.filename.startswith('__MACOSX/')]
+            if not members:
+                raise ValueError("ZIP-Archiv enthält keine Datei")
+            raw = archive.open(members[0])
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+    if head.startswith(b'\x28\xb5\x2f\xfd'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Für .zst-Dateien wird zstandard benötigt: pip install zstandard")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+    return open(file_path, 'r', encoding='utf-8', errors='replace')
+
+
+def report_base_name(file_path):
+    """Dateiname ohne Endung und ohne Archiv-Endung (z.B. 'L91.txt.gz' → 'L91')."""
+    path = Path(file_path)
+    if path.suffix.lower() in ('.gz', '.zip', '.zst'):
+        path = path.with_suffix('')
+    return path.stem
+
+
+def workbook_kind(file_path):
+    """Erkennt echte Excel-Arbeitsmappen an den ersten Bytes ('xls', 'xlsx' oder None)."""
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+    if head == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1':
+        return 'xls'
+    if head.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                if 'xl/workbook.xml' in archive.namelist():
+                    return 'xlsx'
+        except zipfile.BadZipFile:
+            pass
+    return None
+
+
+def format_cell(value):
+    """Wandelt einen Excel-Zellwert in Text wie im SAP-Tab-Export um."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%d.%m.%Y')
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        text = repr(value)
+        # Genau 3 Nachkommastellen würde clean_number als Tausenderpunkt lesen
+        if re.fullmatch(r'-?\d+\.\d{3}', text):
+            text += '0'
+        return text
+    return str(value).replace('\t', ' ').replace('\r', ' ').replace('\n', ' ')
+
+
+def iter_workbook_rows(file_path, kind):
+    """Liest das erste Tabellenblatt zeilenweise (.xlsx gestreamt, .xls über xlrd)."""
+    if kind == 'xls':
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportError("Für echte Excel-97-Dateien (.xls) wird xlrd benötigt: pip install xlrd")
+        book = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            sheet = book.sheet_by_index(0)
+            for row_idx in range(sheet.nrows):
+                yield [format_cell(xlrd.xldate_as_datetime(cell.value, book.datemode))
+                       if cell.ctype == xlrd.XL_CELL_DATE else format_cell(cell.value)
+                       for cell in sheet.row(row_idx)]
+        finally:
+            book.release_resources()
+        return
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows(values_only=True):
+            yield [format_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+
 def read_sap_file(file_path):
     """Liest eine SAP-Report-Datei."""
     print(f"\n📂 Lese Datei: {Path(file_path).name}")
     
-    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+    kind = workbook_kind(file_path)
+    if kind:
+        if kind == 'xlsx' and not install_openpyxl():
+            raise ImportError("Für .xlsx-Dateien wird openpyxl benötigt: pip3 install openpyxl")
+        all_rows = list(iter_workbook_rows(file_path, kind))
+        print(f"   Excel-Arbeitsmappe ({kind}): {len(all_rows)} Zeilen")
+        return all_rows
+    
+    with open_report(file_path) as f:
         content = f.read()
     
     lines = content.split('\n')
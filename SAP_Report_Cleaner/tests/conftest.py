@@ -0,0 +1,81 @@
+"""
+Gemeinsame Hilfen für die Tests: kleine SAP-Reports (Tab-getrennt wie der
+Export 'Materialverbrauch') werden je Test in tmp_path erzeugt.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sap_report_cleaner as cleaner  # noqa: E402
+
+
+def make_row(material='86000109', withdrawn='5', reserved='3.500', pstng_date='03.07.24',
+             order='40910282', message='12856001', work_ctr='L91', ict='L', customer='K1', marker=''):
+    """Eine Zeile wie im SAP-Export: Spalte A leer, B = marker ('*' bei Summenzeilen), ab C die Werte."""
+    values = {
+        'Material': material,
+        'Functional Loc.': '232VSTE091-TRP-002',
+        'Equipment': '10007001',
+        'Material Description': 'FOERDERGURT (P-4)',
+        'Work Ctr': work_ctr,
+        'Withdrawn': withdrawn,
+        'W/o resrv.': '-8',
+        'Reserved': reserved,
+        'Reserv.ref': '0',
+        'Pstng Date': pstng_date,
+        'Order': order,
+        'ID': '12856001',
+        'Message': message,
+        'ICt': ict,
+        'Customer': customer,
+    }
+    return ['', marker] + [values[col] for col in cleaner.EXPECTED_HEADERS]
+
+
+def write_report(path, rows):
+    """Schreibt einen Report mit Titelzeile und Header in Zeile 4, Spalte C."""
+    lines = ['19.10.2026   Materialverbrauch', '', '', '\t\t' + '\t'.join(cleaner.EXPECTED_HEADERS)]
+    lines += ['\t'.join(row) for row in rows]
+    Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return Path(path)
+
+
+def sample_rows(count=40):
+    """Gemischte Zeilen: deutsche Zahlen, Leerwerte, Summenzeilen, Zeile ohne Materialnummer."""
+    rows = []
+    for i in range(count):
+        rows.append(make_row(material=str(86000100 + i),
+                             withdrawn=['5', '-1.234,56', '1,5', '3.500', ''][i % 5],
+                             pstng_date=f"{i % 28 + 1:02d}.{i % 12 + 1:02d}.24",
+                             order=str(40910200 + i % 7),
+                             message=str(12856000 + i),
+                             work_ctr=['L91', 'L92'][i % 2]))
+        if i % 10 == 9:
+            rows.append(make_row(material='', withdrawn='42', marker='*'))
+    rows.append(make_row(material=''))
+    rows.append([''] * 17)
+    return rows
+
+
+@pytest.fixture
+def sap_row():
+    return make_row
+
+
+@pytest.fixture
+def make_report(tmp_path):
+    """make_report(rows, name): Report aus Zeilen (siehe sap_row) in tmp_path."""
+    def make(rows, name='report.txt'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return write_report(path, rows)
+    return make
+
+
+@pytest.fixture
+def report(make_report):
+    """Beispielreport mit 40 Datenzeilen und allen Arten gelöschter Zeilen."""
+    return make_report(sample_rows())
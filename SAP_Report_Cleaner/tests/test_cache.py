@@ -0,0 +1,50 @@
+"""Report-Cache für Notebooks (load_report)."""
+import os
+
+import pytest
+
+import sap_report_cleaner as cleaner
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    """Eigener Cache je Test (auch die Trefferzähler beginnen bei 0)."""
+    monkeypatch.setattr(cleaner, '_report_cache', cleaner.ReportCache())
+
+
+def touch(path, seconds=1):
+    """Änderungszeit um seconds vorstellen (unabhängig von der Auflösung des Dateisystems)."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_cache_hit_for_unchanged_file(report):
+    first = cleaner.load_report(str(report))
+    second = cleaner.load_report(str(report))
+
+    assert second is first
+    info = cleaner.report_cache_info()
+    assert (info['entries'], info['hits'], info['misses']) == (1, 1, 1)
+
+
+def test_cache_invalidated_when_mtime_changes(report, sap_row):
+    first = cleaner.load_report(str(report))
+    with open(report, 'a', encoding='utf-8') as f:
+        f.write('\t'.join(sap_row(material='86000999')) + '\n')
+    touch(report)
+
+    second = cleaner.load_report(str(report))
+
+    assert second is not first
+    assert len(second) == len(first) + 1
+    # Die alte Version wird verdrängt, nicht zusätzlich gehalten
+    assert cleaner.report_cache_info()['entries'] == 1
+
+
+def test_cache_mtime_only(report):
+    # Gleicher Inhalt, nur neue Änderungszeit: trotzdem neu einlesen
+    first = cleaner.load_report(str(report))
+    touch(report)
+
+    assert cleaner.load_report(str(report)) is not first
+    assert cleaner.report_cache_info()['misses'] == 2
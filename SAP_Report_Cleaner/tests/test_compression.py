@@ -0,0 +1,55 @@
+"""Komprimierte Reports (gzip/zip/zstd) lesen und komprimiert schreiben."""
+import gzip
+import zipfile
+
+import pytest
+
+import sap_report_cleaner as cleaner
+
+
+def compress(path, kind):
+    """Packt den Report wie ein Export aus dem Mail-Anhang oder Archiv."""
+    data = path.read_bytes()
+    if kind == 'gzip':
+        target = path.with_name(path.name + '.gz')
+        target.write_bytes(gzip.compress(data))
+    elif kind == 'zip':
+        target = path.with_name(path.stem + '.zip')
+        with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(path.name, data)
+    else:
+        zstandard = pytest.importorskip('zstandard')
+        target = path.with_name(path.name + '.zst')
+        target.write_bytes(zstandard.ZstdCompressor().compress(data))
+    return target
+
+
+@pytest.mark.parametrize('kind', ['gzip', 'zip', 'zstd'])
+def test_compressed_input(report, tmp_path, kind):
+    packed = compress(report, kind)
+    assert cleaner.detect_compression(str(packed)) == kind
+
+    plain_csv = tmp_path / 'plain.csv'
+    packed_csv = tmp_path / 'packed.csv'
+    cleaner.stream_clean_csv(str(report), str(plain_csv))
+    cleaner.stream_clean_csv(str(packed), str(packed_csv))
+    assert packed_csv.read_bytes() == plain_csv.read_bytes()
+
+    df_plain, _ = cleaner.process_sap_report(str(report))
+    df_packed, _ = cleaner.process_sap_report(str(packed))
+    assert df_packed.equals(df_plain)
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_compressed_output_round_trip(report, tmp_path, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+
+    plain_csv = tmp_path / 'plain.csv'
+    packed_csv = tmp_path / ('packed.csv' + cleaner.COMPRESSION_SUFFIXES[compression])
+    cleaner.stream_clean_csv(str(report), str(plain_csv))
+    cleaner.stream_clean_csv(str(report), str(packed_csv), compression=compression)
+
+    assert cleaner.detect_compression(str(packed_csv)) == compression
+    with cleaner.open_report(str(packed_csv), encoding='utf-8-sig') as f:
+        assert f.read() == plain_csv.read_text(encoding='utf-8-sig')
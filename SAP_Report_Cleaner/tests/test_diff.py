@@ -0,0 +1,82 @@
+"""Vergleich zweier Versionen eines Reports (diff)."""
+import pandas as pd
+
+import sap_report_cleaner as cleaner
+
+
+def read_diff(path):
+    return pd.read_csv(path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+
+
+def test_diff_changed_added_removed(make_report, sap_row, tmp_path):
+    a = sap_row(material='86000101', message='12856001')
+    b = sap_row(material='86000102', message='12856002', withdrawn='5')
+    c = sap_row(material='86000103', message='12856003')
+    b_new = sap_row(material='86000102', message='12856002', withdrawn='7')
+    d = sap_row(material='86000104', message='12856004')
+    old = make_report([a, b, c], 'old.txt')
+    new = make_report([a, b_new, d], 'new.txt')
+
+    output = tmp_path / 'diff.csv'
+    stats = cleaner.diff_reports(str(old), str(new), str(output))
+
+    assert (stats['unchanged'], stats['changed'], stats['added'], stats['removed']) == (1, 1, 1, 1)
+    assert stats['changed_columns'] == {'Withdrawn': 1}
+    diff = read_diff(output)
+    assert list(diff.columns) == cleaner.DIFF_COLUMNS + cleaner.EXPECTED_HEADERS
+    changes = dict(zip(diff['Material'], zip(diff['Änderung'], diff['Geänderte Spalten'])))
+    assert changes == {'86000102': ('geändert', 'Withdrawn: 5 → 7'),
+                       '86000104': ('neu', ''),
+                       '86000103': ('entfernt', '')}
+
+
+def test_diff_cleaned_csv_against_raw(report, tmp_path):
+    cleaned = tmp_path / 'cleaned.csv'
+    cleaner.stream_clean_csv(str(report), str(cleaned))
+
+    stats = cleaner.diff_reports(str(report), str(cleaned), str(tmp_path / 'diff.csv'))
+
+    assert (stats['unchanged'], stats['changed'], stats['added'], stats['removed']) == (40, 0, 0, 0)
+
+
+def test_diff_unicode_digits(make_report, sap_row, tmp_path):
+    # '²'.isdigit() ist True, int('²') aber ein Fehler: der Wert ist nicht lesbar (leer)
+    old = make_report([sap_row(material='86000101', reserved='²'),
+                       sap_row(material='86000102', message='12856002', reserved='²')], 'old.txt')
+    new = make_report([sap_row(material='86000101', reserved='²'),
+                       sap_row(material='86000102', message='12856002', reserved='3')], 'new.txt')
+
+    output = tmp_path / 'diff.csv'
+    stats = cleaner.diff_reports(str(old), str(new), str(output))
+
+    assert (stats['unchanged'], stats['changed']) == (1, 1)
+    assert read_diff(output)['Geänderte Spalten'].tolist() == ['Reserved: (leer) → 3']
+
+
+def test_diff_shares_format_plan(make_report, sap_row, tmp_path):
+    # Allein gelesen wäre '3,500' in der alten Version deutsch (3,5), in der neuen englisch (3500)
+    old = make_report([sap_row(material='86000101', reserved='3,500'),
+                       sap_row(material='86000102', message='12856002', reserved='1,5')], 'old.txt')
+    new = make_report([sap_row(material='86000101', reserved='3,500'),
+                       sap_row(material='86000102', message='12856002', reserved='3,500')], 'new.txt')
+    assert cleaner.plan_report(str(old))['Reserved'].spec != cleaner.plan_report(str(new))['Reserved'].spec
+
+    stats = cleaner.diff_reports(str(old), str(new), str(tmp_path / 'diff.csv'))
+
+    assert (stats['unchanged'], stats['changed'], stats['added'], stats['removed']) == (1, 1, 0, 0)
+    assert stats['changed_columns'] == {'Reserved': 1}
+
+
+def test_diff_repeated_rows(make_report, sap_row, tmp_path):
+    # Identische Buchung kommt in der neuen Version einmal mehr vor, eine andere einmal weniger
+    a = sap_row(material='86000101', message='12856001')
+    b = sap_row(material='86000102', message='12856002')
+    old = make_report([a, b, b], 'old.txt')
+    new = make_report([a, a, b], 'new.txt')
+
+    output = tmp_path / 'diff.csv'
+    stats = cleaner.diff_reports(str(old), str(new), str(output))
+
+    assert (stats['unchanged'], stats['changed'], stats['added'], stats['removed']) == (2, 0, 1, 1)
+    diff = read_diff(output)
+    assert list(zip(diff['Änderung'], diff['Material'])) == [('neu', '86000101'), ('entfernt', '86000102')]
@@ -0,0 +1,47 @@
+"""Excel-Export über die Zeilengrenze hinaus (SplitSheet, Fortsetzungsblätter)."""
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import sap_report_cleaner as cleaner
+
+
+def sheet_rows(path):
+    """{Blattname: Zeilen (mit Kopfzeile)} einer Excel-Datei."""
+    workbook = load_workbook(path, read_only=True)
+    rows = {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)]
+            for sheet in workbook.worksheets}
+    workbook.close()
+    return rows
+
+
+@pytest.mark.parametrize('max_memory', [None, '1G'])
+def test_sheets_roll_over(report, monkeypatch, max_memory, capsys):
+    # 16 Zeilen je Blatt: Kopfzeile + 15 Datenzeilen
+    monkeypatch.setattr(cleaner, 'EXCEL_MAX_ROWS', 16)
+
+    cleaner.run(str(report), max_memory=max_memory)
+
+    sheets = sheet_rows(report.with_name('report_cleaned.xlsx'))
+    assert list(sheets) == ['Bereinigte Daten', 'Bereinigte Daten (2)', 'Bereinigte Daten (3)',
+                            'Gelöschte Zeilen']
+    # 40 behaltene Zeilen: 15 + 15 + 10
+    assert [len(rows) - 1 for rows in sheets.values()][:3] == [15, 15, 10]
+    assert all(rows[0] == cleaner.EXPECTED_HEADERS for name, rows in sheets.items() if name != 'Gelöschte Zeilen')
+    materials = [row[0] for name in list(sheets)[:3] for row in sheets[name][1:]]
+    assert materials == [86000100 + i for i in range(40)]
+    assert "auf 3 Blätter verteilt" in capsys.readouterr().out
+
+
+def test_split_sheet_creates_continuation_lazily(tmp_path):
+    workbook = Workbook(write_only=True)
+    sheet = cleaner.SplitSheet(workbook, 'Daten', ['A'], max_rows=3)
+    for value in range(4):
+        sheet.append([value])
+
+    # Genau zwei volle Blätter: das dritte entsteht erst mit der nächsten Zeile
+    assert workbook.sheetnames == ['Daten', 'Daten (2)']
+    sheet.append([4])
+    assert workbook.sheetnames == ['Daten', 'Daten (2)', 'Daten (3)']
+    assert (sheet.sheets, sheet.rows) == (3, 5)
+    workbook.save(tmp_path / 'daten.xlsx')
+    assert [len(rows) for rows in sheet_rows(tmp_path / 'daten.xlsx').values()] == [3, 3, 2]
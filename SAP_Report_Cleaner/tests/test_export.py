@@ -0,0 +1,77 @@
+"""Export über fan_out: ein Durchlauf, je Sink ein Thread."""
+import pandas as pd
+import pytest
+
+import sap_report_cleaner as cleaner
+
+
+class BrokenSink(cleaner.ExportSink):
+    """Schreibt die ersten Blöcke und scheitert dann (z.B. Platte voll)."""
+
+    label = 'Defekt'
+    suffix = '_broken.txt'
+    fail_at = 2
+
+    def open(self, batch):
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+        self.batches = 0
+
+    def write(self, batch):
+        self.batches += 1
+        if self.batches == self.fail_at:
+            raise OSError("Kein Speicherplatz")
+        batch.to_csv(self.file, index=False)
+
+    def finish(self):
+        self.file.close()
+
+    release = finish
+
+
+def frame(rows=25):
+    return pd.DataFrame({'Material': range(rows), 'Work Ctr': ['L91'] * rows})
+
+
+def test_fan_out_error_in_one_sink(tmp_path, capsys):
+    good = cleaner.CsvSink(tmp_path / 'x_cleaned.csv', {})
+    broken = BrokenSink(tmp_path / 'x_broken.txt', {})
+
+    failed = cleaner.fan_out(frame(), [broken, good], batch_size=10)
+
+    assert failed == [broken]
+    assert "Defekt-Export fehlgeschlagen: Kein Speicherplatz" in capsys.readouterr().out
+    # Die defekte Datei wird verworfen, die übrigen Sinks schreiben vollständig
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['x_cleaned.csv']
+    written = pd.read_csv(tmp_path / 'x_cleaned.csv', sep=';', encoding='utf-8-sig')
+    assert written['Material'].tolist() == list(range(25))
+
+
+def test_fan_out_error_when_opening(tmp_path, monkeypatch):
+    monkeypatch.setattr(BrokenSink, 'fail_at', 1)
+    broken = BrokenSink(tmp_path / 'x_broken.txt', {})
+
+    assert cleaner.fan_out(frame(), [broken], batch_size=10) == [broken]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_results_with_failing_sink(report, monkeypatch):
+    monkeypatch.setitem(cleaner.EXPORT_SINKS, 'broken', BrokenSink)
+    monkeypatch.setattr(BrokenSink, 'fail_at', 1)
+    df, df_deleted = cleaner.process_sap_report(str(report))
+
+    written = cleaner.export_results(cleaner.convert_data_types(df), df_deleted, str(report),
+                                     outputs=['broken', 'csv'])
+
+    assert written == report.with_name('report_cleaned.csv')
+    assert written.exists()
+    assert not report.with_name('report_broken.txt').exists()
+
+
+def test_fan_out_cancel_discards_all(tmp_path):
+    sinks = [cleaner.CsvSink(tmp_path / 'x_cleaned.csv', {}), BrokenSink(tmp_path / 'x_broken.txt', {})]
+    cancel = cleaner.CancelToken()
+    cancel.cancel()
+
+    with pytest.raises(cleaner.ProcessingCancelled):
+        cleaner.fan_out(frame(), sinks, cleaner.ProgressTracker(cancel=cancel), batch_size=10)
+    assert list(tmp_path.iterdir()) == []
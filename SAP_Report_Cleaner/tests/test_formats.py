@@ -0,0 +1,149 @@
+"""Zahlenformat je Spalte aus einer Stichprobe (FormatPlan)."""
+import json
+
+import pandas as pd
+import pytest
+
+import sap_report_cleaner as cleaner
+
+
+@pytest.mark.parametrize('values, expected', [
+    (['5', '-8', '12856001'], 'int'),
+    (['1.234,56', '3.500', '1,5'], 'de'),
+    (['1,234.56', '12.7', '5'], 'en'),
+    # Tausendergruppen sind Ganzzahlen ihres Formats
+    (['3.500', '12.000'], 'de'),
+    (['1,234', '12,345'], 'en'),
+    # Gleichstand: deutsch wie im SAP-Export
+    (['1,5', '12.7'], 'de'),
+])
+def test_infer_number_format(values, expected):
+    assert cleaner.infer_number_format(values) == expected
+
+
+def test_comma_grouped_integers(make_report, sap_row, tmp_path):
+    # Nur '1,234' u.ä.: Tausendertrennzeichen wie bei clean_number, keine Dezimalstellen
+    report = make_report([sap_row(material=str(86000100 + i), message=str(12856000 + i), withdrawn=value)
+                          for i, value in enumerate(['1,234', '12,345', '1,234,567'])])
+    plan = cleaner.plan_report(str(report))
+    assert [plan['Withdrawn'].parse(value) for value in ['1,234', '12,345']] == [1234, 12345]
+
+    frame_csv, stream_csv = cleaned_both_ways(report, tmp_path)
+    assert stream_csv.read_bytes() == frame_csv.read_bytes()
+    cleaned = pd.read_csv(frame_csv, sep=';', encoding='utf-8-sig', dtype=str)
+    assert cleaned['Withdrawn'].tolist() == ['1234', '12345', '1234567']
+
+
+@pytest.fixture
+def mixed_report(make_report, sap_row):
+    """Withdrawn im englischen, Reserved im deutschen Format (z.B. nach Excel-Umweg)."""
+    withdrawn = ['1,234', '12.7', '1,234.56']
+    reserved = ['1,234', '3.500', '1.234,56']
+    return make_report([sap_row(material=str(86000100 + i), message=str(12856000 + i),
+                                withdrawn=withdrawn[i % 3], reserved=reserved[i % 3])
+                        for i in range(9)])
+
+
+def cleaned_both_ways(report, tmp_path, rules=None):
+    """Bereinigte CSV über den DataFrame-Weg und per Streaming."""
+    plan = cleaner.plan_report(str(report))
+    df, _ = cleaner.process_sap_report(str(report), rules=rules, plan=plan)
+    frame_csv = tmp_path / 'frame.csv'
+    cleaner.write_csv(cleaner.convert_data_types(df, plan=plan), str(frame_csv))
+    stream_csv = tmp_path / 'stream.csv'
+    cleaner.stream_clean_csv(str(report), str(stream_csv), rules=rules)
+    return frame_csv, stream_csv
+
+
+def test_plan_per_column(mixed_report, tmp_path):
+    plan = cleaner.plan_report(str(mixed_report))
+    assert plan['Withdrawn'].spec == 'en'
+    assert plan['Reserved'].spec == 'de'
+    assert plan['Material'].spec == 'int'
+
+    frame_csv, stream_csv = cleaned_both_ways(mixed_report, tmp_path)
+    assert stream_csv.read_bytes() == frame_csv.read_bytes()
+
+    cleaned = pd.read_csv(frame_csv, sep=';', encoding='utf-8-sig', dtype=str)
+    assert cleaned['Withdrawn'].tolist()[:3] == ['1234', '13', '1235']
+    assert cleaned['Reserved'].tolist()[:3] == ['1', '3500', '1235']
+
+
+def test_rule_uses_column_format(mixed_report, tmp_path):
+    rules = cleaner.load_rules([{'column': 'Withdrawn', 'op': 'gt', 'value': 1000}])
+    frame_csv, stream_csv = cleaned_both_ways(mixed_report, tmp_path, rules)
+
+    assert stream_csv.read_bytes() == frame_csv.read_bytes()
+    cleaned = pd.read_csv(frame_csv, sep=';', encoding='utf-8-sig', dtype=str)
+    assert cleaned['Withdrawn'].tolist() == ['13', '13', '13']
+
+
+@pytest.mark.parametrize('spec', ['int', 'de', 'en'])
+def test_unicode_digits(spec):
+    fmt = cleaner.NumberFormat('Withdrawn', spec)
+    # '²'.isdigit() ist True, aber keine Dezimalziffer: nicht lesbar statt Absturz
+    assert fmt.parse('²') is None
+    assert fmt.parse('٣') == 3
+    assert fmt.parse('１２') == 12
+    assert fmt.to_int_column(['²', '٣', '5']).tolist() == [pd.NA, 3, 5]
+    assert fmt.unreadable == 2
+
+
+def test_rules_same_in_both_paths(make_report, sap_row, tmp_path):
+    # Leere Zellen in Text-, Zahl- und Datumsspalten gegen Regeln mit und ohne ''
+    report = make_report([sap_row(material=str(86000100 + i), message=str(12856000 + i),
+                                  ict=['', 'X', 'L'][i % 3], customer=['', 'K1'][i % 2],
+                                  withdrawn=['', '5', '12'][i % 3], work_ctr=['', 'L91', 'L92', 'M1'][i % 4],
+                                  pstng_date=['', '03.07.24', '15.08.24'][i % 3])
+                          for i in range(24)])
+    entries = [
+        {'column': 'ICt', 'op': 'in', 'value': ['', 'X']},
+        {'column': 'Customer', 'op': 'eq', 'value': ''},
+        {'column': 'Work Ctr', 'op': 'not_in', 'value': ['', 'L91']},
+        {'column': 'Work Ctr', 'op': 'gt', 'value': 'L91'},
+        {'column': 'Withdrawn', 'op': 'ne', 'value': 5},
+        {'column': 'Pstng Date', 'op': 'lt', 'value': '01.08.2024'},
+        {'column': 'Pstng Date', 'op': 'empty'},
+    ]
+    df, _ = cleaner.process_sap_report(str(report))
+    plan = cleaner.plan_frame(df)
+    for rule in cleaner.load_rules(entries):
+        typed = rule.typed_column(df[rule.column], plan)
+        rows = [rule.matches(cell, plan) for cell in df[rule.column]]
+        assert rule.mask(typed, df[rule.column]).tolist() == rows, rule.reason
+
+    rules = cleaner.load_rules(entries[:2])
+    frame_csv, stream_csv = cleaned_both_ways(report, tmp_path, rules)
+    assert stream_csv.read_bytes() == frame_csv.read_bytes()
+    # Behalten: ICt = 'L' und Customer = 'K1', also i % 6 == 5
+    assert len(pd.read_csv(frame_csv, sep=';', encoding='utf-8-sig', dtype=str)) == 4
+
+
+@pytest.mark.parametrize('options', [{}, {'csv_only': True}, {'max_memory': '1G'}])
+def test_run_plans_from_main_pass(mixed_report, tmp_path, monkeypatch, options):
+    rules = [{'column': 'Withdrawn', 'op': 'gt', 'value': 1000}]
+    frame_csv, _ = cleaned_both_ways(mixed_report, tmp_path, cleaner.load_rules(rules))
+    # Der Plan entsteht aus den ersten Zeilen des Durchlaufs, ohne den Anfang vorab zu lesen
+    monkeypatch.setattr(cleaner, 'plan_report', lambda *paths: pytest.fail("plan_report in run"))
+
+    cleaner.run(str(mixed_report), rules=rules, with_index=True, profile=True, **options)
+
+    assert mixed_report.with_name('report_cleaned.csv').read_bytes() == frame_csv.read_bytes()
+    index = cleaner.ReportIndex.load(str(mixed_report))
+    assert [index.plan[col].spec for col in cleaner.INDEX_COLUMNS] == ['int', 'int']
+    profile = json.loads(mixed_report.with_name('report_profile.json').read_text(encoding='utf-8'))
+    reserved = next(col for col in profile['columns'] if col['column'] == 'Reserved')
+    # Behalten werden nur die Zeilen mit Withdrawn '12.7', dort ist Reserved '3.500' (deutsch)
+    assert (reserved['min'], reserved['max']) == (3500, 3500)
+
+
+def test_open_plan_copies():
+    plan = cleaner.FormatPlan()
+    copy = plan.copy()
+    lines = iter(['\t\t86000101\t' + '\t'.join(['x'] * 4) + '\t1.234,5'] * 3 + ['rest'])
+
+    rows = plan.sample_lines(lines, 2)
+
+    assert list(rows)[-1] == 'rest'
+    assert plan['Withdrawn'].spec == copy['Withdrawn'].spec == 'de'
+    assert copy['Withdrawn'] is not plan['Withdrawn']
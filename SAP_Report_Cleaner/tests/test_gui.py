@@ -0,0 +1,33 @@
+"""Einlesen der GUI-Version (eigenständig, ohne sap_report_cleaner.py)."""
+import gzip
+
+import sap_report_cleaner as cleaner
+import sap_report_cleaner_gui as gui
+
+
+def test_gui_matches_cleaner(report):
+    df, df_deleted, stats = gui.process_sap_report(str(report))
+    expected, expected_deleted = cleaner.process_sap_report(str(report))
+
+    assert df.values.tolist() == expected.values.tolist()
+    assert df_deleted['Grund'].tolist() == expected_deleted['Grund'].tolist()
+    assert (stats['kept_rows'], stats['sum_rows'], stats['no_material']) == (40, 4, 1)
+
+
+def test_gui_empty_report(make_report):
+    # Nur Titel und Header: leeres Ergebnis, kein Fehler
+    df, df_deleted, stats = gui.process_sap_report(str(make_report([])))
+
+    assert list(df.columns) == gui.EXPECTED_HEADERS
+    assert df.empty and df_deleted.empty
+    assert stats['kept_rows'] == 0
+
+
+def test_gui_compressed_input(report):
+    packed = report.with_name(report.name + '.gz')
+    packed.write_bytes(gzip.compress(report.read_bytes()))
+
+    df, _, _ = gui.process_sap_report(str(packed))
+
+    assert df.values.tolist() == gui.process_sap_report(str(report))[0].values.tolist()
+    assert gui.report_base_name(str(packed)) == 'report'
@@ -0,0 +1,46 @@
+"""Sidecar-Index und Befehl 'lookup'."""
+import os
+
+import sap_report_cleaner as cleaner
+
+
+def lines_with(report, column, value):
+    """Erwartete Zeilennummern: behaltene Zeilen mit column == value, per Hand gesucht."""
+    pos = 2 + cleaner.EXPECTED_HEADERS.index(column)
+    result = []
+    for line_no, line in enumerate(report.read_text(encoding='utf-8').split('\n'), start=1):
+        cells = line.split('\t')
+        if line_no > 4 and len(cells) > pos and cells[1] != '*' and cells[2] and cells[pos] == value:
+            result.append(line_no)
+    return result
+
+
+def test_lookup_after_index_saved(report):
+    cleaner.run(str(report), csv_only=True, with_index=True)
+    assert cleaner.ReportIndex.index_path(report).exists()
+
+    index = cleaner.ReportIndex.load(str(report))
+    expected = lines_with(report, 'Order', '40910203')
+    assert len(expected) == 6
+    assert index.line_numbers('Order', '40910203') == expected
+    assert index.line_numbers('Material', '86000105') == lines_with(report, 'Material', '86000105')
+    assert index.line_numbers('Order', '99999999') == []
+
+    results = cleaner.main_lookup([str(report), '--order', '40910203', '--line', '5'])
+    lines = report.read_text(encoding='utf-8').split('\n')
+    assert results == [(line_no, lines[line_no - 1]) for line_no in sorted(set(expected) | {5})]
+
+
+def test_lookup_rebuilds_stale_index(report, sap_row):
+    cleaner.build_index(str(report))
+    # Datei geändert (neue Zeile, neue Änderungszeit): der Index gilt nicht mehr
+    with open(report, 'a', encoding='utf-8') as f:
+        f.write('\t'.join(sap_row(material='86000999', order='40919999')) + '\n')
+    stat = os.stat(report)
+    os.utime(report, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cleaner.ReportIndex.load(str(report)) is None
+
+    results = cleaner.main_lookup([str(report), '--order', '40919999'])
+
+    assert [line_no for line_no, _ in results] == lines_with(report, 'Order', '40919999')
+    assert cleaner.ReportIndex.load(str(report)) is not None
@@ -0,0 +1,51 @@
+"""Verknüpfen mit fremden Exporten über Order (join)."""
+import pandas as pd
+import pytest
+
+import sap_report_cleaner as cleaner
+
+
+@pytest.fixture
+def consumption(make_report, sap_row):
+    return make_report([sap_row(material=str(86000100 + i), order=order, message=str(12856000 + i))
+                        for i, order in enumerate(['40910001', '40910002', '40910003'])])
+
+
+def write_orders(path, padding=0):
+    """IW47-ähnlicher Export mit führenden Nullen; padding hängt fremde Aufträge an."""
+    lines = ['Order;Auftragstext', '040910001;Gurt tauschen', '40910002;Rolle prüfen',
+             '99999999;Fremdauftrag', '²;Fehlerhafter Export']
+    lines += [f'{50000000 + i};Auftrag {i:04d} mit langem Text zum Auffüllen' for i in range(padding)]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+def read_joined(path):
+    return pd.read_csv(path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+
+
+# Ohne Auffüllen ist orders.csv die Hashtabelle, mit Auffüllen der Report
+@pytest.mark.parametrize('padding', [0, 200], ids=['build-right', 'build-left'])
+@pytest.mark.parametrize('how, expected', [
+    ('inner', {'40910001': 'Gurt tauschen', '40910002': 'Rolle prüfen'}),
+    ('left', {'40910001': 'Gurt tauschen', '40910002': 'Rolle prüfen', '40910003': ''}),
+], ids=['inner', 'left'])
+def test_join_orders(consumption, tmp_path, padding, how, expected):
+    orders = write_orders(tmp_path / 'orders.csv', padding)
+    build_left = padding > 0
+    assert (consumption.stat().st_size <= orders.stat().st_size) == build_left
+
+    output = tmp_path / 'joined.csv'
+    stats = cleaner.join_reports(str(consumption), str(orders), str(output), how=how)
+
+    joined = read_joined(output)
+    assert list(joined.columns) == cleaner.EXPECTED_HEADERS + ['Auftragstext']
+    assert dict(zip(joined['Order'], joined['Auftragstext'])) == expected
+    assert stats['rows_written'] == len(expected)
+
+
+def test_join_key():
+    assert cleaner.join_key(['040910001']) == cleaner.join_key(['40910001']) == (40910001,)
+    # '²'.isdigit() ist True, int('²') aber ein Fehler
+    assert cleaner.join_key(['²']) == ('²',)
+    assert cleaner.join_key(['  ']) is None
@@ -0,0 +1,40 @@
+"""Zusammenführen überlappender Extraktionen (--merge)."""
+import os
+
+import pandas as pd
+
+import sap_report_cleaner as cleaner
+
+
+def read_merged(path):
+    return pd.read_csv(path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+
+
+def test_merge_removes_overlap_newest_wins(make_report, sap_row, tmp_path):
+    old = make_report([sap_row(material='86000101', message='12856001'),
+                       sap_row(material='86000102', message='12856002', customer='ALT')], 'jan.txt')
+    new = make_report([sap_row(material='86000102', message='12856002', customer='NEU'),
+                       sap_row(material='86000103', message='12856003')], 'feb.txt')
+    os.utime(old, (1_700_000_000, 1_700_000_000))
+    os.utime(new, (1_700_100_000, 1_700_100_000))
+
+    output = tmp_path / 'merged.csv'
+    # Ältere Datei zuerst übergeben: die Reihenfolge bestimmt das Änderungsdatum
+    stats = cleaner.merge_reports([str(old), str(new)], str(output))
+
+    assert stats == {'sources': 2, 'rows_read': 4, 'duplicates': 1, 'rows_written': 3}
+    merged = read_merged(output)
+    assert sorted(merged['Material']) == ['86000101', '86000102', '86000103']
+    assert merged.loc[merged['Material'] == '86000102', 'Customer'].tolist() == ['NEU']
+
+
+def test_merge_raw_with_own_cleaned_csv(report, tmp_path):
+    cleaned = tmp_path / 'cleaned.csv'
+    cleaner.stream_clean_csv(str(report), str(cleaned))
+
+    output = tmp_path / 'merged.csv'
+    stats = cleaner.merge_reports([str(report), str(cleaned)], str(output))
+
+    assert stats['rows_read'] == 80
+    assert stats['duplicates'] == 40
+    assert output.read_bytes() == cleaned.read_bytes()
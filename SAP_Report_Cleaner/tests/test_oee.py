@@ -0,0 +1,96 @@
+"""OEE-Berechnung (oee.py) mit von Hand gerechneten Werten."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import oee
+
+
+def bookings(rows):
+    """Buchungen wie aus 'join': (Arbeitsplatz, Datum, Planzeit, Laufzeit, Soll-Stückzeit, Gutmenge, Ausschuss)."""
+    return pd.DataFrame(rows, columns=['Work Ctr', 'Pstng Date', 'Planned time', 'Run time',
+                                       'Ideal cycle time', 'Yield', 'Scrap'])
+
+
+# L91: Tag 1 in zwei Buchungen, Tag 2, Lücke am 03.07., Tag 4
+JULY = bookings([
+    ('L91', '01.07.2024', '240', '200', '1', '150', '10'),
+    ('L91', '01.07.2024', '240', '200', '1', '150', '10'),
+    ('L91', '02.07.2024', '480', '480', '0,5', '900', '0'),
+    ('L91', '04.07.2024', '240', '120', '2', '50', '10'),
+])
+
+
+def test_to_number():
+    values = ['1.234,5', '1,5', '3.500', '12', '-8', '', 'x']
+    result = oee.to_number(values).tolist()
+    assert result[:5] == [1234.5, 1.5, 3500.0, 12.0, -8.0]
+    assert np.isnan(result[5]) and np.isnan(result[6])
+    assert oee.to_number(pd.Series([1, 2])).tolist() == [1.0, 2.0]
+
+
+def test_assign_shift_night_belongs_to_previous_day():
+    dates = pd.Series(pd.to_datetime(['2024-07-03'] * 5))
+    shift_dates, names = oee.assign_shift(dates, ['05:59', '06:00', '14:30', '23:15', 'kaputt'])
+
+    assert names[:4].tolist() == ['Nacht', 'Früh', 'Spät', 'Nacht']
+    assert pd.isna(names[4])
+    assert shift_dates.dt.strftime('%d.%m.').tolist() == ['02.07.', '03.07.', '03.07.', '03.07.', '03.07.']
+
+
+def test_compute_oee_day():
+    result = oee.compute_oee(oee.oee_base(JULY), 'day')
+
+    assert result['Datum'].dt.strftime('%d.%m.').tolist() == ['01.07.', '02.07.', '04.07.']
+    # 01.07.: Laufzeit 400 / Planzeit 480, Sollzeit 320 / 400, Gutmenge 300 / 320
+    assert result['Verfügbarkeit'].tolist() == pytest.approx([400 / 480, 1.0, 0.5])
+    assert result['Leistung'].tolist() == pytest.approx([0.8, 450 / 480, 1.0])
+    assert result['Qualität'].tolist() == pytest.approx([300 / 320, 1.0, 50 / 60])
+    assert result['OEE'].tolist() == pytest.approx([0.625, 0.9375, 0.5 * 50 / 60])
+
+
+def test_compute_oee_window_and_month():
+    base = oee.oee_base(JULY)
+
+    # Zwei Kalendertage: der 04.07. hat keinen Vortag (Lücke am 03.07.)
+    rolled = oee.compute_oee(base, 'day', window=2)
+    assert rolled['Planzeit'].tolist() == [480, 960, 240]
+    assert rolled['OEE'].tolist() == pytest.approx([0.625, 880 / 960 * 770 / 880 * 1200 / 1220,
+                                                    0.5 * 50 / 60])
+
+    month = oee.compute_oee(base, 'month')
+    assert month['Monat'].tolist() == ['2024-07']
+    assert month['OEE'].tolist() == pytest.approx([1000 / 1200 * 890 / 1000 * 1250 / 1280])
+
+
+def test_compute_oee_zero_planned_time():
+    result = oee.compute_oee(oee.oee_base(bookings([('L92', '01.07.2024', '0', '0', '1', '0', '0')])))
+    assert result[['Verfügbarkeit', 'Leistung', 'Qualität', 'OEE']].isna().all(axis=None)
+
+
+def test_state_update_replaces_days():
+    state = oee.OEEState()
+    assert state.update(JULY[:3]) == 2
+    # Erneut eingespielter Tagesreport: 02.07. korrigiert, 04.07. neu
+    state.update(bookings([
+        ('L91', '02.07.2024', '480', '240', '0,5', '450', '30'),
+        ('L91', '04.07.2024', '240', '120', '2', '50', '10'),
+    ]))
+    # Derselbe Report noch einmal zählt nicht doppelt
+    state.update(bookings([('L91', '04.07.2024', '240', '120', '2', '50', '10')]))
+
+    result = state.report('day')
+    assert result['Datum'].dt.strftime('%d.%m.').tolist() == ['01.07.', '02.07.', '04.07.']
+    assert result['Planzeit'].tolist() == [480, 480, 240]
+    assert result['Laufzeit'].tolist() == [400, 240, 120]
+    assert result['OEE'].tolist() == pytest.approx([0.625, 0.5 * 240 / 240 * 450 / 480, 0.5 * 50 / 60])
+
+
+def test_state_save_load(tmp_path):
+    state = oee.OEEState()
+    state.update(JULY)
+    path = tmp_path / 'oee_basis.csv'
+    state.save(path)
+
+    loaded = oee.OEEState.load(path)
+    pd.testing.assert_frame_equal(loaded.report('day'), state.report('day'), check_dtype=False)
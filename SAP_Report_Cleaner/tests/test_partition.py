@@ -0,0 +1,61 @@
+"""Partitionierter Export (year=YYYY/month=MM/, _manifest.json)."""
+import json
+
+import pandas as pd
+
+import sap_report_cleaner as cleaner
+
+
+def read_part(path):
+    return pd.read_csv(path, sep=';', encoding='utf-8-sig', dtype=str, keep_default_na=False)
+
+
+def test_partition_layout_and_manifest(make_report, sap_row, tmp_path):
+    report = make_report([
+        sap_row(material='86000101', message='12856001', pstng_date='03.07.24'),
+        sap_row(material='86000102', message='12856002', pstng_date='28.07.24'),
+        sap_row(material='86000103', message='12856003', pstng_date='01.08.24'),
+        sap_row(material='86000104', message='12856004', pstng_date=''),
+        sap_row(material='86000105', message='12856005', pstng_date='15.01.25', work_ctr=''),
+    ])
+    target = tmp_path / 'partitionen'
+
+    cleaner.run(str(report), partition=str(target))
+
+    files = sorted(path.relative_to(target).as_posix() for path in target.rglob('*') if path.is_file())
+    assert files == ['_manifest.json',
+                     'year=2024/month=07/part.csv',
+                     'year=2024/month=08/part.csv',
+                     'year=2025/month=01/part.csv',
+                     'year=_ohne/month=_ohne/part.csv']
+    assert read_part(target / 'year=2024/month=07/part.csv')['Material'].tolist() == ['86000101', '86000102']
+    assert read_part(target / 'year=_ohne/month=_ohne/part.csv')['Material'].tolist() == ['86000104']
+
+    manifest = json.loads((target / cleaner.PARTITION_MANIFEST).read_text(encoding='utf-8'))
+    assert (manifest['format'], manifest['partition_by'], manifest['rows']) == ('csv', ['year', 'month'], 5)
+    july = manifest['partitions']['year=2024/month=07']
+    assert (july['file'], july['rows'], july['min_date'], july['max_date']) == \
+        ('year=2024/month=07/part.csv', 2, '2024-07-03', '2024-07-28')
+    empty = manifest['partitions']['year=_ohne/month=_ohne']
+    assert (empty['rows'], empty['min_date'], empty['max_date']) == (1, None, None)
+
+
+def test_partition_update_and_work_ctr(sap_row, tmp_path):
+    headers = cleaner.EXPECTED_HEADERS
+    first = pd.DataFrame([sap_row(material='86000101', message='12856001', pstng_date='03.07.2024')[2:],
+                          sap_row(material='86000102', message='12856002', pstng_date='04.08.2024',
+                                  work_ctr='')[2:]], columns=headers)
+    cleaner.export_partitioned(first, tmp_path, by_work_ctr=True)
+
+    # Erneut geliefert: Juli-Zeile mit gleichem Schlüssel ersetzt, eine neue dazu; August bleibt
+    second = pd.DataFrame([sap_row(material='86000101', message='12856001', pstng_date='03.07.2024',
+                                   customer='K2')[2:],
+                           sap_row(material='86000103', message='12856003', pstng_date='05.07.2024')[2:]],
+                          columns=headers)
+    manifest = cleaner.export_partitioned(second, tmp_path, by_work_ctr=True)
+
+    assert list(manifest['partitions']) == ['year=2024/month=07/work_ctr=L91',
+                                            'year=2024/month=08/work_ctr=_ohne']
+    assert manifest['rows'] == 3
+    july = read_part(tmp_path / 'year=2024/month=07/work_ctr=L91/part.csv')
+    assert list(zip(july['Material'], july['Customer'])) == [('86000101', 'K2'), ('86000103', 'K1')]
@@ -0,0 +1,94 @@
+"""Spaltenprofil (HyperLogLog, HeavyHitters, ReportProfile)."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import sap_report_cleaner as cleaner
+
+
+@pytest.mark.parametrize('count', [1, 100, 1000, 20000, 100000])
+def test_hyperloglog_accuracy(count):
+    hll = cleaner.HyperLogLog()
+    values = np.array([f"M{i:08d}" for i in range(count)], dtype=object)
+    # In Blöcken und mit Wiederholungen: zählt nur verschiedene Werte
+    for start in range(0, count, 7000):
+        hll.add(values[start:start + 7000])
+    hll.add(values[:count // 2])
+
+    # Standardfehler ≈ 1,6 %, die Hashes sind deterministisch
+    assert hll.count() == pytest.approx(count, rel=0.05)
+
+
+def test_hyperloglog_empty():
+    hll = cleaner.HyperLogLog()
+    hll.add(np.array([], dtype=object))
+    assert hll.count() == 0
+
+
+def test_heavy_hitters_exact_below_capacity():
+    hitters = cleaner.HeavyHitters(capacity=5)
+    hitters.add(np.array(['L91', 'L92', 'L93'], dtype=object), np.array([5, 2, 2]))
+    hitters.add(np.array(['L92', 'L94'], dtype=object), np.array([4, 1]))
+
+    assert hitters.top(3) == [('L92', 6), ('L91', 5), ('L93', 2)]
+    assert hitters.exact
+
+
+def test_heavy_hitters_keeps_frequent_values():
+    # 3 häufige Werte und 200 seltene, verteilt auf Blöcke; nur 10 Zähler
+    hitters = cleaner.HeavyHitters(capacity=10)
+    total = 0
+    for block in range(20):
+        values = np.array(['A', 'B', 'C'] + [f"x{block * 10 + i}" for i in range(10)], dtype=object)
+        counts = np.array([50, 30, 20] + [1] * 10)
+        hitters.add(values, counts)
+        total += counts.sum()
+
+    top = hitters.top(3)
+    assert [value for value, _ in top] == ['A', 'B', 'C']
+    assert not hitters.exact
+    # Misra-Gries: höchstens um Zeilen / (Zähler + 1) zu klein, nie zu groß
+    for (value, count), true in zip(top, [1000, 600, 400]):
+        assert true - total / 11 <= count <= true
+
+
+def profile_rows(sap_row):
+    rows = []
+    for i in range(30):
+        rows.append(sap_row(material=str(86000100 + i % 12),
+                            withdrawn=['5', '', '-3', '1.200'][i % 4],
+                            pstng_date=['03.07.24', '15.08.24', ''][i % 3],
+                            work_ctr=['L91', 'L91', 'L92'][i % 3])[2:])
+    return rows
+
+
+def test_report_profile(sap_row):
+    profile = cleaner.ReportProfile(batch_size=7)
+    for row in profile_rows(sap_row):
+        profile.append(row)
+    summary = profile.summary()
+    columns = {col['column']: col for col in summary['columns']}
+
+    assert summary['rows'] == 30
+    material = columns['Material']
+    assert (material['nulls'], material['distinct'], material['min'], material['max']) == \
+        (0, 12, 86000100, 86000111)
+    withdrawn = columns['Withdrawn']
+    assert (withdrawn['nulls'], withdrawn['min'], withdrawn['max']) == (8, -3, 1200)
+    assert withdrawn['null_share'] == pytest.approx(8 / 30)
+    date = columns['Pstng Date']
+    assert (date['nulls'], date['min'], date['max']) == (10, '03.07.2024', '15.08.2024')
+    assert columns['Work Ctr']['top'] == [{'value': 'L91', 'count': 20}, {'value': 'L92', 'count': 10}]
+    assert columns['Work Ctr']['top_exact']
+    assert columns['Material']['top'][0] == {'value': '86000100', 'count': 3}
+
+
+def test_report_profile_frame_matches_rows(sap_row):
+    rows = profile_rows(sap_row)
+    by_rows = cleaner.ReportProfile(batch_size=7)
+    for row in rows:
+        by_rows.append(row)
+    by_frame = cleaner.ReportProfile(batch_size=7)
+    by_frame.add_frame(pd.DataFrame(rows, columns=cleaner.EXPECTED_HEADERS))
+
+    assert by_frame.summary()['columns'] == by_rows.summary()['columns']
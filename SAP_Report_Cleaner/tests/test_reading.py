@@ -0,0 +1,49 @@
+"""Einlese-Helfer für Notebooks und eigene Skripte (read_sap_file, convert_date)."""
+import gzip
+
+import pytest
+
+import sap_report_cleaner as cleaner
+
+
+def test_read_sap_file_compressed(report):
+    packed = report.with_name(report.name + '.gz')
+    packed.write_bytes(gzip.compress(report.read_bytes()))
+
+    rows = cleaner.read_sap_file(str(packed))
+
+    assert rows == cleaner.read_sap_file(str(report))
+    assert rows[3][2:] == cleaner.EXPECTED_HEADERS
+    assert len(rows) == len(report.read_text(encoding='utf-8').split('\n'))
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('03.07.24', '03.07.2024'),
+    ('03.07.2024', '03.07.2024'),
+    ('2024-07-03', '03.07.2024'),
+    (' 31.12.99 ', '31.12.1999'),
+    ('kein Datum', 'kein Datum'),
+    ('', ''),
+    (None, ''),
+])
+def test_convert_date(value, expected):
+    assert cleaner.convert_date(value) == expected
+
+
+def test_convert_date_output_format():
+    assert cleaner.convert_date('03.07.24', '%Y-%m-%d') == '2024-07-03'
+
+
+def test_find_header_row(report):
+    rows = cleaner.read_sap_file(str(report))
+    assert cleaner.find_header_row(rows) == (3, 2)
+    assert cleaner.find_header_row(rows[:3]) == (None, None)
+
+
+def test_run_read_error(tmp_path, capsys):
+    # Ein Ordner statt einer Datei: Fehlermeldung und None statt Traceback
+    folder = tmp_path / 'report.txt'
+    folder.mkdir()
+
+    assert cleaner.run(str(folder)) is None
+    assert "❌ Verarbeitung fehlgeschlagen" in capsys.readouterr().out
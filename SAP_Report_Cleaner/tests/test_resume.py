@@ -0,0 +1,104 @@
+"""Fortsetzen nach Abbruch (--resume) muss dieselbe CSV liefern wie ein Lauf ohne Unterbrechung."""
+import shutil
+
+import pytest
+
+import sap_report_cleaner as cleaner
+from conftest import sample_rows, write_report
+
+
+class CancelAfter(cleaner.CancelToken):
+    """Bricht bei der n-ten Prüfung ab (wie ein Klick auf 'Abbrechen' mitten im Einlesen)."""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.remaining = checks
+
+    def check(self):
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.cancel()
+        super().check()
+
+
+def test_resume_equals_uninterrupted(tmp_path, monkeypatch, capsys):
+    # Checkpoint bei jedem Aufruf speichern, nicht erst nach CHECKPOINT_SECONDS
+    monkeypatch.setattr(cleaner, 'CHECKPOINT_SECONDS', 0)
+    (tmp_path / 'resume').mkdir()
+    (tmp_path / 'reference').mkdir()
+    report = write_report(tmp_path / 'resume' / 'report.txt', sample_rows(5000))
+    reference = shutil.copy2(report, tmp_path / 'reference' / 'report.txt')
+
+    with pytest.raises(cleaner.ProcessingCancelled):
+        cleaner.run(str(report), resume=True, cancel=CancelAfter(3))
+    checkpoint = cleaner.checkpoint_dir(report)
+    assert (checkpoint / cleaner.CHECKPOINT_STATE).exists()
+    assert not (report.parent / 'report_cleaned.csv').exists()
+
+    capsys.readouterr()
+    resumed_csv = cleaner.run(str(report), resume=True)
+    assert '⏩ Checkpoint vom' in capsys.readouterr().out
+    expected_csv = cleaner.run(str(reference), max_memory='1G')
+
+    assert resumed_csv.read_bytes() == expected_csv.read_bytes()
+    assert not checkpoint.exists()
+
+
+class FailAfter(cleaner.CancelToken):
+    """Scheitert bei der n-ten Prüfung (z.B. Netzlaufwerk getrennt): kein Checkpoint beim Abbruch."""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.remaining = checks
+
+    def check(self):
+        self.remaining -= 1
+        if self.remaining <= 0:
+            raise OSError("Netzwerkpfad nicht gefunden")
+
+
+def spilled_chunks(report, checkpoint):
+    kept, deleted, _ = cleaner.process_sap_report_spilled(
+        str(report), cleaner.parse_size('2M'), checkpoint.directory, checkpoint=checkpoint,
+        plan=cleaner.plan_report(str(report)))
+    return len(kept.chunk_paths), len(deleted.chunk_paths)
+
+
+def test_checkpoints_at_chunk_boundaries(tmp_path, monkeypatch):
+    report = write_report(tmp_path / 'report.txt', sample_rows(8000))
+    saves = []
+    monkeypatch.setattr(cleaner.Checkpoint, 'save', lambda self, state: saves.append(state))
+
+    (tmp_path / 'rare').mkdir()
+    rare = spilled_chunks(report, cleaner.Checkpoint(report, tmp_path / 'rare', interval=3600))
+    assert [state.get('complete') for state in saves] == [True]
+    saves.clear()
+    (tmp_path / 'often').mkdir()
+    often = spilled_chunks(report, cleaner.Checkpoint(report, tmp_path / 'often', interval=0))
+
+    # Ein Checkpoint je Chunk-Grenze von kept, aber kein zusätzlicher kleiner Chunk
+    assert rare[0] == often[0] > 2
+    assert len(saves) == often[0]
+    assert all('offset' in state for state in saves[:-1]) and saves[-1]['complete']
+    # gelöschte Zeilen höchstens einmal je Checkpoint ausgelagert
+    assert often[1] <= often[0]
+
+
+def test_resume_after_crash(tmp_path, monkeypatch, capsys):
+    # Ohne gespeicherten Abbruch geht es beim letzten Checkpoint an einer Chunk-Grenze weiter
+    monkeypatch.setattr(cleaner, 'CHECKPOINT_SECONDS', 0)
+    (tmp_path / 'resume').mkdir()
+    (tmp_path / 'reference').mkdir()
+    report = write_report(tmp_path / 'resume' / 'report.txt', sample_rows(8000))
+    reference = shutil.copy2(report, tmp_path / 'reference' / 'report.txt')
+
+    with pytest.raises(OSError):
+        cleaner.run(str(report), resume=True, max_memory='2M', cancel=FailAfter(6))
+    assert (cleaner.checkpoint_dir(report) / cleaner.CHECKPOINT_STATE).exists()
+
+    capsys.readouterr()
+    resumed_csv = cleaner.run(str(report), resume=True, max_memory='2M')
+    assert '⏩ Checkpoint vom' in capsys.readouterr().out
+    expected_csv = cleaner.run(str(reference), max_memory='2M')
+
+    assert resumed_csv.read_bytes() == expected_csv.read_bytes()
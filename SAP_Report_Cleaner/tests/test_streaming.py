@@ -0,0 +1,30 @@
+"""Streaming-Bereinigung (--csv-only) muss dieselbe CSV liefern wie der DataFrame-Weg."""
+import pandas as pd
+
+import sap_report_cleaner as cleaner
+
+
+def test_stream_equals_dataframe(report, tmp_path):
+    df, _ = cleaner.process_sap_report(str(report))
+    df = cleaner.convert_data_types(df)
+    frame_csv = tmp_path / 'frame.csv'
+    cleaner.write_csv(df, str(frame_csv))
+
+    stream_csv = tmp_path / 'stream.csv'
+    cleaner.stream_clean_csv(str(report), str(stream_csv))
+
+    assert stream_csv.read_bytes() == frame_csv.read_bytes()
+
+
+def test_stream_deleted_rows(report, tmp_path):
+    _, df_deleted = cleaner.process_sap_report(str(report))
+
+    deleted_csv = tmp_path / 'deleted.csv'
+    stats = cleaner.stream_clean_csv(str(report), str(tmp_path / 'stream.csv'), str(deleted_csv))
+    streamed = pd.read_csv(deleted_csv, sep=';', encoding='utf-8-sig', dtype=str)
+
+    assert stats['sum_rows'] == 4
+    assert stats['no_material'] == 1
+    assert stats['kept_rows'] == 40
+    assert streamed['Grund'].tolist() == df_deleted['Grund'].tolist()
+    assert streamed['Original_Zeile'].astype(int).tolist() == df_deleted['Original_Zeile'].tolist()
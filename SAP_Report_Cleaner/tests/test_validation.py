@@ -0,0 +1,118 @@
+"""Datenqualitätsprüfung (validate_report, ReportValidator, run mit validate)."""
+import json
+
+import pytest
+from openpyxl import load_workbook
+
+import sap_report_cleaner as cleaner
+
+
+@pytest.fixture
+def checked_report(make_report, sap_row):
+    """Sechs Zeilen, je eine Auffälligkeit in den Zeilen 2 bis 5."""
+    def make(name='report.txt'):
+        return make_report([
+            sap_row(material='86000101', message='12856001'),
+            sap_row(material='86000102', message='12856002', withdrawn='abc'),
+            sap_row(material='86000103', message='12856003', withdrawn='-3'),
+            sap_row(material='86000104', message='12856004', pstng_date='01.01.2099'),
+            sap_row(material='86000105', message='12856005', pstng_date='kein Datum'),
+            sap_row(material='86000106', message='12856006'),
+        ], name)
+    return make
+
+
+def violations(summary):
+    return {result['name']: result['violations'] for result in summary['results'] if result['violations']}
+
+
+def converted(report):
+    """Wie run: bereinigter DataFrame nach convert_data_types und die Originalwerte."""
+    plan = cleaner.plan_report(str(report))
+    df, _ = cleaner.process_sap_report(str(report), plan=plan)
+    raw = {col: df[col] for col in cleaner.NUMERIC_COLUMNS + [cleaner.DATE_COLUMN]}
+    return cleaner.convert_data_types(df, plan=plan), raw
+
+
+EXPECTED = {'Withdrawn: parse': 1, 'Pstng Date: parse': 1,
+            'Withdrawn negativ': 1, 'Buchungsdatum in der Zukunft': 1}
+
+
+def test_validate_report_default_checks(checked_report):
+    df, raw = converted(checked_report())
+    summary = cleaner.validate_report(df, raw)
+
+    assert summary['rows'] == 6
+    assert violations(summary) == EXPECTED
+    samples = {result['name']: result['samples'] for result in summary['results']}
+    # Zeile im Blatt 'Bereinigte Daten' (Kopfzeile = 1)
+    assert samples['Withdrawn: parse'] == [{'row': 3, 'value': 'abc'}]
+    assert samples['Withdrawn negativ'] == [{'row': 4, 'value': '-3'}]
+    assert samples['Buchungsdatum in der Zukunft'] == [{'row': 5, 'value': '01.01.2099'}]
+
+
+def test_validator_blocks_match_whole_frame(checked_report):
+    report = checked_report()
+    df, raw = converted(report)
+    expected = cleaner.validate_report(df, raw)
+
+    # Blockweise wie beim Streaming: Zeilen roh und nach convert_row
+    plan = cleaner.plan_report(str(report))
+    rows, _ = cleaner.process_sap_report(str(report), plan=plan)
+    raw_rows = rows.values.tolist()
+    validator = cleaner.ReportValidator()
+    for start in range(0, len(raw_rows), 4):
+        block = raw_rows[start:start + 4]
+        validator.add_rows(block, [cleaner.convert_row(row, plan) for row in block])
+    summary = validator.summary()
+
+    assert summary['results'] == expected['results']
+    assert summary['rows'] == expected['rows']
+
+
+def test_custom_checks(checked_report):
+    df, raw = converted(checked_report())
+    checks = [{'check': 'allowed', 'column': 'ICt', 'value': ['X']},
+              {'check': 'pattern', 'column': 'Work Ctr', 'value': r'L9\d'},
+              {'check': 'required', 'column': 'Withdrawn'},
+              {'check': 'max', 'column': 'Pstng Date', 'value': '31.12.2024', 'name': 'nach 2024'}]
+    summary = cleaner.validate_report(df, raw, checks)
+
+    assert violations(summary) == {'ICt: allowed': 6, 'Withdrawn: required': 1, 'nach 2024': 1}
+
+    with pytest.raises(ValueError):
+        cleaner.load_checks([{'check': 'min', 'column': 'ICt', 'value': 1}])
+
+
+def read_outputs(report):
+    """(Blätter der Excel-Datei, Inhalt von [name]_validation.json oder None)."""
+    workbook = load_workbook(report.with_name('report_cleaned.xlsx'), read_only=True)
+    sheets = {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)]
+              for sheet in workbook.worksheets}
+    workbook.close()
+    validation_json = report.with_name('report_validation.json')
+    if not validation_json.exists():
+        return sheets, None
+    return sheets, json.loads(validation_json.read_text(encoding='utf-8'))
+
+
+def test_run_validation_opt_in(checked_report):
+    report = checked_report('plain/report.txt')
+    cleaner.run(str(report))
+
+    sheets, summary = read_outputs(report)
+    assert 'Validierung' not in sheets
+    assert summary is None
+
+
+def test_run_validation_same_outputs_with_max_memory(checked_report):
+    in_memory = checked_report('memory/report.txt')
+    spilled = checked_report('spilled/report.txt')
+    cleaner.run(str(in_memory), validate=True)
+    cleaner.run(str(spilled), validate=True, max_memory='1G')
+
+    sheets, summary = read_outputs(in_memory)
+    spilled_sheets, spilled_summary = read_outputs(spilled)
+    assert violations(summary) == EXPECTED
+    assert spilled_summary['results'] == summary['results']
+    assert spilled_sheets['Validierung'] == sheets['Validierung']
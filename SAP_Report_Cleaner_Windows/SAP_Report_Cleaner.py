@@ -6,8 +6,15 @@ Bereinigt SAP-Reports in 3 einfachen Schritten.
 Speichert automatisch in den Downloads-Ordner.
 """
 
+import csv
+import gzip
+import io
 import os
+import re
 import sys
+import time
+import uuid
+import zipfile
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
@@ -99,18 +106,123 @@ def convert_date(value):
             continue
     return val_str
 
-def process_sap_report(file_path):
-    """Verarbeitet eine SAP-Report-Datei."""
-    # Datei lesen
-    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-        content = f.read()
-    
-    lines = content.split('\n')
-    all_rows = [line.split('\t') for line in lines]
+def open_report(file_path):
+    """Öffnet die Datei als Text; .gz/.zip/.zst-Archive werden beim Lesen entpackt
+    (Erkennung über die ersten Bytes)."""
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+    if head.startswith(b'\x1f\x8b'):
+        return gzip.open(file_path, 'rt', encoding='utf-8', errors='replace')
+    if head.startswith(b'PK\x03\x04'):
+        with zipfile.ZipFile(file_path) as archive:
+            members = [i for i in archive.infolist()
+                       if not i.is_dir() and not i.filename.startswith('__MACOSX/')]
+            if not members:
+                raise ValueError("ZIP-Archiv enthält keine Datei")
+            raw = archive.open(members[0])
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+    if head.startswith(b'\x28\xb5\x2f\xfd'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Für .zst-Dateien wird zstandard benötigt: pip install zstandard")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+    return open(file_path, 'r', encoding='utf-8', errors='replace')
+
+def report_base_name(file_path):
+    """Dateiname ohne Endung und ohne Archiv-Endung (z.B. 'L91.txt.gz' → 'L91')."""
+    path = Path(file_path)
+    if path.suffix.lower() in ('.gz', '.zip', '.zst'):
+        path = path.with_suffix('')
+    return path.stem
+
+def workbook_kind(file_path):
+    """Erkennt echte Excel-Arbeitsmappen an den ersten Bytes ('xls', 'xlsx' oder None)."""
+    with open(file_path, 'rb') as f:
+        head = f.read(8)
+    if head == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1':
+        return 'xls'
+    if head.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                if 'xl/workbook.xml' in archive.namelist():
+                    return 'xlsx'
+        except zipfile.BadZipFile:
+            pass
+    return None
+
+def format_cell(value):
+    """Wandelt einen Excel-Zellwert in Text wie im SAP-Tab-Export um."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%d.%m.%Y')
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        text = repr(value)
+        # Genau 3 Nachkommastellen würde clean_number als Tausenderpunkt lesen
+        if re.fullmatch(r'-?\d+\.\d{3}', text):
+            text += '0'
+        return text
+    return str(value).replace('\t', ' ').replace('\r', ' ').replace('\n', ' ')
+
+def iter_workbook_rows(file_path, kind):
+    """Liest das erste Tabellenblatt zeilenweise (.xlsx gestreamt, .xls über xlrd)."""
+    if kind == 'xls':
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportError("Für echte Excel-97-Dateien (.xls) wird xlrd benötigt: pip install xlrd")
+        book = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            sheet = book.sheet_by_index(0)
+            for row_idx in range(sheet.nrows):
+                yield [format_cell(xlrd.xldate_as_datetime(cell.value, book.datemode))
+                       if cell.ctype == xlrd.XL_CELL_DATE else format_cell(cell.value)
+                       for cell in sheet.row(row_idx)]
+        finally:
+            book.release_resources()
+        return
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows(values_only=True):
+            yield [format_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+def iter_lines(file_path):
+    """Liest die Datei zeilenweise (wie content.split('\\n'), aber ohne alles zu laden)."""
+    kind = workbook_kind(file_path)
+    if kind:
+        for row in iter_workbook_rows(file_path, kind):
+            yield '\t'.join(row)
+        return
+    with open_report(file_path) as f:
+        line = ''
+        for line in f:
+            yield line[:-1] if line.endswith('\n') else line
+        if line == '' or line.endswith('\n'):
+            yield ''
+
+class ProcessingCancelled(Exception):
+    """Verarbeitung wurde vom Benutzer abgebrochen."""
+
+PROGRESS_ROWS = 5000  # Zeilen zwischen zwei Fortschrittsmeldungen
+
+def iter_cleaned_rows(file_path, stats, deleted_rows=None, progress=None):
+    """Liefert die behaltenen Zeilen (Spalten C-Q) einzeln, ohne die Datei zu laden.
+    progress(zeilen) wird alle PROGRESS_ROWS Zeilen aufgerufen und darf
+    ProcessingCancelled auslösen."""
+    rows = (line.split('\t') for line in iter_lines(file_path))
 
     # Header finden
     header_row_idx, header_start_col = None, None
-    for idx, row in enumerate(all_rows):
+    for idx, row in enumerate(rows):
         for col_idx, cell in enumerate(row):
             if str(cell).strip().lower() == 'material':
                 header_row_idx, header_start_col = idx, col_idx
@@ -120,13 +232,14 @@ def process_sap_report(file_path):
 
     if header_row_idx is None:
         header_row_idx, header_start_col = 3, 2
+        rows = (line.split('\t') for line in iter_lines(file_path))
+        for _ in range(header_row_idx + 1):
+            next(rows, None)
 
     # Daten verarbeiten
-    cleaned_data, deleted_rows = [], []
-    stats = {'total': 0, 'sum_rows': 0, 'empty': 0, 'no_material': 0, 'kept': 0}
-
-    for row_idx in range(header_row_idx + 1, len(all_rows)):
-        row = all_rows[row_idx]
+    for row_idx, row in enumerate(rows, start=header_row_idx + 1):
+        if progress is not None and stats['total'] % PROGRESS_ROWS == 0:
+            progress(stats['total'])
         stats['total'] += 1
 
         if all(str(cell).strip() == '' for cell in row):
@@ -136,8 +249,9 @@ def process_sap_report(file_path):
         col_b = str(row[1]).strip() if len(row) > 1 else ''
         if col_b in ['*', '**']:
             stats['sum_rows'] += 1
-            deleted_rows.append({'Grund': 'Summenzeile', 'Zeile': row_idx + 1,
-                                 'Daten': '\t'.join(str(c) for c in row)})
+            if deleted_rows is not None:
+                deleted_rows.append({'Grund': 'Summenzeile', 'Zeile': row_idx + 1,
+                                     'Daten': '\t'.join(str(c) for c in row)})
             continue
 
         data_row = [str(row[i]).strip() if i < len(row) else ''
@@ -145,12 +259,23 @@ def process_sap_report(file_path):
 
         if not data_row[0]:
             stats['no_material'] += 1
-            deleted_rows.append({'Grund': 'Keine Materialnummer', 'Zeile': row_idx + 1,
-                                 'Daten': '\t'.join(data_row)})
+            if deleted_rows is not None:
+                deleted_rows.append({'Grund': 'Keine Materialnummer', 'Zeile': row_idx + 1,
+                                     'Daten': '\t'.join(data_row)})
             continue
 
-        cleaned_data.append(data_row)
         stats['kept'] += 1
+        yield data_row
+
+def new_stats():
+    """Leeres Statistik-Dictionary."""
+    return {'total': 0, 'sum_rows': 0, 'empty': 0, 'no_material': 0, 'kept': 0}
+
+def process_sap_report(file_path, progress=None):
+    """Verarbeitet eine SAP-Report-Datei."""
+    stats = new_stats()
+    deleted_rows = []
+    cleaned_data = list(iter_cleaned_rows(file_path, stats, deleted_rows, progress))
 
     # DataFrame erstellen
     df = pd.DataFrame(cleaned_data, columns=EXPECTED_HEADERS)
@@ -165,6 +290,50 @@ def process_sap_report(file_path):
 
     return df, df_deleted, stats
 
+NUMERIC_IDX = [EXPECTED_HEADERS.index(col) for col in NUMERIC_COLUMNS]
+DATE_IDX = EXPECTED_HEADERS.index(DATE_COLUMN)
+CSV_BATCH_SIZE = 10000
+
+def atomic_write(path, write_func):
+    """Schreibt über write_func(tmp_pfad) in eine temporäre Datei im Zielordner
+    und benennt sie erst danach um. Bei Abbruch oder Fehler bleibt keine halb
+    geschriebene Datei im Downloads-Ordner zurück."""
+    path = Path(path)
+    # Endung bleibt erhalten (pandas wählt das Excel-Format anhand der Endung)
+    tmp_path = path.parent / f".{path.stem}.{uuid.uuid4().hex[:8]}.tmp{path.suffix}"
+    try:
+        write_func(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def stream_clean_csv(file_path, output_path, progress=None):
+    """CSV-Export im Streaming-Modus: lesen → filtern → konvertieren → schreiben.
+    Es entsteht kein DataFrame, der Speicherbedarf bleibt konstant.
+    Die Datei wird atomar geschrieben (siehe atomic_write)."""
+    stats = new_stats()
+    atomic_write(output_path, lambda tmp: _write_clean_csv(file_path, tmp, stats, progress))
+    return stats
+
+def _write_clean_csv(file_path, output_path, stats, progress):
+    """Schreibt die bereinigten Zeilen blockweise in output_path."""
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';', lineterminator=os.linesep)
+        writer.writerow(EXPECTED_HEADERS)
+        batch = []
+        for data_row in iter_cleaned_rows(file_path, stats, progress=progress):
+            for idx in NUMERIC_IDX:
+                num = clean_number(data_row[idx])
+                data_row[idx] = '' if num is None else num
+            data_row[DATE_IDX] = convert_date(data_row[DATE_IDX])
+            batch.append(data_row)
+            if len(batch) >= CSV_BATCH_SIZE:
+                writer.writerows(batch)
+                batch.clear()
+        writer.writerows(batch)
+
 # ============================================================
 # HAUPTFENSTER
 # ============================================================
@@ -181,6 +350,9 @@ class SAPReportCleanerApp:
         self.result_df = None
         self.result_deleted = None
         self.format_var = tk.StringVar(value="excel")
+        self.cancel_requested = False
+        self.progress_started = 0.0
+        self.progress_shown = 0.0
         
         self.create_widgets()
     
@@ -234,9 +406,16 @@ class SAPReportCleanerApp:
                               foreground='gray')
         info_label.pack(pady=(0, 10))
         
-        self.process_btn = ttk.Button(step3_frame, text="🚀 Bereinigen & Speichern",
+        buttons = ttk.Frame(step3_frame)
+        buttons.pack()
+        
+        self.process_btn = ttk.Button(buttons, text="🚀 Bereinigen & Speichern",
                                       command=self.process_file, state=tk.DISABLED)
-        self.process_btn.pack()
+        self.process_btn.pack(side=tk.LEFT)
+        
+        self.cancel_btn = ttk.Button(buttons, text="⏹ Abbrechen",
+                                     command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=(10, 0))
         
         # Status
         ttk.Separator(main_frame).pack(fill=tk.X, pady=15)
@@ -251,8 +430,9 @@ class SAPReportCleanerApp:
             title="SAP-Report auswählen",
             initialdir=get_downloads_folder(),
             filetypes=[
-                ("Text/Excel Dateien", "*.txt *.xls"),
+                ("Text/Excel Dateien", "*.txt *.xls *.xlsx *.gz *.zip *.zst"),
                 ("Textdateien", "*.txt"),
+                ("Archive", "*.gz *.zip *.zst"),
                 ("Alle Dateien", "*.*")
             ]
         )
@@ -264,6 +444,23 @@ class SAPReportCleanerApp:
             self.process_btn.config(state=tk.NORMAL)
             self.status_label.config(text=f"✅ Datei geladen: {filename}")
     
+    def cancel_processing(self):
+        """Laufende Verarbeitung beim nächsten Fortschritts-Aufruf abbrechen."""
+        self.cancel_requested = True
+        self.status_label.config(text="⏹ Breche ab...")
+    
+    def show_progress(self, rows):
+        """Fortschritt anzeigen (höchstens 5x pro Sekunde) und Fenster bedienbar halten."""
+        now = time.perf_counter()
+        if now - self.progress_shown >= 0.2:
+            self.progress_shown = now
+            rate = rows / max(now - self.progress_started, 1e-6)
+            self.status_label.config(
+                text=f"⏳ Verarbeite... {rows:,} Zeilen ({rate:,.0f} Zeilen/s)".replace(',', '.'))
+            self.root.update()
+        if self.cancel_requested:
+            raise ProcessingCancelled()
+    
     def process_file(self):
         """Datei verarbeiten und speichern."""
         if not self.source_file:
@@ -271,32 +468,43 @@ class SAPReportCleanerApp:
             return
         
         self.status_label.config(text="⏳ Verarbeite...")
+        self.cancel_requested = False
+        self.progress_started = self.progress_shown = time.perf_counter()
+        self.process_btn.config(state=tk.DISABLED)
+        self.select_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
         self.root.update()
         
         try:
-            # Verarbeiten
-            df, df_deleted, stats = process_sap_report(self.source_file)
-            
             # Ausgabepfad
             downloads = get_downloads_folder()
-            base_name = Path(self.source_file).stem
+            base_name = report_base_name(self.source_file)
             
             if self.format_var.get() == "excel":
+                # Verarbeiten
+                df, df_deleted, stats = process_sap_report(self.source_file, self.show_progress)
+                self.cancel_btn.config(state=tk.DISABLED)
+                self.status_label.config(text="💾 Speichere Excel-Datei...")
+                self.root.update()
                 output_path = downloads / f"{base_name}_cleaned.xlsx"
                 try:
                     import openpyxl
-                    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                        df.to_excel(writer, sheet_name='Bereinigte Daten', index=False)
-                        if not df_deleted.empty:
-                            df_deleted.to_excel(writer, sheet_name='Gelöschte Zeilen', index=False)
+                    def write_excel(tmp):
+                        with pd.ExcelWriter(tmp, engine='openpyxl') as writer:
+                            df.to_excel(writer, sheet_name='Bereinigte Daten', index=False)
+                            if not df_deleted.empty:
+                                df_deleted.to_excel(writer, sheet_name='Gelöschte Zeilen', index=False)
+                    atomic_write(output_path, write_excel)
                 except ImportError:
                     messagebox.showwarning("Hinweis", 
                         "openpyxl nicht installiert. Speichere als CSV statt.")
                     output_path = downloads / f"{base_name}_cleaned.csv"
-                    df.to_csv(output_path, index=False, sep=';', encoding='utf-8-sig')
+                    atomic_write(output_path, lambda tmp: df.to_csv(tmp, index=False, sep=';',
+                                                                    encoding='utf-8-sig'))
             else:
+                # CSV direkt im Streaming-Modus schreiben (ohne DataFrame)
                 output_path = downloads / f"{base_name}_cleaned.csv"
-                df.to_csv(output_path, index=False, sep=';', encoding='utf-8-sig')
+                stats = stream_clean_csv(self.source_file, output_path, self.show_progress)
             
             # Erfolg
             self.status_label.config(
@@ -315,9 +523,17 @@ class SAPReportCleanerApp:
             if sys.platform == 'win32':
                 os.startfile(downloads)
             
+        except ProcessingCancelled:
+            self.status_label.config(text="⏹ Abgebrochen – keine Datei gespeichert")
+            
         except Exception as e:
             self.status_label.config(text="❌ Fehler!")
             messagebox.showerror("Fehler", f"Verarbeitung fehlgeschlagen:\n\n{str(e)}")
+        
+        finally:
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.select_btn.config(state=tk.NORMAL)
+            self.process_btn.config(state=tk.NORMAL)
 
 # ============================================================
 # START